@@ -0,0 +1,109 @@
+# ******************************************************************************
+# * @file imports.py
+# * @author Pablo Joaquim
+# * @brief Import time of each command of main.py, measured with -X importtime and
+# * checked against the budget in import_budget.json
+# *
+# * Usage:
+# *   python bench/imports.py [--budget FILE] [--update] [--repeat 3]
+# * Exits with 1 when a command takes longer than its budget. --update writes the
+# * measured times, with a 50% margin, as the new budget.
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+source = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+output = os.path.join(tempfile.gettempdir(), 'imports_bench')
+
+# The command lines measured, the figures are rendered to a file
+commands = {
+    'help': ['--help'],
+    'import main': None,
+    'design': ['design', '--order', '4'],
+    'response': ['response', '--order', '4'],
+    'simulate': ['simulate', '--order', '4', '--tmax', '0.1'],
+    'plot': ['plot', '--order', '4', '--out', output + '.png'],
+}
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief Run the command with -X importtime and return the total import time in
+# * ms and the cumulative time of the top-level modules that took the longest
+# ******************************************************************************
+def measure(argv):
+    if (argv is None):
+        line = [sys.executable, '-X', 'importtime', '-c', 'import main']
+    else:
+        line = [sys.executable, '-X', 'importtime', os.path.join(source, 'main.py')] + argv
+    env = dict(os.environ, PYTHONPATH=source, MPLBACKEND='Agg')
+    result = subprocess.run(line, cwd=source, env=env, capture_output=True, text=True)
+    total = 0
+    modules = {}
+    for row in result.stderr.splitlines():
+        if (not row.startswith('import time:') or 'self [us]' in row):
+            continue
+        own, cumulative, name = row[len('import time:'):].split('|')
+        total += int(own)
+        if (not name[1:].startswith(' ')):
+            modules[name.strip()] = int(cumulative)/1e3
+    heaviest = sorted(modules.items(), key=lambda item: -item[1])[:4]
+    return total/1e3, heaviest
+
+# ******************************************************************************
+# * @brief The main entry point
+# ******************************************************************************
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import time budget of main.py")
+    parser.add_argument('--budget', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'import_budget.json'))
+    parser.add_argument('--update', action='store_true', help="save the measured times as the new budget")
+    parser.add_argument('--repeat', type=int, default=3, help="runs of each command, the best one is kept")
+    args = parser.parse_args()
+
+    budget = {}
+    if (os.path.exists(args.budget)):
+        with open(args.budget) as f:
+            budget = json.load(f)
+
+    measured = {}
+    over = []
+    print(f"{'command':14} {'import [ms]':>12} {'budget [ms]':>12}  heaviest modules [ms]")
+    for name, argv in commands.items():
+        runs = [measure(argv) for i in range(args.repeat)]
+        total, heaviest = min(runs, key=lambda run: run[0])
+        measured[name] = total
+        limit = budget.get(name)
+        mark = ''
+        if (limit is not None and total > limit):
+            over.append(name)
+            mark = '  OVER'
+        modules = ', '.join(f"{module} {ms:.0f}" for module, ms in heaviest)
+        print(f"{name:14} {total:12.1f} {limit if limit is not None else '-':>12}  {modules}{mark}")
+
+    if (args.update):
+        with open(args.budget, 'w') as f:
+            json.dump({name: round(1.5*ms) for name, ms in measured.items()}, f, indent=2)
+        print(f"Budget saved in {args.budget}")
+    elif (over):
+        print(f"{len(over)} command(s) over the import time budget")
+        raise SystemExit(1)
@@ -0,0 +1,81 @@
+# ******************************************************************************
+# * @file order.py
+# * @author Pablo Joaquim
+# * @brief Benchmark of the batched order solver against scipy buttord/cheb1ord
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+import sys
+import time
+
+import numpy as np
+from scipy import signal as filters
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from analog import order
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief Random specs of the band type btype, with the edges in rad/s
+# ******************************************************************************
+def specs(btype, n, seed=0):
+    rng = np.random.default_rng(seed)
+    rp = rng.uniform(0.1, 3, n)
+    rs = rng.uniform(20, 80, n)
+    f = np.sort(10**rng.uniform(2, 5, (n, 4)), axis=1)
+    if (btype == 'lowpass'):
+        return f[:, 0], f[:, 1], rp, rs
+    if (btype == 'highpass'):
+        return f[:, 1], f[:, 0], rp, rs
+    if (btype == 'bandpass'):
+        return f[:, 1:3], f[:, [0, 3]], rp, rs
+    return f[:, [0, 3]], f[:, 1:3], rp, rs
+
+# ******************************************************************************
+# * @brief Solve the specs with the scalar scipy function, one at a time
+# ******************************************************************************
+def scalar(wp, ws, rp, rs, family):
+    solve = filters.buttord if family == 'butter' else filters.cheb1ord
+    N = np.empty(len(wp), dtype=int)
+    Wn = np.empty(wp.shape)
+    for i in range(len(wp)):
+        N[i], Wn[i] = solve(wp[i], ws[i], rp[i], rs[i], analog=True)
+    return N, Wn
+
+# ******************************************************************************
+# * @brief Time both solvers and check that they agree
+# ******************************************************************************
+def main(n=2000):
+    print(f"{'family':8} {'btype':9} {'scipy [s]':>10} {'batch [s]':>10} {'speedup':>8} {'N equal':>8} {'Wn error':>9}")
+    for family in ('butter', 'cheby1'):
+        for btype in ('lowpass', 'highpass', 'bandpass', 'bandstop'):
+            wp, ws, rp, rs = specs(btype, n)
+            start = time.perf_counter()
+            N0, Wn0 = scalar(wp, ws, rp, rs, family)
+            t0 = time.perf_counter() - start
+            start = time.perf_counter()
+            N1, Wn1 = order.OrderSolver.solve(wp, ws, rp, rs, family)
+            t1 = time.perf_counter() - start
+            same = np.mean(N0 == N1)
+            error = np.max(np.abs(Wn1 - Wn0)/Wn0)
+            print(f"{family:8} {btype:9} {t0:10.4f} {t1:10.4f} {t0/t1:7.0f}x {same:8.1%} {error:9.1e}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,80 @@
+# ******************************************************************************
+# * @file service.py
+# * @author Pablo Joaquim
+# * @brief Throughput of the web service endpoints, cached against uncached, with
+# * the Flask test client (no network in between)
+# *
+# * Usage:
+# *   python bench/service.py [--seconds 2]
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import service
+from analog import filters
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+# Body of each endpoint, the cutoff is changed to make every request new
+requests = {
+    'design': ('/design', lambda wc: {'family': 'cheby1', 'btype': 'bandpass', 'order': 6,
+                                      'wci': wc, 'wcs': 3*wc, 'rp': 1, 'output': 'zpk'}),
+    'response': ('/response', lambda wc: {'filters': [{'order': n, 'wc': wc} for n in range(1, 9)], 'n': 500}),
+    'pzmap': ('/pzmap', lambda wc: {'filters': [{'order': n, 'wc': wc} for n in range(1, 9)]}),
+    'simulate': ('/simulate', lambda wc: {'filter': {'order': 5, 'wc': wc}, 'signals': [[1, 4, 0], [0.6, 40, 0]],
+                                          'step': 1e-4, 'tmax': 1}),
+    'plot': ('/plot', lambda wc: {'filters': [{'order': n, 'wc': wc} for n in range(1, 5)], 'title': 'bench'}),
+}
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief Send requests for seconds and return the requests per second. With
+# * cached set the same request is repeated, otherwise each one is different.
+# ******************************************************************************
+def throughput(client, path, body, format, cached, seconds):
+    count = 0
+    start = time.perf_counter()
+    while (time.perf_counter() - start < seconds):
+        wc = 1000.0 if cached else 1000.0 + count + time.perf_counter() % 1
+        reply = client.post(f'{path}?format={format}', json=body(wc))
+        if (reply.status_code != 200):
+            raise RuntimeError(reply.get_data(as_text=True))
+        count += 1
+    return count/(time.perf_counter() - start)
+
+# ******************************************************************************
+# * @brief The main entry point
+# ******************************************************************************
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Throughput of the web service")
+    parser.add_argument('--seconds', type=float, default=2, help="time spent in each case")
+    args = parser.parse_args()
+    logging.getLogger('matplotlib').setLevel(logging.ERROR)
+
+    client = service.create().test_client()
+    print(f"{'endpoint':10} {'format':8} {'uncached [req/s]':>17} {'cached [req/s]':>15}")
+    for name, (path, body) in requests.items():
+        for format in (('png',) if name == 'plot' else ('json', 'npz', 'msgpack')):
+            uncached = throughput(client, path, body, format, False, args.seconds)
+            cached = throughput(client, path, body, format, True, args.seconds)
+            print(f"{name:10} {format:8} {uncached:17.1f} {cached:15.1f}", flush=True)
+    print(filters.designCache.stats())
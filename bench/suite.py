@@ -0,0 +1,239 @@
+# ******************************************************************************
+# * @file suite.py
+# * @author Pablo Joaquim
+# * @brief Benchmarks of the main code paths of the analog package, saved as json
+# * baselines and compared against them to catch slowdowns
+# *
+# * Usage:
+# *   python bench/suite.py run [--out FILE] [--quick] [--match TEXT]
+# *   python bench/suite.py compare BASELINE CURRENT [--threshold 0.2]
+# * compare exits with 1 when some case is slower than the baseline by more than
+# * the threshold (0.2 = 20%).
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import argparse
+import datetime
+import io
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import scipy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from analog import bode
+from analog import filters
+from analog import metrics
+from analog import order
+from analog import response
+from analog import tolerance
+from analog import transient
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+# Filter orders and signal lengths of the cases, and the reduced ones of --quick
+orders = [2, 8, 16]
+lengths = [10000, 100000, 1000000]
+quickOrders = [2, 8]
+quickLengths = [10000, 100000]
+
+# The headless plotter shared by the rendering cases. The legends of the phase and
+# group delay axes have no labels, and matplotlib logs it on every call
+plotter = bode.FreqResponse(headless=True)
+logging.getLogger('matplotlib').setLevel(logging.ERROR)
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief Time fn, repeating it until it takes at least budget seconds (between
+# * minimum and maximum runs). setup is called before each run, out of the time.
+# * Returns the best and the mean time of a run in seconds and the number of runs.
+# ******************************************************************************
+def measure(fn, setup=None, budget=0.2, minimum=3, maximum=50):
+    times = []
+    while (len(times) < minimum or (sum(times) < budget and len(times) < maximum)):
+        if (setup is not None):
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {'seconds': min(times), 'mean': float(np.mean(times)), 'runs': len(times)}
+
+# ******************************************************************************
+# * @brief Check the output y of the simulation case name of the filter h over the
+# * signal (u, t) before timing it: it must be finite and, over its first samples,
+# * the same as lsim within tol of its peak
+# ******************************************************************************
+def verify(name, y, h, u, t, samples=10000, tol=1e-6):
+    m = min(len(u), samples)
+    reference = filters.ApplyFilter.eval(h, u[:m], t[:m])
+    error = np.max(np.abs(y[:m] - reference))/np.max(np.abs(reference))
+    if (not np.all(np.isfinite(y)) or not error <= tol):
+        raise RuntimeError(f"{name} gives a wrong output, the error against lsim is {error:.3g}")
+
+# ******************************************************************************
+# * @brief Lowpass Butterworth filters of orders 1..order at 1 kHz
+# ******************************************************************************
+def transfers(order, output='ba'):
+    H = []
+    for n in range(max(1, order - 3), order + 1):
+        h = filters.Butterworth.butter_lowpass(2*np.pi*1000, n, output=output)
+        H.append([h, f'order = {n}'] if output != 'ba' else [h[0], h[1], f'order = {n}'])
+    return H
+
+# ******************************************************************************
+# * @brief Return the list of (name, fn, setup) benchmark cases. The simulation
+# * cases have a fourth item, a check of the output of fn (see verify)
+# ******************************************************************************
+def cases(orders, lengths):
+    wc = 2*np.pi*1000
+    wci = 2*np.pi*500
+    wcs = 2*np.pi*1500
+    cold = filters.designCache.clear
+    rng = np.random.default_rng(0)
+    f = np.sort(10**rng.uniform(2, 5, (1000, 2)), axis=1)
+    rp = rng.uniform(0.1, 3, 1000)
+    rs = rng.uniform(20, 80, 1000)
+    tones = np.column_stack([rng.uniform(0, 1, 100), rng.uniform(1, 1e4, 100), rng.uniform(0, 6, 100)])
+
+    result = []
+    for n in orders:
+        # Design, with the cache cleared so the filter is really designed
+        result.append((f'design.butter_lowpass[order={n}]', lambda n=n: filters.Butterworth.butter_lowpass(wc, n), cold))
+        result.append((f'design.butter_bandpass[order={n}]', lambda n=n: filters.Butterworth.butter_bandpass(wci, wcs, n), cold))
+        result.append((f'design.cheby_lowpass[order={n}]', lambda n=n: filters.Chebyshev.cheby_lowpass(wc, 1, n), cold))
+        result.append((f'design.cheby_bandstop[order={n}]', lambda n=n: filters.Chebyshev.cheby_bandstop(wci, wcs, 1, n), cold))
+        result.append((f'design.zpk[order={n}]', lambda n=n: filters.Butterworth.butter_bandpass(wci, wcs, n, output='zpk'), cold))
+
+        # Frequency response
+        H = transfers(n)
+        Z = transfers(n, 'zpk')
+        result.append((f'response.eval.ba[order={n}]', lambda H=H: response.BatchResponse.eval(H, n=1000), None))
+        result.append((f'response.eval.zpk[order={n}]', lambda Z=Z: response.BatchResponse.eval(Z, n=1000), None))
+        result.append((f'response.adaptive[order={n}]', lambda Z=Z: response.AdaptiveResponse.adaptive(Z[-1], 0.01), None))
+        result.append((f'response.crossings[order={n}]', lambda Z=Z: response.AdaptiveResponse.crossings(Z[-1], -3), None))
+        result.append((f'render.plot[order={n}]', lambda H=H: plotter.plot(H, [1000, -3], 'bench', output=io.BytesIO()), None))
+        result.append((f'render.pzplot[order={n}]', lambda H=H: plotter.pzplot(H, wc, 'bench', output=io.BytesIO()), None))
+
+    # Order selection, scalar and batched
+    result.append(('design.order.scalar[specs=100]',
+                   lambda: [filters.Butterworth.butter_lowpass_order(f[i, 0], f[i, 1], rp[i], rs[i]) for i in range(100)], None))
+    result.append(('design.order.batch[specs=1000]', lambda: order.OrderSolver.solve(f[:, 0], f[:, 1], rp, rs, 'butter'), None))
+    result.append(('design.order.batch.bandpass[specs=1000]',
+                   lambda: order.OrderSolver.solve(f*[[0.9, 1.1]], f*[[0.7, 1.4]], rp, rs, 'cheby1'), None))
+
+    # Figures of merit of a batch of designs
+    designs = [filters.Chebyshev.cheby_lowpass(f[i, 0], rp[i], 2 + i % 8, output='zpk') for i in range(200)]
+    result.append(('tolerance.run[samples=10000]',
+                   lambda: tolerance.ToleranceAnalysis(designs[0], 0.05).run(10000, {'w3db': [0, np.inf]}), None))
+    result.append(('metrics.eval[designs=200]', lambda: metrics.FilterMetrics.eval(designs, f[:200, 0]/2, f[:200, 1]), None))
+
+    for length in lengths:
+        # Signal synthesis and time simulation
+        dt = 1e-5
+        result.append((f'synth.signal[tones=100,samples={length}]',
+                       lambda length=length: filters.SignalGenerator.signal(tones, dt, 0, length*dt), None))
+        u, t = filters.SignalGenerator.signal(tones[:3], dt, 0, length*dt)
+        for n in orders:
+            h = filters.Butterworth.butter_lowpass(2*np.pi*2000, n)
+            for method in ([None] if length <= 100000 else []) + ['foh', 'fft']:
+                name = f'simulate.{method or "lsim"}[order={n},samples={length}]'
+                result.append((name, lambda h=h, u=u, t=t, method=method: filters.ApplyFilter.eval(h, u, t, method=method), None,
+                               lambda y, name=name, h=h, u=u, t=t: verify(name, y, h, u, t)))
+        # Analytic step responses of all the orders at once
+        steps = [[filters.Butterworth.butter_lowpass(2*np.pi*2000, n, output='zpk'), ''] for n in orders]
+        result.append((f'transient.step[designs={len(steps)},samples={length}]',
+                       lambda steps=steps, t=t: transient.TransientResponse.batch(steps, t, 'step'), None))
+        # Time plot decimated to the width of the figure
+        result.append((f'render.timeplot[samples={length}]',
+                       lambda u=u, t=t: plotter.timeplot(t, [[u, 'input']], 'bench', output=io.BytesIO()), None))
+    return result
+
+# ******************************************************************************
+# * @brief Run the cases whose name contains match and return the results
+# ******************************************************************************
+def run(quick=False, match=None):
+    results = {}
+    for name, fn, setup, *check in cases(quickOrders if quick else orders, quickLengths if quick else lengths):
+        if (match is not None and match not in name):
+            continue
+        if (check):
+            check[0](fn())
+        results[name] = measure(fn, setup)
+        print(f"{name:50} {results[name]['seconds']*1e3:10.3f} ms", flush=True)
+    return {'meta': {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                     'python': platform.python_version(), 'numpy': np.__version__,
+                     'scipy': scipy.__version__, 'machine': platform.platform()},
+            'results': results}
+
+# ******************************************************************************
+# * @brief Compare the best times of current against baseline. Returns the names
+# * of the cases slower than the baseline by more than threshold.
+# ******************************************************************************
+def compare(baseline, current, threshold=0.2):
+    slower = []
+    print(f"{'case':50} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name in sorted(set(baseline['results']) | set(current['results'])):
+        if (name not in baseline['results'] or name not in current['results']):
+            print(f"{name:50} {'only in ' + ('current' if name in current['results'] else 'baseline'):>29}")
+            continue
+        before = baseline['results'][name]['seconds']
+        after = current['results'][name]['seconds']
+        ratio = after/before
+        mark = ''
+        if (ratio > 1 + threshold):
+            slower.append(name)
+            mark = '  SLOWER'
+        elif (ratio < 1/(1 + threshold)):
+            mark = '  faster'
+        print(f"{name:50} {before*1e3:8.3f}ms {after*1e3:8.3f}ms {ratio:7.2f}{mark}")
+    return slower
+
+# ******************************************************************************
+# * @brief The main entry point
+# ******************************************************************************
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks of the analog package")
+    commands = parser.add_subparsers(dest='command', required=True)
+    parser_run = commands.add_parser('run', help="run the benchmarks and save the results")
+    parser_run.add_argument('--out', default='bench.json', help="json file where the results are saved")
+    parser_run.add_argument('--quick', action='store_true', help="run only the smaller cases")
+    parser_run.add_argument('--match', default=None, help="run only the cases whose name contains this")
+    parser_compare = commands.add_parser('compare', help="compare two results files")
+    parser_compare.add_argument('baseline')
+    parser_compare.add_argument('current')
+    parser_compare.add_argument('--threshold', type=float, default=0.2,
+                                help="allowed slowdown before failing, as a fraction (default 0.2)")
+    args = parser.parse_args()
+
+    if (args.command == 'run'):
+        results = run(args.quick, args.match)
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved in {args.out}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        slower = compare(baseline, current, args.threshold)
+        if (slower):
+            print(f"{len(slower)} case(s) slower than the baseline by more than {args.threshold:.0%}")
+            raise SystemExit(1)
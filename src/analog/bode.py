@@ -10,11 +10,16 @@
 # ******************************************************************************
 # * import modules
 # ******************************************************************************
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-import scipy as sp
-import matplotlib.pyplot as plt
-# import control.matlab as ml
-import control
+from . import lazy
+from . import profiler
+from . import response
+from . import system
 
 # ******************************************************************************
 # * Objects Declarations
@@ -23,11 +28,21 @@ class FreqResponse():
     # ******************************************************************************
     # * @brief The __init__() function is called automatically every time the class
     # * is being used to create a new object.
+    # * When headless is set the figures are drawn with the non-interactive Agg backend
+    # * and, instead of being shown, they are rendered to the output given in each call,
+    # * to a file in outdir, or to the in-memory buffer self.buffer, with the format
+    # * (png, svg, pdf) given by the file extension or by format.
     # ******************************************************************************
-    def __init__(self):
+    def __init__(self, headless=False, outdir=None, format='png'):
         # The self parameter is a reference to the current instance of the class,
         # and is used to access variables that belong to the class.
-        pass
+        self.headless = headless
+        self.outdir = outdir
+        self.format = format
+        self.buffer = io.BytesIO()
+        self.count = 0
+        if (self.headless):
+          plt.switch_backend('Agg')
 
     # ******************************************************************************
     # * @brief Returns a string as a representation of the object.
@@ -35,6 +50,51 @@ class FreqResponse():
     def __repr__(self):
         return '<Metadata(name={self.id!r})>'.format(self=self)
 
+    # ******************************************************************************
+    # * @brief Obtain the figure and axes for a kind of plot. In headless mode the
+    # * figure is created once and its axes are cleared and reused on every call
+    # ******************************************************************************
+    def __figure(self, kind, rows=1):
+      if (not self.headless):
+        fig = plt.figure()
+      else:
+        fig = plt.figure(f'FreqResponse.{kind}')
+        if (rows > 0 and len(fig.axes) == rows):
+          for ax in fig.axes:
+            ax.cla()
+          return fig, (fig.axes if rows > 1 else fig.axes[0])
+        fig.clf()
+      if (rows == 0):
+        return fig, None
+      return fig, fig.subplots(rows, 1)
+
+    # ******************************************************************************
+    # * @brief Show the figure or, in headless mode, render it to output, which can be
+    # * a file name or a file-like object. Returns where the figure was rendered.
+    # ******************************************************************************
+    def __finish(self, fig, output, title):
+      if (not self.headless):
+        with profiler.span('plot.show'):
+          plt.show()
+        return None
+
+      if (output is None and self.outdir is not None):
+        self.count += 1
+        name = re.sub(r'[^\w]+', '_', title).strip('_') or 'figure'
+        output = os.path.join(self.outdir, f'{self.count:04d}_{name}.{self.format}')
+        os.makedirs(self.outdir, exist_ok=True)
+      if (output is None):
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        output = self.buffer
+
+      fmt = self.format
+      if (isinstance(output, str)):
+        fmt = os.path.splitext(output)[1][1:] or self.format
+      with profiler.span('plot.render'):
+        fig.savefig(output, format=fmt)
+      return output
+
     # ******************************************************************************
     # * @brief Format the Bode plots
     # ******************************************************************************
@@ -60,73 +120,99 @@ class FreqResponse():
     # ******************************************************************************
     # * @brief Plot the frequecy response of each transfer.
     # * H is a list of as many transfer functions you want to plot in the form [num, den, label]
+    # * or [AnalogFilter, label]. The responses are evaluated all at once over a common
+    # * frequency grid and returned as (w, mag, phase, grpdelay), with one row per
+    # * transfer, so they can be reused.
+    # * marker is [f, dB] to draw lines at f [Hz] and dB, or 'auto' to draw them at
+    # * the -3 dB frequencies of each transfer, found by AdaptiveResponse.crossings.
+    # * With tol [dB] each transfer is evaluated over its own adaptive grid instead,
+    # * and (w, mag, phase, grpdelay) are lists with one array per transfer.
     # ******************************************************************************
-    def plot(self, H, marker=[0,0], title = ""):
-      fig, ax = plt.subplots(3, 1)
-      
-      for h in H:
-        num = h[0]
-        den = h[1]
-        label = ""
-        if (len(h)>=2):
-          label = h[2]
-
-        # Calc the mod and phase
-        w, mag, phase = sp.signal.bode((num,den))
-
-        # Calc the group delay
-        grpdelay = []
-        for i in (range(len(w)-1)):
-            grpdelay.append(-1*(phase[i]-phase[i+1])/(w[i]-w[i+1]))
-        grpdelay = grpdelay + grpdelay[-1:] # Repeat the last elements to have an array of the same dimmension as w[]
-
-        # Plot the module of the transfer
-        ax[0].semilogx(w/(2*np.pi), mag, label=label)    # Bode magnitude plot
-        if (marker[0] != 0):
-          fc = marker[0]
-          ax[0].axvline(fc, color='green', linestyle='--')
-        if (marker[1] != 0):
-          mod = marker[1]
-          ax[0].axhline(mod, color='green', linestyle='--')
-
-        # Plot the phase of the transfer
-        ax[1].semilogx(w/(2*np.pi), phase)  # Bode phase plot
-        if (marker[0] != 0):
-          fc = marker[0]
-          ax[1].axvline(fc, color='green', linestyle='--')
-
-        # Plot the group delay of the transfer
-        ax[2].semilogx(w/(2*np.pi), grpdelay)  # Bode phase plot
-        if (marker[0] != 0):
-          fc = marker[0]
-          ax[2].axvline(fc, color='green', linestyle='--')
-          
-      # Format the Bode plots
-      self.__format_plots(ax, title)
+    def plot(self, H, marker=[0,0], title = "", output=None, tol=None):
+      fig, ax = self.__figure('plot', 3)
+
+      # Calc the mod, phase and group delay of all the transfers
+      if (tol is None):
+        w, mag, phase, grpdelay = response.BatchResponse.eval(H)
+      else:
+        with profiler.span('plot.adaptive'):
+          w, mag, phase, grpdelay = map(list, zip(*[response.AdaptiveResponse.adaptive(h, tol) for h in H]))
+
+      with profiler.span('plot.draw'):
+        # The curves of each axis are drawn as one collection decimated to its width
+        curves = [[], [], []]
+        for i, h in enumerate(H):
+          h, label = system.split(h)
+          f = (w if tol is None else w[i])/(2*np.pi)
+
+          if (isinstance(marker, str)):
+            with profiler.span('plot.marker'):
+              fc = response.AdaptiveResponse.crossings(h, -3)/(2*np.pi)
+              mod = response.AdaptiveResponse.peak(h)[1] - 3
+          else:
+            fc = [marker[0]] if marker[0] != 0 else []
+            mod = marker[1]
+
+          # The module, phase and group delay of the transfer
+          color = f'C{i}'
+          curves[0].append([f, mag[i], color, label])
+          curves[1].append([f, phase[i], color, None])
+          curves[2].append([f, grpdelay[i], color, None])
+          color = color if isinstance(marker, str) else 'green'
+          for x in fc:
+            for column in range(3):
+              ax[column].axvline(x, color=color, linestyle='--')
+          if (mod != 0):
+            ax[0].axhline(mod, color=color, linestyle='--')
+
+        for column in range(3):
+          lod.plot(ax[column], curves[column], xscale='log')
+
+        # Format the Bode plots
+        self.__format_plots(ax, title)
       
       # Finally show the plots
-      plt.show()
+      self.__finish(fig, output, title)
+
+      return w, mag, phase, grpdelay
+
+    # ******************************************************************************
+    # * @brief Plot signals over the time t [s], like the input and the output of a
+    # * filter. signals is a list of [y, label] or [y, label, color], all of them
+    # * sampled at t. The curves are decimated with method ('minmax' or 'lttb') to
+    # * the width of the figure every time it is drawn, so signals of millions of
+    # * samples render as fast as short ones and zooming in shows every sample.
+    # ******************************************************************************
+    def timeplot(self, t, signals, title="", output=None, method='minmax'):
+      fig, ax = self.__figure('timeplot', 1)
+      with profiler.span('plot.draw'):
+        curves = [[t, s[0], s[2] if len(s) > 2 else f'C{i}', s[1]] for i, s in enumerate(signals)]
+        lod.plot(ax, curves, method=method, linewidth=1)
+        ax.set_title(f'{title}')
+        ax.set_xlabel('t [s]')
+        ax.margins(0, 0.1)
+        ax.grid(alpha=0.3)
+        ax.legend(loc='best', shadow=True, framealpha=1)
+      return self.__finish(fig, output, title)
 
     # ******************************************************************************
     # * @brief Plot the zero-pole diagram
     # * H is a list of as many transfer functions you want to plot in the form [num, den, label]
+    # * or [AnalogFilter, label]
     # ******************************************************************************
-    def pzplot(self, H, wo=0, title = ""):
-      fig, ax = plt.subplots(1, 1)
+    def pzplot(self, H, wo=0, title = "", output=None):
+      fig, ax = self.__figure('pzplot', 1)
            
       for h in H:
-        num = h[0]
-        den = h[1]
-        label = ""
-        if (len(h)>=2):
-          label = h[2]
-        (zeros,poles,gain) = sp.signal.tf2zpk(num, den)
+        h, label = system.split(h)
+        # The AnalogFilter already has its poles and zeros, no need to find the roots
+        (zeros,poles,gain) = system.zpk(h)
         
         # Plot the poles and set marker properties
-        p = plt.plot(poles.real, poles.imag, 'x', markersize=9, alpha=1, label=label)
+        p = ax.plot(poles.real, poles.imag, 'x', markersize=9, alpha=1, label=label)
     
         # Plot the zeros and set marker properties
-        z = plt.plot(zeros.real, zeros.imag,  'o', markersize=9, 
+        z = ax.plot(zeros.real, zeros.imag,  'o', markersize=9, 
              color='none', alpha=1,
              markeredgecolor=p[0].get_color(), # same color as poles
              label=label)
@@ -135,33 +221,67 @@ class FreqResponse():
         circle = plt.Circle((0, 0), radius=wo, fill = False, color='black', ls='solid', alpha=0.3)
         ax.add_patch(circle)
       
-      plt.axis('square')
-      plt.xlabel('Real')
-      plt.ylabel('Imag')
-      plt.title(f'{title}')
-      plt.grid(b=True, which='both', axis='both')
-      plt.legend()
-      plt.show()
+      ax.axis('square')
+      ax.set_xlabel('Real')
+      ax.set_ylabel('Imag')
+      ax.set_title(f'{title}')
+      ax.grid(b=True, which='both', axis='both')
+      ax.legend()
+      return self.__finish(fig, output, title)
   
     # ******************************************************************************
     # * @brief Plot the bode diagram of each transfer.
     # ******************************************************************************
-    def bode(self, H):
-      control.bode_plot(H, grid=True)
-      plt.show()      
+    def bode(self, H, output=None):
+      fig, ax = self.__figure('bode', 0)
+      with profiler.span('plot.control'):
+        control.bode_plot(H, grid=True)
+      return self.__finish(fig, output, 'bode')
       
     # ******************************************************************************
     # * @brief Plot the pole-zero diagram of the system H
     # ******************************************************************************
-    def pzmap(self, H):
-      control.pzmap(H)
-      plt.show()
+    def pzmap(self, H, output=None):
+      fig, ax = self.__figure('pzmap', 0)
+      with profiler.span('plot.control'):
+        control.pzmap(H)
+      return self.__finish(fig, output, 'pzmap')
+
+    # ******************************************************************************
+    # * @brief Render a batch of figures in headless mode over a pool of processes.
+    # * jobs is a list of [method, args, output], like ['plot', (H, [fo,-3], "title"), "a.png"]
+    # * where output can also be None to get back the rendered bytes of the figure.
+    # * Returns the list of outputs (file names or bytes) in the same order as jobs
+    # ******************************************************************************
+    def render(jobs, processes=None, format='png', chunksize=8):
+      with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(render_job, jobs, [format]*len(jobs), chunksize=chunksize))
 
 # ******************************************************************************
 # * Object and variables Definitions
 # ******************************************************************************
+# matplotlib and control are only imported when a figure is drawn
+plt = lazy.LazyModule('matplotlib.pyplot')
+control = lazy.LazyModule('control')
+lod = lazy.LazyModule(__package__ + '.lod')
+
+# Headless plotter of each worker process, created on its first job and reused
+workerPlotter = None
 
 # ******************************************************************************
 # * Function Definitions
 # ******************************************************************************
 
+# ******************************************************************************
+# * @brief Render one job of FreqResponse.render in the current worker process
+# ******************************************************************************
+def render_job(job, format='png'):
+    global workerPlotter
+    if (workerPlotter is None or workerPlotter.format != format):
+        workerPlotter = FreqResponse(headless=True, format=format)
+    method, args, output = job
+    getattr(workerPlotter, method)(*args, output=output)
+    if (output is None):
+        return workerPlotter.buffer.getvalue()
+    return output
+
@@ -0,0 +1,364 @@
+# ******************************************************************************
+# * @file cache.py
+# * @author Pablo Joaquim
+# * @brief Memoization of the filter designs, with optional on-disk persistence,
+# * and the on-disk store of the computed frequency responses
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class DesignCache():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # * maxsize is the number of designs kept in memory and maxbytes, if given, the
+    # * most bytes their arrays can take altogether (least recently used are dropped
+    # * first), and path, if given, a sqlite file where designs are persisted
+    # ******************************************************************************
+    def __init__(self, maxsize=1024, path=None, maxbytes=None):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.path = path
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.db = None
+        self.pid = None
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<DesignCache(size={0}, maxsize={1}, path={2!r})>'.format(len(self.entries), self.maxsize, self.path)
+
+    # ******************************************************************************
+    # * @brief Obtain the canonical hash of a set of design parameters, like
+    # * ('butter', 'lowpass', order, wc). Numbers are normalized so 2 and 2.0 or
+    # * np.int64(2) and 2 give the same key.
+    # ******************************************************************************
+    def key(params):
+        def canonical(value):
+            if (isinstance(value, (str, bool)) or value is None):
+                return value
+            if (np.iscomplexobj(value)):
+                return [canonical(np.real(value)), canonical(np.imag(value))]
+            if (np.ndim(value) > 0):
+                return [canonical(v) for v in np.asarray(value).ravel().tolist()]
+            if (np.isfinite(value) and float(value) == int(value)):
+                return int(value)
+            return float(value).hex()
+        text = json.dumps([canonical(p) for p in params], separators=(',', ':'))
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    # ******************************************************************************
+    # * @brief Return the design stored for params, or call design() to obtain it and
+    # * keep it. The returned arrays are shared by every caller, so they are read-only
+    # ******************************************************************************
+    def get(self, params, design):
+        key = DesignCache.key(params)
+        with self.lock:
+            if (key in self.entries):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+
+        arrays = self.__load(key)
+        if (arrays is not None):
+            with self.lock:
+                self.diskHits += 1
+        else:
+            arrays = design()
+            with self.lock:
+                self.misses += 1
+            self.__save(key, arrays)
+
+        value = tuple(DesignCache.freeze(a) for a in arrays)
+        with self.lock:
+            if (key in self.entries):
+                self.bytes -= DesignCache.size(self.entries[key])
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            self.bytes += DesignCache.size(value)
+            while (len(self.entries) > self.maxsize or
+                   (self.maxbytes is not None and self.bytes > self.maxbytes and self.entries)):
+                self.bytes -= DesignCache.size(self.entries.popitem(last=False)[1])
+        return value
+
+    # ******************************************************************************
+    # * @brief Obtain the bytes taken by the arrays of an entry
+    # ******************************************************************************
+    def size(value):
+        return sum(a.nbytes for a in value)
+
+    # ******************************************************************************
+    # * @brief Obtain a read-only copy of an array
+    # ******************************************************************************
+    def freeze(a):
+        a = np.array(a)
+        a.setflags(write=False)
+        return a
+
+    # ******************************************************************************
+    # * @brief Return the hit/miss statistics of the cache
+    # ******************************************************************************
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'diskHits': self.diskHits, 'misses': self.misses,
+                    'size': len(self.entries), 'maxsize': self.maxsize, 'bytes': self.bytes,
+                    'maxbytes': self.maxbytes}
+
+    # ******************************************************************************
+    # * @brief Drop the designs kept in memory and reset the statistics
+    # ******************************************************************************
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.diskHits = 0
+            self.misses = 0
+
+    # ******************************************************************************
+    # * @brief Start persisting the designs in the sqlite file path (None to stop)
+    # ******************************************************************************
+    def persist(self, path):
+        with self.lock:
+            self.path = path
+            self.db = None
+
+    # ******************************************************************************
+    # * @brief Obtain the connection to the on-disk store, opening a new one in each
+    # * process since sqlite connections can't be shared after a fork
+    # ******************************************************************************
+    def __connect(self):
+        if (self.path is None):
+            return None
+        if (self.db is None or self.pid != os.getpid()):
+            self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            # Write-ahead log, so the readers of other processes don't wait for a writer
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('CREATE TABLE IF NOT EXISTS designs (key TEXT PRIMARY KEY, data BLOB)')
+            self.db.commit()
+            self.pid = os.getpid()
+        return self.db
+
+    # ******************************************************************************
+    # * @brief Load a design from the on-disk store, None if it isn't there
+    # ******************************************************************************
+    def __load(self, key):
+        with self.lock:
+            db = self.__connect()
+            if (db is None):
+                return None
+            row = db.execute('SELECT data FROM designs WHERE key = ?', (key,)).fetchone()
+        if (row is None):
+            return None
+        with np.load(io.BytesIO(row[0])) as data:
+            return [data[f'arr_{i}'] for i in range(len(data.files))]
+
+    # ******************************************************************************
+    # * @brief Save a design in the on-disk store
+    # ******************************************************************************
+    def __save(self, key, arrays):
+        with self.lock:
+            db = self.__connect()
+            if (db is None):
+                return
+            buffer = io.BytesIO()
+            np.savez(buffer, *arrays)
+            db.execute('INSERT OR REPLACE INTO designs (key, data) VALUES (?, ?)', (key, buffer.getvalue()))
+            db.commit()
+
+class ResponseStore():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # * path is the directory of the store: an index.sqlite file with one row per
+    # * entry (its canonical key, a short json description, size and last use) and
+    # * the arrays of each entry in its own uncompressed .npz file under blobs/.
+    # * When the blobs take more than maxbytes, the least recently used entries are
+    # * dropped. Several threads and processes can share the same directory.
+    # ******************************************************************************
+    def __init__(self, path, maxbytes=256*2**20):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        self.path = path
+        self.maxbytes = maxbytes
+        self.lock = threading.Lock()
+        self.db = None
+        self.pid = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<ResponseStore(path={0!r}, maxbytes={1})>'.format(self.path, self.maxbytes)
+
+    # ******************************************************************************
+    # * @brief Return the arrays stored for params (see DesignCache.key), as a dict,
+    # * or call compute() to obtain them and store them with the description
+    # * describe, a json serializable dict
+    # ******************************************************************************
+    def get(self, params, compute, describe=None):
+        arrays = self.load(params)
+        if (arrays is None):
+            arrays = compute()
+            self.save(params, arrays, describe)
+        return arrays
+
+    # ******************************************************************************
+    # * @brief Return the arrays stored for params as a dict, None if they aren't in
+    # * the store. An entry whose blob was removed meanwhile by another process is
+    # * dropped from the index and taken as missing
+    # ******************************************************************************
+    def load(self, params):
+        key = DesignCache.key(params)
+        with self.lock:
+            db = self.__connect()
+            row = db.execute('SELECT file FROM responses WHERE key = ?', (key,)).fetchone()
+            arrays = None
+            if (row is not None):
+                try:
+                    with np.load(os.path.join(self.path, row[0])) as data:
+                        arrays = {name: data[name] for name in data.files}
+                except (OSError, ValueError, zipfile.BadZipFile):
+                    db.execute('DELETE FROM responses WHERE key = ? AND file = ?', (key, row[0]))
+            if (arrays is None):
+                self.misses += 1
+                return None
+            db.execute('UPDATE responses SET accessed = ?, hits = hits + 1 WHERE key = ?', (time.time(), key))
+            self.hits += 1
+        return arrays
+
+    # ******************************************************************************
+    # * @brief Store the dict of arrays for params. The blob is written to a new file
+    # * and renamed, so readers never see it half written, and the entries over the
+    # * size limit are evicted in the same transaction that adds it. Entries larger
+    # * than the whole store are not kept
+    # ******************************************************************************
+    def save(self, params, arrays, describe=None):
+        key = DesignCache.key(params)
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        size = buffer.tell()
+        if (size > self.maxbytes):
+            return
+        name = os.path.join('blobs', f'{key}-{uuid.uuid4().hex[:12]}.npz')
+        with self.lock:
+            db = self.__connect()
+            target = os.path.join(self.path, name)
+            with open(target + '.tmp', 'wb') as f:
+                f.write(buffer.getvalue())
+            os.replace(target + '.tmp', target)
+            now = time.time()
+            removed = []
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                row = db.execute('SELECT file FROM responses WHERE key = ?', (key,)).fetchone()
+                if (row is not None):
+                    removed.append(row[0])
+                db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, 0)',
+                           (key, name, json.dumps(describe), size, now, now))
+                total = db.execute('SELECT SUM(size) FROM responses').fetchone()[0]
+                if (total > self.maxbytes):
+                    for old, file, bytes in db.execute('SELECT key, file, size FROM responses WHERE key != ? '
+                                                       'ORDER BY accessed', (key,)).fetchall():
+                        db.execute('DELETE FROM responses WHERE key = ?', (old,))
+                        removed.append(file)
+                        self.evictions += 1
+                        total -= bytes
+                        if (total <= self.maxbytes):
+                            break
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                removed = [name]
+                raise
+            finally:
+                # The files are removed once no row points to them
+                for file in removed:
+                    try:
+                        os.remove(os.path.join(self.path, file))
+                    except FileNotFoundError:
+                        pass
+
+    # ******************************************************************************
+    # * @brief Return the hit/miss statistics of this process and the size of the store
+    # ******************************************************************************
+    def stats(self):
+        with self.lock:
+            entries, size = self.__connect().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': entries, 'bytes': size, 'maxbytes': self.maxbytes}
+
+    # ******************************************************************************
+    # * @brief Remove every entry of the store and reset the statistics
+    # ******************************************************************************
+    def clear(self):
+        with self.lock:
+            db = self.__connect()
+            db.execute('BEGIN IMMEDIATE')
+            files = [row[0] for row in db.execute('SELECT file FROM responses').fetchall()]
+            db.execute('DELETE FROM responses')
+            db.execute('COMMIT')
+            for file in files:
+                try:
+                    os.remove(os.path.join(self.path, file))
+                except FileNotFoundError:
+                    pass
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    # ******************************************************************************
+    # * @brief Obtain the connection to the index, opening a new one in each process
+    # * since sqlite connections can't be shared after a fork. The transactions are
+    # * explicit, every other statement commits on its own
+    # ******************************************************************************
+    def __connect(self):
+        if (self.db is None or self.pid != os.getpid()):
+            os.makedirs(os.path.join(self.path, 'blobs'), exist_ok=True)
+            self.db = sqlite3.connect(os.path.join(self.path, 'index.sqlite'), timeout=30,
+                                      isolation_level=None, check_same_thread=False)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, file TEXT, params TEXT, '
+                            'size INTEGER, created REAL, accessed REAL, hits INTEGER)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS lru ON responses (accessed)')
+            self.pid = os.getpid()
+        return self.db
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
@@ -0,0 +1,202 @@
+# ******************************************************************************
+# * @file discrete.py
+# * @author Pablo Joaquim
+# * @brief Discretization of the analog filters to run them over sampled signals
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import numpy as np
+from . import cache
+from . import lazy
+from . import profiler
+from . import system
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class Discretizer():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # ******************************************************************************
+    def __init__(self):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        pass
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<Metadata(name={self.id!r})>'.format(self=self)
+
+    # ******************************************************************************
+    # * @brief Obtain the continuous state space (A, B, C, D) of a filter given as
+    # * (num, den) or as an AnalogFilter. It is always built as a cascade of second
+    # * order sections, the companion form of tf2ss is too badly scaled to find the
+    # * zeros of the discretized system
+    # ******************************************************************************
+    def ss(h):
+        if (not isinstance(h, system.AnalogFilter)):
+            h = system.AnalogFilter.from_ba(h[0], h[1])
+        return h.ss()
+
+    # ******************************************************************************
+    # * @brief Obtain the discrete second-order sections of the filter h sampled every
+    # * dt seconds with one of the methods:
+    # *   'foh'      first order hold, the same as lsim, see foh()
+    # *   'zoh'      zero order hold, the input is held constant between samples
+    # *   'bilinear' bilinear (Tustin) transform of the zeros and poles
+    # *   'matched'  matched-z, each root r is mapped to exp(r*dt)
+    # * Returns (sos, correction), where correction are the sections whose impulse
+    # * response times -u[0] must be added to match the lsim initial state (None when
+    # * the method doesn't need it). The result is cached, so it is obtained only once
+    # * for each (filter, dt, method).
+    # ******************************************************************************
+    def discretize(h, dt, method='foh'):
+        if (method not in ('foh', 'zoh', 'bilinear', 'matched')):
+            raise ValueError(f"Unknown method '{method}', it must be 'foh', 'zoh', 'bilinear' or 'matched'")
+        if (isinstance(h, system.AnalogFilter)):
+            params = ('zpk', method, dt) + h.zpk()
+        else:
+            params = ('ba', method, dt, h[0], h[1])
+        sos, correction = discreteCache.get(params, lambda: Discretizer.__discretize(h, dt, method))
+        if (len(correction) == 0):
+            correction = None
+        return sos, correction
+
+    # ******************************************************************************
+    # * @brief Discretize the filter, without going through the cache
+    # ******************************************************************************
+    @profiler.profiled('simulate.discretize')
+    def __discretize(h, dt, method):
+        correction = np.zeros((0, 6))
+        if (method == 'foh'):
+            model, initial = Discretizer.foh(h, dt)
+            sos = Discretizer.ss2sos(*model)
+            correction = Discretizer.ss2sos(*initial)
+        elif (method == 'zoh'):
+            sos = Discretizer.ss2sos(*Discretizer.zoh(h, dt))
+        else:
+            if (not isinstance(h, system.AnalogFilter)):
+                h = system.AnalogFilter.from_ba(h[0], h[1])
+            if (method == 'bilinear'):
+                sos = filters.zpk2sos(*filters.bilinear_zpk(h.z, h.p, h.k, fs=1/dt))
+            else:
+                sos = filters.zpk2sos(*Discretizer.matched(h, dt))
+        if (not (np.all(np.isfinite(sos)) and np.all(np.isfinite(correction)))):
+            raise ValueError(f"The filter can't be discretized with '{method}' every {dt} s, its sections aren't finite")
+        return sos, correction
+
+    # ******************************************************************************
+    # * @brief Discretize the filter with a zero order hold, returning the discrete
+    # * state space (Ad, Bd, C, D) where x[i+1] = Ad x[i] + Bd u[i]
+    # ******************************************************************************
+    def zoh(h, dt):
+        A, B, C, D = Discretizer.ss(h)
+        n = A.shape[0]
+        m = B.shape[1]
+        M = np.zeros((n + m, n + m))
+        M[:n, :n] = A*dt
+        M[:n, n:] = B*dt
+        E = linalg.expm(M)
+        return E[:n, :n], E[:n, n:], C, D
+
+    # ******************************************************************************
+    # * @brief Discretize an AnalogFilter with the matched-z transform. The zeros at
+    # * infinity are placed at z=-1 and the gain is matched at the frequency where the
+    # * analog response is largest below the Nyquist frequency
+    # ******************************************************************************
+    def matched(h, dt):
+        z = np.exp(h.z*dt)
+        p = np.exp(h.p*dt)
+        z = np.concatenate([z, -np.ones(len(p) - len(z))])
+
+        roots = np.abs(np.concatenate([h.z, h.p]))
+        roots = roots[roots > 0]
+        low = np.min(roots)/100 if len(roots) else 1e-3/dt
+        w = np.logspace(np.log10(min(low, 0.1/dt)), np.log10(np.pi/dt), 512)
+        analog = np.abs(h.freqresp(w))
+        i = np.argmax(analog)
+        zo = np.exp(1j*w[i]*dt)
+        k = analog[i]/np.abs(np.prod(zo - z)/np.prod(zo - p))
+        return z, p, k
+
+    # ******************************************************************************
+    # * @brief Discretize the filter with the same first order hold used by lsim, where
+    # * the input is linearly interpolated between samples:
+    # *     x[i] = Ad x[i-1] + G0 u[i-1] + G1 u[i],  x[0] = 0
+    # * With the state e[i] = x[i] - G1 u[i] it becomes the usual discrete system
+    # *     e[i+1] = Ad e[i] + (Ad G1 + G0) u[i],  y[i] = C e[i] + (D + C G1) u[i]
+    # * that starts from e[0] = -G1 u[0] instead of zero. That initial state adds to
+    # * the output -u[0] times the impulse response of (Ad, Ad G1, C, C G1).
+    # * Returns the state space of the system and the one of that correction.
+    # ******************************************************************************
+    def foh(h, dt):
+        A, B, C, D = Discretizer.ss(h)
+        n = A.shape[0]
+        m = B.shape[1]
+        M = np.zeros((n + 2*m, n + 2*m))
+        M[:n, :n] = A*dt
+        M[:n, n:n+m] = B*dt
+        M[n:n+m, n+m:] = np.identity(m)
+        E = linalg.expm(M)
+        Ad = E[:n, :n]
+        G1 = E[:n, n+m:]
+        G0 = E[:n, n:n+m] - G1
+        return (Ad, Ad @ G1 + G0, C, D + C @ G1), (Ad, Ad @ G1, C, C @ G1)
+
+    # ******************************************************************************
+    # * @brief Convert a discrete state space in second-order sections. The poles are
+    # * the eigenvalues of A and the zeros the finite generalized eigenvalues of the
+    # * system matrix, so the high order polynomials are never expanded, which would
+    # * lose the poles clustered near z=1 when the sample rate is high
+    # ******************************************************************************
+    def ss2sos(A, B, C, D):
+        n = A.shape[0]
+        if (n == 0):
+            return np.array([[D[0, 0], 0, 0, 1, 0, 0]])
+        if (not all(np.all(np.isfinite(X)) for X in (A, B, C, D))):
+            raise ValueError("The discrete state space isn't finite, the filter can't be discretized")
+        p = linalg.eigvals(A)
+        # Balance the state and scale the input and output before finding the zeros,
+        # B and C are several orders of magnitude smaller than A at high sample rates
+        scale = linalg.matrix_balance(A, permute=False, separate=True)[1][0]
+        Ab = A*scale[None, :]/scale[:, None]
+        Bb = B/scale[:, None]
+        Cb = C*scale[None, :]
+        b = np.linalg.norm(Bb) or 1
+        c = np.linalg.norm(Cb) or 1
+        M = np.block([[Ab, Bb/b], [Cb/c, D/(b*c)]])
+        N = np.zeros_like(M)
+        N[:n, :n] = np.identity(n)
+        alpha, beta = linalg.eigvals(M, N, homogeneous_eigvals=True)
+        finite = np.abs(beta) > 1e-9*np.abs(alpha)
+        z = alpha[finite]/beta[finite]
+
+        # The gain is matched at the point of the unit circle where H is largest,
+        # looked for on a log scale since at high sample rates the band is a tiny
+        # arc near z=1 and H is 1e-30 or less anywhere else
+        points = np.exp(1j*np.pi*np.concatenate([[0], np.logspace(-6, 0, 61)]))
+        H = np.array([(Cb @ linalg.solve(zo*np.identity(n) - Ab, Bb) + D)[0, 0] for zo in points])
+        i = np.argmax(np.abs(H))
+        k = np.real(H[i]*np.prod(points[i] - p)/np.prod(points[i] - z))
+        return filters.zpk2sos(z, p, k)
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+filters = lazy.LazyModule('scipy.signal')
+linalg = lazy.LazyModule('scipy.linalg')
+
+# Discrete second-order sections of each (filter, dt, method) already obtained
+discreteCache = cache.DesignCache(maxsize=256)
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
@@ -0,0 +1,66 @@
+# ******************************************************************************
+# * @file lazy.py
+# * @author Pablo Joaquim
+# * @brief Modules imported on first use, so the heavy dependencies (scipy.signal,
+# * matplotlib, control) are only loaded by the code paths that need them
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import importlib
+import sys
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class LazyModule():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # * name is the module to import, like 'scipy.signal'. It is imported the first
+    # * time one of its attributes is used, as in LazyModule('scipy.signal').butter
+    # ******************************************************************************
+    def __init__(self, name):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        state = 'loaded' if self.loaded() else 'not loaded'
+        return '<LazyModule(name={0!r}, {1})>'.format(self._name, state)
+
+    # ******************************************************************************
+    # * @brief Tell if the module has been imported, by this or any other code
+    # ******************************************************************************
+    def loaded(self):
+        return self._module is not None or self._name in sys.modules
+
+    # ******************************************************************************
+    # * @brief Import the module, if it wasn't yet, and return it
+    # ******************************************************************************
+    def load(self):
+        if (self._module is None):
+            self.__dict__['_module'] = importlib.import_module(self._name)
+        return self._module
+
+    # ******************************************************************************
+    # * @brief Any attribute not found in the proxy is taken from the module
+    # ******************************************************************************
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
@@ -0,0 +1,212 @@
+# ******************************************************************************
+# * @file lod.py
+# * @author Pablo Joaquim
+# * @brief Level of detail for large plots: the curves of an axis are drawn as a
+# * single LineCollection whose points are decimated, keeping their shape, down
+# * to the pixel width of the axis every time it is drawn
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import numpy as np
+from matplotlib.collections import LineCollection
+from . import profiler
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class Decimator():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # ******************************************************************************
+    def __init__(self):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        pass
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<Metadata(name={self.id!r})>'.format(self=self)
+
+    # ******************************************************************************
+    # * @brief Indexes of the points of y kept by the min/max decimation: y is cut in
+    # * buckets consecutive points and the lowest and the highest of each one are
+    # * kept, in their order, plus the first and the last point. At one bucket per
+    # * pixel the drawn envelope is the same as with every point
+    # ******************************************************************************
+    def minmax(y, buckets):
+        N = len(y)
+        size = -(-N//buckets)
+        B = -(-N//size)
+        finite = np.isfinite(y)
+        low = np.pad(np.where(finite, y, np.inf), (0, B*size - N), constant_values=np.inf).reshape(B, size)
+        high = np.pad(np.where(finite, y, -np.inf), (0, B*size - N), constant_values=-np.inf).reshape(B, size)
+        start = np.arange(B)*size
+        index = np.concatenate([[0, N - 1], start + np.argmin(low, axis=1), start + np.argmax(high, axis=1)])
+        return np.unique(np.minimum(index, N - 1))
+
+    # ******************************************************************************
+    # * @brief Indexes of the n points of (x, y) kept by the Largest-Triangle-Three-
+    # * Buckets decimation: the first and the last point, and from each of the n - 2
+    # * buckets in between the point that makes the largest triangle with the one
+    # * kept from the previous bucket and the mean of the next bucket
+    # ******************************************************************************
+    def lttb(x, y, n):
+        N = len(y)
+        if (n >= N or n < 3):
+            return np.arange(N)
+        edges = np.linspace(1, N - 1, n - 1).astype(int)
+        y = np.where(np.isfinite(y), y, np.nan)
+        index = np.empty(n, dtype=int)
+        index[0] = 0
+        index[-1] = N - 1
+        for i in range(n - 2):
+            a = index[i]
+            start, stop = edges[i], edges[i + 1]
+            following = slice(stop, edges[i + 2] if i + 2 < n - 1 else N)
+            xc = np.mean(x[following])
+            with np.errstate(invalid='ignore'):
+                yc = np.nanmean(y[following]) if np.isfinite(y[following]).any() else y[a]
+                area = np.abs((x[a] - xc)*(y[start:stop] - y[a]) - (x[a] - x[start:stop])*(yc - y[a]))
+            area = np.where(np.isnan(area), -1, area)
+            index[i + 1] = start + np.argmax(area)
+        return index
+
+    # ******************************************************************************
+    # * @brief The points of the curve (x, y), with x sorted, to draw between x0 and
+    # * x1 over pixels pixels: the visible ones (and one more at each side, so the
+    # * curve reaches the borders) decimated with method 'minmax' or 'lttb' when
+    # * there are more than two per pixel. With log, LTTB measures x in decades
+    # ******************************************************************************
+    def select(x, y, x0, x1, pixels, method='minmax', log=False):
+        low = max(np.searchsorted(x, min(x0, x1)) - 1, 0)
+        high = min(np.searchsorted(x, max(x0, x1), side='right') + 1, len(x))
+        x = x[low:high]
+        y = y[low:high]
+        buckets = max(int(pixels), 1)
+        if (len(x) <= 2*buckets):
+            return x, y
+        if (method == 'lttb'):
+            with np.errstate(all='ignore'):
+                index = Decimator.lttb(np.log10(x) if log else x, y, 2*buckets)
+        else:
+            index = Decimator.minmax(y, buckets)
+        return x[index], y[index]
+
+class LODCollection(LineCollection):
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # * method is the decimation of each curve, 'minmax' or 'lttb' (see Decimator).
+    # * The curves are added with add, and every time the collection is drawn the
+    # * part of them in the current view is decimated to the pixel width of the
+    # * axes, so zooming in shows the detail and the points drawn don't depend on
+    # * the length of the curves. The other arguments go to LineCollection.
+    # ******************************************************************************
+    def __init__(self, method='minmax', **kwargs):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        if (method not in ('minmax', 'lttb')):
+            raise ValueError(f"Unknown method '{method}', it must be 'minmax' or 'lttb'")
+        super().__init__([], **kwargs)
+        self.method = method
+        self.curves = []
+        self.view = None
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<LODCollection(curves={0}, method={1!r})>'.format(len(self.curves), self.method)
+
+    # ******************************************************************************
+    # * @brief Add the curve (x, y), sorting it by x if it isn't already
+    # ******************************************************************************
+    def add(self, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if (np.any(np.diff(x) < 0)):
+            order = np.argsort(x, kind='stable')
+            x, y = x[order], y[order]
+        self.curves.append((x, y))
+        self.view = None
+        self.stale = True
+
+    # ******************************************************************************
+    # * @brief The [[xmin, ymin], [xmax, ymax]] of the finite points of every curve,
+    # * leaving out x <= 0 on log axes
+    # ******************************************************************************
+    def limits(self, log=False):
+        low = np.array([np.inf, np.inf])
+        high = -low
+        for x, y in self.curves:
+            inside = np.isfinite(x) & np.isfinite(y) & ((x > 0) if log else True)
+            if (inside.any()):
+                low = np.minimum(low, [np.min(x[inside]), np.min(y[inside])])
+                high = np.maximum(high, [np.max(x[inside]), np.max(y[inside])])
+        return np.array([low, high])
+
+    # ******************************************************************************
+    # * @brief Decimate the curves for the current view and size of the axes, only
+    # * when they changed since the last time
+    # ******************************************************************************
+    def decimate(self):
+        ax = self.axes
+        x0, x1 = ax.get_xlim()
+        pixels = ax.get_window_extent().width
+        view = (x0, x1, pixels, len(self.curves))
+        if (view == self.view):
+            return
+        log = ax.get_xscale() == 'log'
+        with profiler.span('plot.lod'):
+            segments = []
+            for x, y in self.curves:
+                xs, ys = Decimator.select(x, y, x0, x1, pixels, self.method, log)
+                segments.append(np.column_stack([xs, ys]))
+            self.set_segments(segments)
+        profiler.count('plot.lod.points', sum(len(s) for s in segments))
+        self.view = view
+
+    # ******************************************************************************
+    # * @brief Draw the collection, decimated for the view being drawn
+    # ******************************************************************************
+    def draw(self, renderer):
+        if (self.axes is not None):
+            self.decimate()
+        super().draw(renderer)
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief Draw the curves [x, y, color, label] on ax as a single LODCollection
+# * with the given linewidth and alpha, add an empty line with the style of each
+# * labeled curve for the legend, and autoscale the axes to the whole curves.
+# * xscale is set before, so the limits leave out x <= 0 on log axes. Returns the
+# * collection.
+# ******************************************************************************
+def plot(ax, curves, method='minmax', linewidth=1.5, alpha=1.0, xscale='linear'):
+    ax.set_xscale(xscale)
+    collection = LODCollection(method, colors=[c[2] for c in curves], linewidths=linewidth, alpha=alpha)
+    for x, y, color, label in curves:
+        collection.add(x, y)
+        if (label):
+            ax.plot([], [], color=color, linewidth=linewidth, alpha=alpha, label=label)
+    ax.add_collection(collection, autolim=False)
+    limits = collection.limits(xscale == 'log')
+    if (np.all(np.isfinite(limits))):
+        ax.update_datalim(limits)
+    ax.autoscale_view()
+    return collection
@@ -0,0 +1,419 @@
+# ******************************************************************************
+# * @file metrics.py
+# * @author Pablo Joaquim
+# * @brief Figures of merit of many filter designs at once, computed from their
+# * poles and zeros without plotting anything
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import numpy as np
+from . import profiler
+from . import response
+from . import system
+from . import transient
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class FilterMetrics():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # ******************************************************************************
+    def __init__(self):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        pass
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<Metadata(name={self.id!r})>'.format(self=self)
+
+    # ******************************************************************************
+    # * @brief Obtain the metrics of every filter in H, given as AnalogFilter,
+    # * (num, den), [num, den(, label)] or [AnalogFilter(, label)], as a structured
+    # * array with one row per filter and the fields:
+    # *   peak         highest gain [dB], the reference of the other levels
+    # *   w3db         lowest and highest frequency where the gain is 3 dB under
+    # *                the peak [rad/s], the same one twice for lowpass and highpass
+    # *   ripple       max - min gain in the passband [dB]
+    # *   attenuation  peak - highest gain in the stopband [dB]
+    # *   gdpeak       highest group delay at any frequency [s]
+    # *   gdpassband   mean group delay in the passband [s]
+    # *   gdflatness   (max - min)/mean group delay in the passband, 0 when flat
+    # *   q            Q of each complex pole pair, highest first, padded with nan
+    # *   qmax         highest Q of the filter
+    # *   overshoot    step response overshoot over its final value [%]
+    # *   settling     time the step response takes to stay within settle (2%) of
+    # *                its final value [s], or of its peak when it ends at 0
+    # * wp and ws are the passband and stopband edges [rad/s] with the layout of
+    # * OrderSolver.solve: scalars or shape (len(H),) for lowpass and highpass, pairs
+    # * or shape (len(H), 2) for bandpass and bandstop, the band type taken from the
+    # * order of the edges. Without them ripple and attenuation are nan, and the
+    # * passband of the group delay is where the gain is within 3 dB of the peak.
+    # * The filters are processed in chunks of size, n is the number of points of
+    # * the frequency grids and of each block of the step responses.
+    # ******************************************************************************
+    @profiler.profiled('metrics.eval')
+    def eval(H, wp=None, ws=None, settle=0.02, n=1024, size=256):
+        H = [response.AdaptiveResponse.analog(h) for h in H]
+        if ((wp is None) != (ws is None)):
+            raise ValueError("Both wp and ws must be given")
+        if (wp is not None):
+            wp = np.asarray(wp, dtype=float)
+            ws = np.asarray(ws, dtype=float)
+            band = (wp.shape[-1:] == (2,))
+            shape = (len(H), 2) if band else (len(H),)
+            wp = np.broadcast_to(wp, shape)
+            ws = np.broadcast_to(ws, shape)
+
+        pairs = max([int(np.sum(np.imag(h.p) > 0)) for h in H] + [1])
+        out = np.full(len(H), np.nan, dtype=FilterMetrics.dtype(pairs))
+        profiler.count('metrics.filters', len(H))
+        for start in range(0, len(H), size):
+            rows = slice(start, start + size)
+            z = response.BatchResponse.stackroots([h.z for h in H[rows]])
+            p = response.BatchResponse.stackroots([h.p for h in H[rows]])
+            k = np.array([h.k for h in H[rows]], dtype=complex)
+            chunk = out[rows]
+            with profiler.span('metrics.frequency'):
+                FilterMetrics.frequency(chunk, z, p, k, n)
+            if (wp is not None):
+                with profiler.span('metrics.bands'):
+                    FilterMetrics.bands(chunk, z, p, k, wp[rows], ws[rows], n)
+            with profiler.span('metrics.step'):
+                FilterMetrics.step(chunk, z, p, k, settle, n)
+            chunk['q'], chunk['qmax'] = FilterMetrics.quality(p, pairs)
+        return out
+
+    # ******************************************************************************
+    # * @brief The dtype of the metrics, with room for the Q of pairs pole pairs
+    # ******************************************************************************
+    def dtype(pairs):
+        return np.dtype([('peak', float), ('w3db', float, (2,)), ('ripple', float), ('attenuation', float),
+                         ('gdpeak', float), ('gdpassband', float), ('gdflatness', float),
+                         ('q', float, (pairs,)), ('qmax', float), ('overshoot', float), ('settling', float)])
+
+    # ******************************************************************************
+    # * @brief Magnitude [dB] and group delay [s] at the log frequencies x, one row
+    # * per filter
+    # ******************************************************************************
+    def evaluate(z, p, k, x):
+        mag, phase, grpdelay = response.BatchResponse.evalroots(z, p, k, 10**x)
+        return mag, grpdelay
+
+    # ******************************************************************************
+    # * @brief Log frequency grid of each filter: n points two decades around its
+    # * roots and 8 more across the resonance of each complex pole. The unused
+    # * points repeat the upper end, so every row is sorted and has the same length
+    # ******************************************************************************
+    def grid(z, p, n):
+        roots = np.hstack([z, p])
+        size = np.abs(roots)
+        size = np.where(size > 0, size, np.nan)
+        with np.errstate(all='ignore'):
+            low = np.log10(np.nanmin(size, axis=1)/100)
+            high = np.log10(np.nanmax(size, axis=1)*100)
+        low = np.where(np.isfinite(low), low, -2)
+        high = np.where(np.isfinite(high), high, 2)
+        x = low[:, None] + (high - low)[:, None]*np.linspace(0, 1, n)
+        width = np.abs(p.real)[:, :, None]*np.array([-4, -2, -1, -0.5, 0.5, 1, 2, 4])
+        with np.errstate(all='ignore'):
+            extra = np.log10(p.imag[:, :, None] + width).reshape(len(p), -1)
+        inside = (extra > low[:, None]) & (extra < high[:, None]) & (p.imag[:, :, None] > 0).repeat(8, axis=2).reshape(len(p), -1)
+        extra = np.where(inside, extra, high[:, None])
+        return np.sort(np.hstack([x, extra]), axis=1)
+
+    # ******************************************************************************
+    # * @brief Refine the highest value of fn (values y over the log grid x) in each
+    # * row, narrowing the interval around each of the count highest local maxima
+    # * of the grid by sections of k points down to xtol, since the highest sample
+    # * needn't be next to the highest value when there are several peaks of about
+    # * the same height. Returns the highest values, one per row
+    # ******************************************************************************
+    def maximize(fn, x, y, k=16, xtol=1e-9, count=4):
+        y = np.where(np.isnan(y), -np.inf, y)
+        empty = np.isinf(y).all(axis=1)
+        edge = np.full((len(y), 1), -np.inf)
+        local = (y >= np.hstack([edge, y[:, :-1]])) & (y >= np.hstack([y[:, 1:], edge]))
+        count = min(count, x.shape[1])
+        i = np.argsort(-np.where(local, y, -np.inf), axis=1, kind='stable')[:, :count].ravel()
+        rows = np.repeat(np.arange(len(x)), count)
+        best = y[rows, i]
+        a = x[rows, np.maximum(i - 1, 0)]
+        b = x[rows, np.minimum(i + 1, x.shape[1] - 1)]
+        brackets = np.arange(len(a))
+        while (np.nanmax(b - a, initial=0) > xtol):
+            xs = a[:, None] + (b - a)[:, None]*np.linspace(0, 1, k)
+            ys = fn(xs.reshape(len(x), -1)).reshape(xs.shape)
+            ys = np.where(np.isnan(ys), -np.inf, ys)
+            i = np.argmax(ys, axis=1)
+            best = np.maximum(best, ys[brackets, i])
+            a = xs[brackets, np.maximum(i - 1, 0)]
+            b = xs[brackets, np.minimum(i + 1, k - 1)]
+        return np.where(empty, np.nan, np.max(best.reshape(len(x), count), axis=1))
+
+    # ******************************************************************************
+    # * @brief Peak gain, -3 dB frequencies, peak group delay and, when there are no
+    # * band edges, the group delay over the -3 dB band
+    # ******************************************************************************
+    def frequency(out, z, p, k, n, k2=16, xtol=1e-12):
+        x = FilterMetrics.grid(z, p, n)
+        mag, grpdelay = FilterMetrics.evaluate(z, p, k, x)
+        out['peak'] = FilterMetrics.maximize(lambda xs: FilterMetrics.evaluate(z, p, k, xs)[0], x, mag)
+        # The gain may peak at the ends, at w = 0 or, with as many zeros as poles, at w = inf
+        with np.errstate(all='ignore'):
+            dc = response.BatchResponse.evalroots(z, p, k, np.zeros((len(k), 1)))[0][:, 0]
+            proper = np.sum(~np.isnan(z.real), axis=1) == np.sum(~np.isnan(p.real), axis=1)
+            out['peak'] = np.fmax(out['peak'], np.fmax(dc, np.where(proper, 20*np.log10(np.abs(k)), np.nan)))
+        out['gdpeak'] = FilterMetrics.maximize(lambda xs: FilterMetrics.evaluate(z, p, k, xs)[1], x, grpdelay)
+
+        # Bracket the lowest and the highest crossing of peak - 3 dB, and narrow both
+        target = (out['peak'] - 3)[:, None]
+        above = mag >= target
+        change = above[:, :-1] != above[:, 1:]
+        found = change.any(axis=1)
+        rows = np.arange(len(x))
+        first = np.argmax(change, axis=1)
+        last = change.shape[1] - 1 - np.argmax(change[:, ::-1], axis=1)
+        a = np.column_stack([x[rows, first], x[rows, last]])
+        b = np.column_stack([x[rows, first + 1], x[rows, last + 1]])
+        while (np.max(b - a, initial=0) > xtol):
+            xs = a[:, :, None] + (b - a)[:, :, None]*np.linspace(0, 1, k2)
+            m = FilterMetrics.evaluate(z, p, k, xs.reshape(len(x), -1))[0].reshape(xs.shape)
+            side = m >= target[:, :, None]
+            steps = side[:, :, :-1] != side[:, :, 1:]
+            j = np.where(steps.any(axis=2), np.argmax(steps, axis=2), k2 - 2)
+            a = np.take_along_axis(xs, j[:, :, None], axis=2)[:, :, 0]
+            b = np.take_along_axis(xs, j[:, :, None] + 1, axis=2)[:, :, 0]
+        out['w3db'] = np.where(found[:, None], 10**((a + b)/2), np.nan)
+
+        # Group delay over the -3 dB band, replaced by bands() when there are edges
+        inside = above & np.isfinite(grpdelay)
+        FilterMetrics.delay(out, np.where(inside, grpdelay, np.nan), np.gradient(x, axis=1))
+
+    # ******************************************************************************
+    # * @brief Mean and flatness of the group delay d over the passband (the values
+    # * outside are nan), weighting each point by its share of log frequency
+    # ******************************************************************************
+    def delay(out, d, weight):
+        weight = np.where(np.isnan(d), 0, weight)
+        with np.errstate(all='ignore'):
+            mean = np.nansum(d*weight, axis=1)/np.sum(weight, axis=1)
+            out['gdpassband'] = mean
+            out['gdflatness'] = (np.nanmax(d, axis=1) - np.nanmin(d, axis=1))/np.abs(mean)
+
+    # ******************************************************************************
+    # * @brief Passband ripple, stopband attenuation and passband group delay from
+    # * the band edges, using lowpass, highpass, bandpass or bandstop bands as given
+    # * by the order of wp and ws
+    # ******************************************************************************
+    def bands(out, z, p, k, wp, ws, n):
+        # Each filter has up to two bands of each kind, [low, high] with shape
+        # (filters, 2), nan when unused. The open ends go three decades past the edges
+        nan = np.full(len(wp), np.nan)
+        if (wp.ndim == 1):
+            low = wp < ws
+            passLow = np.column_stack([np.where(low, wp/1e3, wp), nan])
+            passHigh = np.column_stack([np.where(low, wp, wp*1e3), nan])
+            stopLow = np.column_stack([np.where(low, ws, ws/1e3), nan])
+            stopHigh = np.column_stack([np.where(low, ws*1e3, ws), nan])
+        else:
+            stop = (wp[:, 0] < ws[:, 0])[:, None]
+            passLow = np.where(stop, np.column_stack([wp[:, 0]/1e3, wp[:, 1]]), np.column_stack([wp[:, 0], nan]))
+            passHigh = np.where(stop, np.column_stack([wp[:, 0], wp[:, 1]*1e3]), np.column_stack([wp[:, 1], nan]))
+            stopLow = np.where(stop, np.column_stack([ws[:, 0], nan]), np.column_stack([ws[:, 0]/1e3, ws[:, 1]]))
+            stopHigh = np.where(stop, np.column_stack([ws[:, 1], nan]), np.column_stack([ws[:, 0], ws[:, 1]*1e3]))
+
+        fn = lambda xs: FilterMetrics.evaluate(z, p, k, xs)
+        t = np.linspace(0, 1, n//2)
+        highest = lowest = stopband = np.full(len(wp), np.nan)
+        delays = []
+        weights = []
+        with np.errstate(all='ignore'):
+            for c in range(2):
+                x = np.log10(passLow[:, c:c+1]) + np.log10(passHigh[:, c:c+1]/passLow[:, c:c+1])*t
+                mag, grpdelay = fn(x)
+                highest = np.fmax(highest, FilterMetrics.maximize(lambda xs: fn(xs)[0], x, mag))
+                lowest = np.fmin(lowest, -FilterMetrics.maximize(lambda xs: -fn(xs)[0], x, -mag))
+                delays.append(np.where(np.isnan(x), np.nan, grpdelay))
+                weights.append(np.gradient(x, axis=1))
+
+                x = np.log10(stopLow[:, c:c+1]) + np.log10(stopHigh[:, c:c+1]/stopLow[:, c:c+1])*t
+                stopband = np.fmax(stopband, FilterMetrics.maximize(lambda xs: fn(xs)[0], x, fn(x)[0]))
+        out['ripple'] = highest - lowest
+        out['attenuation'] = out['peak'] - stopband
+        FilterMetrics.delay(out, np.hstack(delays), np.hstack(weights))
+
+    # ******************************************************************************
+    # * @brief Q = |p|/(2 |Re(p)|) of each complex pole pair, highest first
+    # ******************************************************************************
+    def quality(p, pairs):
+        with np.errstate(all='ignore'):
+            q = np.where(p.imag > 0, np.abs(p)/(2*np.abs(p.real)), np.nan)
+        q = -np.sort(-q, axis=1)
+        q = np.hstack([q, np.full((len(p), pairs), np.nan)])[:, :pairs]
+        with np.errstate(all='ignore'):
+            return q, np.where(np.isnan(q).all(axis=1), np.nan, np.nanmax(np.nan_to_num(q, nan=-np.inf), axis=1))
+
+    # ******************************************************************************
+    # * @brief Overshoot and settling time of the step response, obtained from the
+    # * residues of H(s)/s: y(t) = H(0) + sum(r_i exp(p_i t)). The roots are scaled
+    # * by the largest pole so the products don't overflow for high orders. Filters
+    # * with repeated poles are left to TransientResponse, which handles them.
+    # * The response is sampled in blocks of n points, 64 per period of the fastest
+    # * pole, as long as |y - H(0)| may still be over the peak or out of the band,
+    # * bounded by sum(|r_i| exp(Re(p_i) t)) or, for repeated poles, by the integral
+    # * of |h| from t on (TransientResponse.tail), and the peaks and the time the
+    # * response enters the band for the last time are refined from there.
+    # ******************************************************************************
+    def step(out, z, p, k, settle, n, blocks=100000):
+        used = ~np.isnan(p.real)
+        scale = np.nanmax(np.where(used, np.abs(p), np.nan), axis=1)
+        scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1)[:, None]
+        zn = z/scale
+        pn = p/scale
+        # The gain of the scaled filter
+        kn = k*scale[:, 0]**(np.sum(~np.isnan(z.real), axis=1) - np.sum(used, axis=1))
+
+        with np.errstate(all='ignore'):
+            final = np.real(kn*np.nanprod(np.where(np.isnan(zn), 1, -zn), axis=1)/np.nanprod(np.where(used, -pn, 1), axis=1))
+            diff = pn[:, :, None] - pn[:, None, :]
+            same = np.eye(pn.shape[1], dtype=bool)
+            distinct = np.nanmin(np.where(same | ~used[:, None, :] | ~used[:, :, None], np.inf, np.abs(diff)), axis=(1, 2)) > 1e-6
+            residue = kn[:, None]*np.prod(np.where(np.isnan(zn)[:, None, :], 1, pn[:, :, None] - zn[:, None, :]), axis=2)
+            residue = residue/np.prod(np.where(same | ~used[:, None, :], 1, diff), axis=2)/pn
+            residue = np.where(used, residue, 0)
+            slowest = np.nanmin(np.where(used, -pn.real, np.nan), axis=1)
+        stable = np.all(np.where(used, pn.real < 0, True), axis=1) & (slowest > 0)
+        analytic = distinct & stable
+        residue = np.where(analytic[:, None], residue, 0)
+
+        # Repeated poles are expanded with their multiplicity by TransientResponse
+        repeated = {}
+        for i in np.nonzero(~analytic & stable)[0]:
+            h = system.AnalogFilter(z[i][~np.isnan(z[i].real)], p[i][~np.isnan(p[i].real)], k[i])
+            repeated[i] = transient.TransientResponse(h)
+
+        # The step response at the times t of the filters rows, one row per filter
+        rows = np.arange(len(k))
+        def value(t, rows=rows):
+            y = np.repeat(final[rows, None], t.shape[1], axis=1)
+            for j in range(pn.shape[1]):
+                y += np.real(residue[rows, j:j+1]*np.exp(np.where(used[rows, j:j+1], pn[rows, j:j+1], 0)*t))
+            for r in np.nonzero(np.isin(rows, list(repeated)))[0]:
+                y[r] = repeated[rows[r]].step(t[r]/scale[rows[r], 0])
+            return y
+
+        # The bound of |y - final| from the times t on of the filters rows
+        def envelope(t, rows=rows):
+            with np.errstate(all='ignore'):
+                e = np.sum(np.abs(residue[rows])*np.exp(np.where(used[rows], pn[rows].real, 0)*t[:, None]), axis=1)
+            for r in np.nonzero(np.isin(rows, list(repeated)))[0]:
+                e[r] = repeated[rows[r]].tail(t[r]/scale[rows[r], 0])
+            return e
+
+        # The highest |y| and y*sign(final), block after block until no later value
+        # can be higher by more than 1e-9 of them
+        dt = 2*np.pi/64
+        sign = np.sign(final)
+        best = np.zeros((len(k), 2))
+        when = np.zeros((len(k), 2))
+        searching = np.nonzero(stable)[0]
+        for block in range(blocks):
+            if (len(searching) == 0):
+                break
+            t = np.broadcast_to(dt*(block*n + np.arange(n)), (len(searching), n))
+            y = value(t, searching)
+            for c, candidate in enumerate((np.abs(y), y*sign[searching, None])):
+                i = np.argmax(candidate, axis=1)
+                top = candidate[np.arange(len(searching)), i]
+                higher = top > best[searching, c]
+                best[searching[higher], c] = top[higher]
+                when[searching[higher], c] = t[higher, i[higher]]
+            bound = envelope(t[:, -1], searching)
+            more = np.abs(final[searching]) + bound > best[searching, 0]*(1 + 1e-9)
+            more |= (sign[searching] != 0) & (np.abs(final[searching]) + bound > best[searching, 1]*(1 + 1e-9))
+            searching = searching[more]
+        unbounded = np.isin(rows, searching)
+        with np.errstate(all='ignore'):
+            x = np.maximum(when[:, :1] + dt*np.array([-1, 0, 1]), 0)
+            peak = FilterMetrics.maximize(lambda tt: np.abs(value(tt)), x, np.abs(value(x)), count=1)
+            x = np.maximum(when[:, 1:] + dt*np.array([-1, 0, 1]), 0)
+            highest = FilterMetrics.maximize(lambda tt: value(tt)*sign[:, None], x, value(x)*sign[:, None], count=1)
+
+        # The reference of the band is the final value or, when the response ends
+        # at 0, its refined peak
+        reference = np.where(np.abs(final) > 1e-9*peak, np.abs(final), peak)
+        with np.errstate(all='ignore'):
+            overshoot = np.where(np.abs(final) == reference, 100*(highest - np.abs(final))/reference, np.nan)
+        out['overshoot'] = np.where(stable & ~unbounded, np.maximum(overshoot, 0), np.nan)
+
+        # A time T after which the bound keeps the response in the band, doubling
+        # it and then narrowing it by bisection
+        band = settle*reference
+        lower = np.zeros(len(k))
+        T = np.where(stable, dt*n, 0)
+        for i in range(64):
+            over = stable & (envelope(T) > band)
+            if (not over.any()):
+                break
+            lower = np.where(over, T, lower)
+            T = np.where(over, 2*T, T)
+        for i in range(20):
+            c = (lower + T)/2
+            inside = envelope(c) <= band
+            T = np.where(inside, c, T)
+            lower = np.where(inside, lower, c)
+
+        # The last sample out of the band, or the last peak between samples out of
+        # it (by a parabola over three samples), from T back, block after block
+        # overlapping by two samples so every sample has its two neighbours
+        a = np.zeros(len(k))
+        b = np.zeros(len(k))
+        searching = np.nonzero(stable & ~over)[0]
+        end = T.copy()
+        for block in range(blocks):
+            if (len(searching) == 0):
+                break
+            t = np.maximum(end[searching, None] - dt*np.arange(n)[::-1], 0)
+            g = np.abs(value(t, searching) - final[searching, None]) - band[searching, None]
+            with np.errstate(all='ignore'):
+                curvature = g[:, :-2] - 2*g[:, 1:-1] + g[:, 2:]
+                top = g[:, 1:-1] - (g[:, 2:] - g[:, :-2])**2/(8*curvature)
+                shift = (g[:, :-2] - g[:, 2:])/(2*curvature)
+            local = (g[:, 1:-1] >= g[:, :-2]) & (g[:, 1:-1] > g[:, 2:]) & (curvature < 0) & (top > 0)
+            outside = g > 0
+            outside[:, 1:-1] |= local
+            hit = outside.any(axis=1)
+            r = np.arange(len(searching))
+            last = np.minimum(n - 1 - np.argmax(outside[:, ::-1], axis=1), n - 2)
+            shift = np.hstack([np.zeros((len(searching), 1)), np.where(local, shift, 0), np.zeros((len(searching), 1))])
+            a[searching[hit]] = (t[r, last] + np.where(g[r, last] > 0, 0, shift[r, last]*dt))[hit]
+            b[searching[hit]] = t[r, last + 1][hit]
+            searching = searching[~hit & (t[:, 0] > 0)]
+            end[searching] -= dt*(n - 2)
+
+        # From there bisection to where the response enters the band
+        for i in range(50):
+            c = (a + b)/2
+            away = np.abs(value(c[:, None])[:, 0] - final) > band
+            a = np.where(away, c, a)
+            b = np.where(away, b, c)
+        settling = b/scale[:, 0]
+        out['settling'] = np.where(stable & ~over & ~np.isin(rows, searching), settling, np.nan)
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
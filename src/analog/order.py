@@ -0,0 +1,150 @@
+# ******************************************************************************
+# * @file order.py
+# * @author Pablo Joaquim
+# * @brief Minimum order and natural frequency of analog filters for many specs at once
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import numpy as np
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class OrderSolver():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # ******************************************************************************
+    def __init__(self):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        pass
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<Metadata(name={self.id!r})>'.format(self=self)
+
+    # ******************************************************************************
+    # * @brief Obtain the minimum order N and the natural frequency Wn [rad/s] of the
+    # * analog filters of the family 'butter' or 'cheby1' that meet each spec, with
+    # * the same closed-form formulas used by scipy.signal.buttord/cheb1ord.
+    # * wp and ws are the passband and stopband edges, with shape (n,) for lowpass
+    # * and highpass specs or (n, 2) for bandpass and bandstop ones, and the band
+    # * type of each spec is taken from the order of its edges. rp is the maximum
+    # * loss in the passband and rs the minimum attenuation in the stopband [dB],
+    # * scalars or arrays of shape (n,). The edges are broadcast against each
+    # * other, and a single lowpass or highpass spec can be given with scalars.
+    # * Returns N with shape (n,) and Wn with the same shape as wp, or N and Wn as
+    # * scalars for a scalar spec, like buttord/cheb1ord
+    # ******************************************************************************
+    def solve(wp, ws, rp, rs, family='butter'):
+        if (family not in ('butter', 'cheby1')):
+            raise ValueError(f"Unknown filter family '{family}'")
+        wp, ws = np.broadcast_arrays(np.asarray(wp, dtype=float), np.asarray(ws, dtype=float))
+        N, Wn = OrderSolver.__solve(np.atleast_1d(wp), np.atleast_1d(ws), rp, rs, family)
+        if (wp.ndim == 0):
+            return int(N[0]), float(Wn[0])
+        return N, Wn
+
+    # ******************************************************************************
+    # * @brief solve() over edges with shape (n,) or (n, 2)
+    # ******************************************************************************
+    def __solve(wp, ws, rp, rs, family):
+        band = (wp.ndim == 2)
+        GPASS = 10**(0.1*np.abs(np.asarray(rp, dtype=float)))*np.ones(len(wp))
+        GSTOP = 10**(0.1*np.abs(np.asarray(rs, dtype=float)))*np.ones(len(wp))
+
+        if (band):
+            stop = wp[:, 0] < ws[:, 0]
+            passb = wp.copy()
+            if (np.any(stop)):
+                passb[stop] = OrderSolver.bandstop_edges(wp[stop], ws[stop], GPASS[stop], GSTOP[stop], family)
+            nat = OrderSolver.natural(passb, ws, stop)
+        else:
+            low = wp < ws
+            passb = wp
+            nat = np.where(low, ws/wp, wp/ws)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            N = np.ceil(OrderSolver.order(nat, GPASS, GSTOP, family)).astype(int)
+
+        if (family == 'cheby1'):
+            # The natural frequencies are just the passband edges
+            return N, passb
+
+        with np.errstate(divide='ignore'):
+            W0 = (GPASS - 1.0)**(-1.0/(2.0*N))
+        if (not band):
+            return N, np.where(low, W0*passb, passb/W0)
+
+        W0 = W0[:, None]
+        width = (passb[:, 1] - passb[:, 0])[:, None]
+        product = (passb[:, 0]*passb[:, 1])[:, None]
+        discr = np.sqrt(width**2 + 4*W0**2*product)
+        Wstop = np.abs(np.hstack([(width + discr)/(2*W0), (width - discr)/(2*W0)]))
+        W0 = np.hstack([-W0, W0])
+        Wpass = np.abs(-W0*width/2.0 + np.sqrt(W0**2/4.0*width**2 + product))
+        return N, np.sort(np.where(stop[:, None], Wstop, Wpass), axis=1)
+
+    # ******************************************************************************
+    # * @brief Natural frequency of the lowpass prototype of bandpass and bandstop specs
+    # ******************************************************************************
+    def natural(passb, stopb, stop):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = (stopb**2 - (passb[:, 0]*passb[:, 1])[:, None])/(stopb*(passb[:, 0] - passb[:, 1])[:, None])
+            ratio = np.where(stop[:, None], 1/ratio, ratio)
+        return np.min(np.abs(ratio), axis=1)
+
+    # ******************************************************************************
+    # * @brief Non-integer order needed for the natural frequency nat
+    # ******************************************************************************
+    def order(nat, GPASS, GSTOP, family):
+        if (family == 'butter'):
+            return np.log10((GSTOP - 1.0)/(GPASS - 1.0))/(2*np.log10(nat))
+        return np.arccosh(np.sqrt((GSTOP - 1.0)/(GPASS - 1.0)))/np.arccosh(nat)
+
+    # ******************************************************************************
+    # * @brief Move each passband edge of the bandstop specs towards the stopband to
+    # * the point that gives the lowest order, as scipy does with fminbound, here with
+    # * a golden-section search run on all the specs at once
+    # ******************************************************************************
+    def bandstop_edges(passb, stopb, GPASS, GSTOP, family, xtol=1e-5):
+        edges = passb.copy()
+        ranges = ((0, passb[:, 0], stopb[:, 0] - 1e-12), (1, stopb[:, 1] + 1e-12, passb[:, 1]))
+        for ind, a, b in ranges:
+            def objective(wp):
+                trial = passb.copy()
+                trial[:, ind] = wp
+                nat = OrderSolver.natural(trial, stopb, np.ones(len(wp), dtype=bool))
+                return OrderSolver.order(nat, GPASS, GSTOP, family)
+
+            ratio = (np.sqrt(5) - 1)/2
+            a = a.copy()
+            b = b.copy()
+            c = b - ratio*(b - a)
+            d = a + ratio*(b - a)
+            fc = objective(c)
+            fd = objective(d)
+            while (np.max(b - a) > xtol):
+                left = fc < fd
+                b = np.where(left, d, b)
+                a = np.where(left, a, c)
+                c, d = np.where(left, b - ratio*(b - a), d), np.where(left, c, a + ratio*(b - a))
+                fc, fd = np.where(left, objective(c), fd), np.where(left, fc, objective(d))
+            edges[:, ind] = (a + b)/2
+        return edges
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
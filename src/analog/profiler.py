@@ -0,0 +1,239 @@
+# ******************************************************************************
+# * @file profiler.py
+# * @author Pablo Joaquim
+# * @brief Lightweight instrumentation of the stages of the analog package: timing
+# * spans, call counters and the size of the largest arrays
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class Profiler():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # * The profiler starts disabled, and then span() returns a shared context that
+    # * does nothing and count()/array() return right away, so the instrumented code
+    # * costs just a check of self.enabled. Up to maxEvents spans are kept as events
+    # * for the Chrome trace, the totals are always updated.
+    # ******************************************************************************
+    def __init__(self, maxEvents=1000000):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        self.enabled = False
+        self.maxEvents = maxEvents
+        self.lock = threading.Lock()
+        self.reset()
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<Profiler(enabled={0}, spans={1})>'.format(self.enabled, len(self.spans))
+
+    # ******************************************************************************
+    # * @brief Start recording
+    # ******************************************************************************
+    def enable(self):
+        self.enabled = True
+
+    # ******************************************************************************
+    # * @brief Stop recording, keeping what has been recorded so far
+    # ******************************************************************************
+    def disable(self):
+        self.enabled = False
+
+    # ******************************************************************************
+    # * @brief Forget everything recorded
+    # ******************************************************************************
+    def reset(self):
+        with self.lock:
+            # name: [calls, total ns, max ns]
+            self.spans = {}
+            self.counters = {}
+            # name: largest array size in bytes
+            self.arrays = {}
+            self.events = []
+            self.origin = time.perf_counter_ns()
+
+    # ******************************************************************************
+    # * @brief Return a context that times the code inside it under name
+    # ******************************************************************************
+    def span(self, name):
+        if (not self.enabled):
+            return noSpan
+        return Span(self, name)
+
+    # ******************************************************************************
+    # * @brief Add a timed span, from start to end in perf_counter_ns() units
+    # ******************************************************************************
+    def record(self, name, start, end):
+        elapsed = end - start
+        with self.lock:
+            stats = self.spans.get(name)
+            if (stats is None):
+                self.spans[name] = [1, elapsed, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+            if (len(self.events) < self.maxEvents):
+                self.events.append((name, start, elapsed, threading.get_ident()))
+
+    # ******************************************************************************
+    # * @brief Add n to the counter name
+    # ******************************************************************************
+    def count(self, name, n=1):
+        if (not self.enabled):
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    # ******************************************************************************
+    # * @brief Keep the size of the largest of the arrays seen under name
+    # ******************************************************************************
+    def array(self, name, *arrays):
+        if (not self.enabled):
+            return
+        size = max(getattr(a, 'nbytes', 0) for a in arrays)
+        with self.lock:
+            if (size > self.arrays.get(name, 0)):
+                self.arrays[name] = size
+
+    # ******************************************************************************
+    # * @brief Return the recorded spans, counters and array sizes as a text table,
+    # * with the spans sorted by their total time
+    # ******************************************************************************
+    def summary(self):
+        lines = [f"{'span':32} {'calls':>8} {'total [ms]':>12} {'mean [ms]':>11} {'max [ms]':>10}"]
+        with self.lock:
+            spans = sorted(self.spans.items(), key=lambda item: -item[1][1])
+            counters = sorted(self.counters.items())
+            arrays = sorted(self.arrays.items(), key=lambda item: -item[1])
+        for name, (calls, total, longest) in spans:
+            lines.append(f"{name:32} {calls:8d} {total/1e6:12.3f} {total/calls/1e6:11.3f} {longest/1e6:10.3f}")
+        if (counters):
+            lines.append("")
+            lines.append(f"{'counter':32} {'count':>8}")
+            lines += [f"{name:32} {value:8d}" for name, value in counters]
+        if (arrays):
+            lines.append("")
+            lines.append(f"{'largest array':32} {'size [MB]':>12}")
+            lines += [f"{name:32} {size/2**20:12.3f}" for name, size in arrays]
+        return "\n".join(lines)
+
+    # ******************************************************************************
+    # * @brief Write the spans in the Chrome trace event format, to be opened with
+    # * chrome://tracing or https://ui.perfetto.dev
+    # ******************************************************************************
+    def chrome(self, path):
+        with self.lock:
+            events = [{'name': name, 'ph': 'X', 'ts': (start - self.origin)/1e3, 'dur': elapsed/1e3,
+                       'pid': os.getpid(), 'tid': tid} for name, start, elapsed, tid in self.events]
+            events += [{'name': name, 'ph': 'C', 'ts': 0, 'pid': os.getpid(), 'args': {'count': value}}
+                       for name, value in self.counters.items()]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+class Span():
+    __slots__ = ('profiler', 'name', 'start')
+
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # ******************************************************************************
+    def __init__(self, profiler, name):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<Span(name={0!r})>'.format(self.name)
+
+    # ******************************************************************************
+    # * @brief Start timing when entering the with statement
+    # ******************************************************************************
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    # ******************************************************************************
+    # * @brief Record the span when leaving the with statement
+    # ******************************************************************************
+    def __exit__(self, *args):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns())
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+# The context returned by span() while the profiler is disabled
+noSpan = contextlib.nullcontext()
+
+# The profiler used by the whole package, enabled from the start when the
+# ANALOG_PROFILE environment variable is set
+default = Profiler()
+if (os.environ.get("ANALOG_PROFILE")):
+    default.enable()
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief Decorator that times every call of the function under name
+# ******************************************************************************
+def profiled(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if (not default.enabled):
+                return fn(*args, **kwargs)
+            with Span(default, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# ******************************************************************************
+# * @brief Shortcuts to the methods of the default profiler
+# ******************************************************************************
+def enable():
+    default.enable()
+
+def disable():
+    default.disable()
+
+def reset():
+    default.reset()
+
+def span(name):
+    return default.span(name)
+
+def count(name, n=1):
+    default.count(name, n)
+
+def array(name, *arrays):
+    default.array(name, *arrays)
+
+def summary():
+    return default.summary()
+
+def chrome(path):
+    default.chrome(path)
@@ -0,0 +1,182 @@
+# ******************************************************************************
+# * @file prototype.py
+# * @author Pablo Joaquim
+# * @brief Closed-form poles and zeros of the Butterworth and Chebyshev type I
+# * analog filters, and the lowpass to lowpass/highpass/bandpass/bandstop
+# * frequency transforms, with no polynomial root finding
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import numpy as np
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class Prototype():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # ******************************************************************************
+    def __init__(self):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        pass
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<Metadata(name={self.id!r})>'.format(self=self)
+
+    # ******************************************************************************
+    # * @brief Obtain (z, p, k) of the analog filter of the family 'butter' or
+    # * 'cheby1', the band type btype, order N and critical frequencies wn [rad/s]
+    # * (a pair for bandpass and bandstop), with the same conventions as
+    # * scipy.signal.butter/cheby1(..., analog=True, output='zpk')
+    # ******************************************************************************
+    def zpk(family, btype, N, wn, rp=None):
+        if (family == 'butter'):
+            z, p, k = Prototype.butter(N)
+        elif (family == 'cheby1'):
+            z, p, k = Prototype.cheby1(N, rp)
+        else:
+            raise ValueError(f"Unknown filter family '{family}'")
+
+        if (btype in ('bandpass', 'bandstop')):
+            w1, w2 = (float(w) for w in wn)
+            if (not 0 < w1 < w2):
+                raise ValueError("The band edges must be 0 < wn[0] < wn[1]")
+            wo = np.sqrt(w1*w2)
+            bw = w2 - w1
+            if (btype == 'bandpass'):
+                return Prototype.lp2bp(z, p, k, wo, bw)
+            return Prototype.lp2bs(z, p, k, wo, bw)
+        wo = float(np.squeeze(wn))
+        if (wo <= 0):
+            raise ValueError("The critical frequency must be positive")
+        if (btype == 'lowpass'):
+            return Prototype.lp2lp(z, p, k, wo)
+        if (btype == 'highpass'):
+            return Prototype.lp2hp(z, p, k, wo)
+        raise ValueError(f"Unknown band type '{btype}'")
+
+    # ******************************************************************************
+    # * @brief Poles of the normalized Butterworth lowpass of order N, evenly spaced
+    # * on the left half of the unit circle: p = -exp(j*pi*m/(2N)), m = -N+1..N-1
+    # ******************************************************************************
+    def butter(N):
+        if (N < 1):
+            raise ValueError("The order must be at least 1")
+        p = Prototype.conjugate(-np.exp(1j*np.pi*Prototype.half(N)/(2*N)), N)
+        return np.array([], dtype=complex), p, 1.0
+
+    # ******************************************************************************
+    # * @brief Poles of the normalized Chebyshev type I lowpass of order N and rp dB
+    # * of ripple, on an ellipse: p = -sinh(mu + j*pi*m/(2N)), mu = asinh(1/eps)/N.
+    # * The gain is 1 at w = 0 for odd orders and 1/sqrt(1 + eps^2) for even ones
+    # ******************************************************************************
+    def cheby1(N, rp):
+        if (N < 1):
+            raise ValueError("The order must be at least 1")
+        if (rp is None or rp <= 0):
+            raise ValueError("The passband ripple must be positive")
+        eps = np.sqrt(10**(0.1*rp) - 1.0)
+        mu = np.arcsinh(1/eps)/N
+        p = Prototype.conjugate(-np.sinh(mu + 1j*np.pi*Prototype.half(N)/(2*N)), N)
+        k = np.real(np.prod(-p))
+        if (N % 2 == 0):
+            k = k/np.sqrt(1 + eps*eps)
+        return np.array([], dtype=complex), p, k
+
+    # ******************************************************************************
+    # * @brief The indexes m = -N+1, -N+3, ... up to 0 (odd N) or -1 (even N) of the
+    # * roots in the upper half plane, plus the real one
+    # ******************************************************************************
+    def half(N):
+        return np.arange(-N + 1, 1, 2)
+
+    # ******************************************************************************
+    # * @brief Complete the roots of the indexes m <= 0 of an order N prototype with
+    # * their exact conjugates, in the order of m = -N+1..N-1, leaving the one of
+    # * m = 0 exactly real
+    # ******************************************************************************
+    def conjugate(roots, N):
+        pairs = roots[:N//2]
+        middle = roots[N//2:].real
+        return np.concatenate([pairs, middle, np.conj(pairs[::-1])])
+
+    # ******************************************************************************
+    # * @brief Scale the cutoff of a lowpass from 1 to wo: s -> s/wo
+    # ******************************************************************************
+    def lp2lp(z, p, k, wo):
+        degree = len(p) - len(z)
+        return wo*np.asarray(z), wo*np.asarray(p), k*wo**degree
+
+    # ******************************************************************************
+    # * @brief Lowpass to highpass of cutoff wo: s -> wo/s. The zeros at infinity
+    # * move to the origin
+    # ******************************************************************************
+    def lp2hp(z, p, k, wo):
+        z = np.asarray(z, dtype=complex)
+        p = np.asarray(p, dtype=complex)
+        degree = len(p) - len(z)
+        k = k*np.real(np.prod(-z)/np.prod(-p))
+        z = np.concatenate([wo/z, np.zeros(degree)])
+        return z, wo/p, k
+
+    # ******************************************************************************
+    # * @brief Lowpass to bandpass of center wo and width bw: s -> (s^2 + wo^2)/(s bw).
+    # * Each root r splits in the two roots of s^2 - r bw s + wo^2 = 0, and the
+    # * zeros at infinity leave as many at the origin
+    # ******************************************************************************
+    def lp2bp(z, p, k, wo, bw):
+        z = np.asarray(z, dtype=complex)
+        p = np.asarray(p, dtype=complex)
+        degree = len(p) - len(z)
+        z = np.concatenate([Prototype.split(z*bw/2, wo), np.zeros(degree)])
+        return z, Prototype.split(p*bw/2, wo), k*bw**degree
+
+    # ******************************************************************************
+    # * @brief Lowpass to bandstop of center wo and width bw: s -> s bw/(s^2 + wo^2).
+    # * The zeros at infinity go to +-j wo
+    # ******************************************************************************
+    def lp2bs(z, p, k, wo, bw):
+        z = np.asarray(z, dtype=complex)
+        p = np.asarray(p, dtype=complex)
+        degree = len(p) - len(z)
+        k = k*np.real(np.prod(-z)/np.prod(-p))
+        z = np.concatenate([Prototype.split((bw/2)/z, wo), np.full(degree, 1j*wo), np.full(degree, -1j*wo)])
+        return z, Prototype.split((bw/2)/p, wo), k
+
+    # ******************************************************************************
+    # * @brief The two roots a +- sqrt(a^2 - wo^2) of s^2 - 2 a s + wo^2 = 0 for
+    # * every a, the larger one first. The smaller one is taken as wo^2 over the
+    # * larger, so the narrow bands don't lose digits to the cancellation
+    # ******************************************************************************
+    def split(a, wo):
+        root = np.sqrt(a*a - wo*wo)
+        # Pick the sign that adds up the two terms
+        root = np.where(np.real(np.conj(a)*root) >= 0, root, -root)
+        large = a + root
+        return np.concatenate([large, wo*wo/large])
+
+    # ******************************************************************************
+    # * @brief Expand (z, p, k) as the real (num, den) polynomials
+    # ******************************************************************************
+    def ba(z, p, k):
+        num = np.real(k*np.poly(z)) if len(z) else np.array([np.real(k)])
+        den = np.real(np.poly(p))
+        return np.atleast_1d(num), den
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
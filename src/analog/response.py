@@ -0,0 +1,414 @@
+# ******************************************************************************
+# * @file response.py
+# * @author Pablo Joaquim
+# * @brief Batch evaluation of the frequency response of several transfers at once,
+# * and adaptive evaluation of a single one with the exact -3 dB and band edges
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import hashlib
+import os
+
+import numpy as np
+from . import cache
+from . import lazy
+from . import profiler
+from . import system
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class BatchResponse():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # ******************************************************************************
+    def __init__(self):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        pass
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<Metadata(name={self.id!r})>'.format(self=self)
+
+    # ******************************************************************************
+    # * @brief Stack the num and den of each transfer in two 2D arrays, padding the
+    # * polynomials with leading zeros up to the highest order in the batch.
+    # * H is a list of transfer functions in the form [num, den(, label)]
+    # ******************************************************************************
+    def stack(H):
+        nums = [np.atleast_1d(np.asarray(h[0], dtype=float)) for h in H]
+        dens = [np.atleast_1d(np.asarray(h[1], dtype=float)) for h in H]
+        K = max(len(c) for c in nums + dens)
+        num = np.zeros((len(H), K))
+        den = np.zeros((len(H), K))
+        for i in range(len(H)):
+            num[i, K-len(nums[i]):] = nums[i]
+            den[i, K-len(dens[i]):] = dens[i]
+        return num, den
+
+    # ******************************************************************************
+    # * @brief Stack the roots of each filter in a 2D array, padding with nan up to
+    # * the highest number of roots in the batch
+    # ******************************************************************************
+    def stackroots(roots):
+        R = max([len(r) for r in roots] + [0])
+        out = np.full((len(roots), R), np.nan, dtype=complex)
+        for i in range(len(roots)):
+            out[i, :len(roots[i])] = roots[i]
+        return out
+
+    # ******************************************************************************
+    # * @brief Obtain a single frequency grid [rad/s] covering the poles and zeros of
+    # * every transfer in H, using the same criteria as scipy.signal.bode
+    # ******************************************************************************
+    def grid(H, n=100):
+        lfreq = np.inf
+        hfreq = -np.inf
+        for h in H:
+            h, label = system.split(h)
+            if (isinstance(h, system.AnalogFilter)):
+                w = sp.signal.findfreqs(h.z, h.p, 2, kind='zp')
+            else:
+                w = sp.signal.findfreqs(h[0], h[1], 2)
+            lfreq = min(lfreq, np.log10(w[0]))
+            hfreq = max(hfreq, np.log10(w[-1]))
+        return np.logspace(lfreq, hfreq, n)
+
+    # ******************************************************************************
+    # * @brief Evaluate the polynomials in the rows of coefs and their derivatives
+    # * at every point of s, returning two arrays of shape (len(coefs), len(s))
+    # ******************************************************************************
+    def polyval(coefs, s):
+        K = coefs.shape[1]
+        dcoefs = coefs[:, :-1] * np.arange(K-1, 0, -1)
+        val = np.zeros((coefs.shape[0], len(s)), dtype=complex)
+        dval = np.zeros((coefs.shape[0], len(s)), dtype=complex)
+        # Horner's rule, vectorized over all the transfers and frequencies
+        for k in range(K):
+            val = val*s + coefs[:, k:k+1]
+            if (k < K-1):
+                dval = dval*s + dcoefs[:, k:k+1]
+        return val, dval
+
+    # ******************************************************************************
+    # * @brief Evaluate the magnitude [dB], unwrapped phase [degrees] and the group
+    # * delay [seconds] of every transfer in H over a common frequency grid w [rad/s].
+    # * Transfers given as [num, den(, label)] are evaluated with evalba and the ones
+    # * given as [AnalogFilter(, label)] with evalzpk.
+    # * Returns w and three arrays of shape (len(H), len(w)), one row per transfer
+    # ******************************************************************************
+    @profiler.profiled('response.eval')
+    def eval(H, w=None, n=100):
+        systems = [system.split(h)[0] for h in H]
+        if (w is None and store is not None):
+            # The common grid of the transfers is also stored, so nothing is evaluated
+            params = sum((BatchResponse.params(h) for h in systems), ('grid', n))
+            w = store.get(params, lambda: {'w': BatchResponse.grid(H, n)}, {'kind': 'common grid', 'points': n})['w']
+        if (w is None):
+            w = BatchResponse.grid(H, n)
+        w = np.asarray(w, dtype=float)
+        if (store is not None):
+            return BatchResponse.stored(systems, w)
+        mag, phase, grpdelay = BatchResponse.compute(systems, w)
+        return w, mag, phase, grpdelay
+
+    # ******************************************************************************
+    # * @brief Look up in the response store the response of each transfer over w,
+    # * computing all the missing ones at once and storing them, along with the
+    # * zeros and poles of each transfer
+    # ******************************************************************************
+    def stored(systems, w):
+        grid = hashlib.sha1(np.ascontiguousarray(w).tobytes()).hexdigest()
+        params = [BatchResponse.params(h) + ('grid', grid) for h in systems]
+        mag = np.empty((len(systems), len(w)))
+        phase = np.empty((len(systems), len(w)))
+        grpdelay = np.empty((len(systems), len(w)))
+        missing = []
+        with profiler.span('response.store'):
+            for i in range(len(systems)):
+                arrays = store.load(params[i])
+                if (arrays is None):
+                    missing.append(i)
+                else:
+                    mag[i], phase[i], grpdelay[i] = arrays['mag'], arrays['phase'], arrays['grpdelay']
+        if (missing):
+            mag[missing], phase[missing], grpdelay[missing] = BatchResponse.compute([systems[i] for i in missing], w)
+            with profiler.span('response.store'):
+                for i in missing:
+                    z, p, k = system.zpk(systems[i])
+                    store.save(params[i], {'w': w, 'mag': mag[i], 'phase': phase[i], 'grpdelay': grpdelay[i], 'z': z, 'p': p},
+                               {'kind': 'grid', 'order': len(p), 'points': len(w), 'wmin': w[0], 'wmax': w[-1]})
+        profiler.count('response.stored', len(systems) - len(missing))
+        return w, mag, phase, grpdelay
+
+    # ******************************************************************************
+    # * @brief The canonical parameters of a transfer in the response store, its
+    # * (z, p, k) for an AnalogFilter and its (num, den) otherwise
+    # ******************************************************************************
+    def params(h):
+        if (isinstance(h, system.AnalogFilter)):
+            return ('zpk',) + tuple(h.zpk())
+        return ('ba', np.trim_zeros(np.atleast_1d(h[0]), 'f'), np.atleast_1d(h[1]))
+
+    # ******************************************************************************
+    # * @brief Evaluate the transfers of systems (AnalogFilter or (num, den)) over w,
+    # * returning mag, phase and grpdelay with one row per transfer
+    # ******************************************************************************
+    def compute(systems, w):
+        zpk = [i for i in range(len(systems)) if isinstance(systems[i], system.AnalogFilter)]
+        ba = [i for i in range(len(systems)) if not isinstance(systems[i], system.AnalogFilter)]
+
+        mag = np.empty((len(systems), len(w)))
+        phase = np.empty((len(systems), len(w)))
+        grpdelay = np.empty((len(systems), len(w)))
+        for rows, evaluate in ((ba, BatchResponse.evalba), (zpk, BatchResponse.evalzpk)):
+            if (len(rows) > 0):
+                mag[rows], phase[rows], grpdelay[rows] = evaluate([systems[i] for i in rows], w)
+        profiler.count('response.transfers', len(systems))
+        profiler.array('response.eval', mag, phase, grpdelay)
+        return mag, phase, grpdelay
+
+    # ******************************************************************************
+    # * @brief Evaluate the response of a list of (num, den) transfers over w [rad/s].
+    # * The group delay is obtained analytically as Re{D'(s)/D(s) - N'(s)/N(s)} at s=jw
+    # ******************************************************************************
+    @profiler.profiled('response.evalba')
+    def evalba(H, w):
+        s = 1j*w
+        num, den = BatchResponse.stack(H)
+        N, dN = BatchResponse.polyval(num, s)
+        D, dD = BatchResponse.polyval(den, s)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            h = N/D
+            mag = 20*np.log10(np.abs(h))
+            phase = np.unwrap(np.angle(h), axis=-1)*180/np.pi
+            grpdelay = np.real(dD/D - dN/N)
+        return mag, phase, grpdelay
+
+    # ******************************************************************************
+    # * @brief Evaluate the response of a list of AnalogFilter over w [rad/s] adding
+    # * up the contribution of each zero and pole, so the cost is linear in the order
+    # * and there is no overflow for high orders. The phase is the sum of the angles
+    # * of each root, so it doesn't need to be unwrapped, and the group delay is
+    # * sum(Re{1/(jw-p)}) - sum(Re{1/(jw-z)})
+    # ******************************************************************************
+    @profiler.profiled('response.evalzpk')
+    def evalzpk(H, w):
+        z = BatchResponse.stackroots([h.z for h in H])
+        p = BatchResponse.stackroots([h.p for h in H])
+        k = np.array([h.k for h in H])
+        return BatchResponse.evalroots(z, p, k, w)
+
+    # ******************************************************************************
+    # * @brief Evaluate the response of the filters with the zeros z and poles p in
+    # * the rows of two arrays padded with nan (see stackroots) and the gains k, over
+    # * w [rad/s], a common grid or one grid per row with shape (len(k), n)
+    # ******************************************************************************
+    def evalroots(z, p, k, w):
+        s = 1j*np.asarray(w, dtype=float)
+        shape = (len(k), s.shape[-1])
+        mag = np.zeros(shape)
+        phase = np.zeros(shape)
+        grpdelay = np.zeros(shape)
+        k = np.asarray(k)[:, None]
+        mag += 20*np.log10(np.abs(k))
+        phase += np.angle(k)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for roots, sign in ((z, 1), (p, -1)):
+                for r in range(roots.shape[1]):
+                    root = roots[:, r:r+1]
+                    used = ~np.isnan(root.real)
+                    term = np.where(used, s - np.where(used, root, 0), 1)
+                    mag += sign*20*np.log10(np.abs(term))
+                    phase += sign*np.angle(term)
+                    grpdelay -= sign*np.where(used, np.real(1/term), 0)
+        return mag, phase*180/np.pi, grpdelay
+
+class AdaptiveResponse():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # ******************************************************************************
+    def __init__(self):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        pass
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<Metadata(name={self.id!r})>'.format(self=self)
+
+    # ******************************************************************************
+    # * @brief Obtain a filter given as (num, den), [num, den(, label)] or
+    # * [AnalogFilter(, label)] as an AnalogFilter
+    # ******************************************************************************
+    def analog(h):
+        if (not isinstance(h, system.AnalogFilter)):
+            h = system.split(h)[0]
+        if (not isinstance(h, system.AnalogFilter)):
+            h = system.AnalogFilter.from_ba(h[0], h[1])
+        return h
+
+    # ******************************************************************************
+    # * @brief Magnitude [dB], phase [degrees] and group delay [seconds] of a single
+    # * AnalogFilter over w [rad/s]
+    # ******************************************************************************
+    def evaluate(h, w):
+        mag, phase, grpdelay = BatchResponse.evalzpk([h], np.asarray(w, dtype=float))
+        return mag[0], phase[0], grpdelay[0]
+
+    # ******************************************************************************
+    # * @brief Initial grid: n log spaced points two decades around the roots, plus
+    # * points across the resonance of each root close to the jw axis, spaced by
+    # * fractions of its distance to the axis, where the response changes fastest
+    # ******************************************************************************
+    def initial(h, n=32):
+        roots = np.concatenate([h.z, h.p])
+        size = np.abs(roots)
+        size = size[size > 0]
+        low = np.min(size)/100 if len(size) else 0.01
+        high = np.max(size)*100 if len(size) else 100
+        w = [np.logspace(np.log10(low), np.log10(high), n)]
+        for r in roots:
+            if (np.imag(r) > 0 and abs(np.real(r)) < 0.5*abs(r)):
+                width = max(abs(np.real(r)), 1e-6*abs(r))
+                w.append(np.imag(r) + width*np.array([-4, -2, -1, -0.5, -0.25, 0.25, 0.5, 1, 2, 4]))
+        w = np.concatenate(w)
+        return np.unique(w[(w >= low) & (w <= high)])
+
+    # ******************************************************************************
+    # * @brief Evaluate the response of a filter over a grid refined until the
+    # * magnitude [dB] and phase [degrees] at the middle (in log w) of every interval
+    # * differ from the line between its ends less than tol and phasetol. Intervals
+    # * whose ends are both floor dB below the peak aren't refined. Returns w, mag,
+    # * phase and grpdelay, with at most maxpoints points.
+    # ******************************************************************************
+    def adaptive(h, tol=0.01, phasetol=0.5, n=32, maxpoints=20000, floor=120):
+        h = AdaptiveResponse.analog(h)
+        if (store is not None):
+            params = BatchResponse.params(h) + ('adaptive', tol, phasetol, n, maxpoints, floor)
+            def compute():
+                w, mag, phase, grpdelay = AdaptiveResponse.refine(h, tol, phasetol, n, maxpoints, floor)
+                return {'w': w, 'mag': mag, 'phase': phase, 'grpdelay': grpdelay, 'z': h.z, 'p': h.p}
+            with profiler.span('response.store'):
+                arrays = store.get(params, compute, {'kind': 'adaptive', 'order': len(h.p), 'tol': tol})
+            return arrays['w'], arrays['mag'], arrays['phase'], arrays['grpdelay']
+        return AdaptiveResponse.refine(h, tol, phasetol, n, maxpoints, floor)
+
+    # ******************************************************************************
+    # * @brief The adaptive refinement of the grid, see adaptive
+    # ******************************************************************************
+    def refine(h, tol, phasetol, n, maxpoints, floor):
+        w = AdaptiveResponse.initial(h, n)
+        mag, phase, grpdelay = AdaptiveResponse.evaluate(h, w)
+        # Intervals still to check, by the index of their left end
+        check = np.arange(len(w) - 1)
+        while (len(check) > 0 and len(w) < maxpoints):
+            x = np.log10(w)
+            mid = 10**((x[check] + x[check + 1])/2)
+            m, p, g = AdaptiveResponse.evaluate(h, mid)
+            a = (np.log10(mid) - x[check])/(x[check + 1] - x[check])
+            with np.errstate(invalid='ignore'):
+                error = np.abs(m - (mag[check] + a*(mag[check + 1] - mag[check])))
+                errorPhase = np.abs(p - (phase[check] + a*(phase[check + 1] - phase[check])))
+                deep = np.maximum(mag[check], mag[check + 1]) < np.max(mag) - floor
+                refine = ~deep & ((error > tol) | (errorPhase > phasetol) | ~np.isfinite(error))
+
+            # Keep every evaluated point, the refined intervals are split in two
+            order = np.argsort(np.concatenate([w, mid]), kind='stable')
+            position = np.argsort(order)[len(w):]
+            w = np.concatenate([w, mid])[order]
+            mag = np.concatenate([mag, m])[order]
+            phase = np.concatenate([phase, p])[order]
+            grpdelay = np.concatenate([grpdelay, g])[order]
+            refined = position[refine]
+            check = np.concatenate([refined - 1, refined])
+            # Don't split intervals that are already at the float resolution
+            check = check[np.diff(np.log10(w))[check] > 1e-12]
+        return w, mag, phase, grpdelay
+
+    # ******************************************************************************
+    # * @brief Find the peak of the magnitude [dB], returning (w, mag). It starts
+    # * from the highest point of the grid w (the adaptive grid if not given) and
+    # * narrows the interval between its neighbours by sections of k points at a time
+    # * down to xtol in log w. The gain may peak at the ends instead, at w = 0 or,
+    # * with as many zeros as poles, at w = inf
+    # ******************************************************************************
+    def peak(h, w=None, k=32, xtol=1e-12):
+        h = AdaptiveResponse.analog(h)
+        if (w is None):
+            w = AdaptiveResponse.adaptive(h)[0]
+        mag = AdaptiveResponse.evaluate(h, w)[0]
+        i = int(np.argmax(mag))
+        a = np.log10(w[max(i - 1, 0)])
+        b = np.log10(w[min(i + 1, len(w) - 1)])
+        best = (mag[i], w[i])
+        while (b - a > xtol):
+            x = np.linspace(a, b, k)
+            m = AdaptiveResponse.evaluate(h, 10**x)[0]
+            i = int(np.argmax(m))
+            best = max(best, (m[i], 10**x[i]))
+            a = x[max(i - 1, 0)]
+            b = x[min(i + 1, k - 1)]
+        with np.errstate(divide='ignore'):
+            best = max(best, (AdaptiveResponse.evaluate(h, [0])[0][0], 0.0))
+            if (len(h.z) == len(h.p)):
+                best = max(best, (20*np.log10(np.abs(h.k)), np.inf))
+        return best[1], best[0]
+
+    # ******************************************************************************
+    # * @brief Find every frequency [rad/s] where the magnitude crosses level dB
+    # * relative to the peak (or to reference dB if given), like level=-3 for the
+    # * -3 dB frequencies or level=-rp for the edges of the Chebyshev ripple band.
+    # * The crossings are bracketed on the adaptive grid and then narrowed all at
+    # * once, by sections of k points, down to xtol in log w.
+    # ******************************************************************************
+    def crossings(h, level=-3.0, reference=None, k=32, xtol=1e-13):
+        h = AdaptiveResponse.analog(h)
+        w, mag, phase, grpdelay = AdaptiveResponse.adaptive(h)
+        if (reference is None):
+            reference = AdaptiveResponse.peak(h, w, k)[1]
+        target = reference + level
+        above = mag >= target
+        i = np.nonzero(above[:-1] != above[1:])[0]
+        a = np.log10(w[i])
+        b = np.log10(w[i + 1])
+        while (len(a) > 0 and np.max(b - a) > xtol):
+            x = a[:, None] + (b - a)[:, None]*np.linspace(0, 1, k)
+            m = AdaptiveResponse.evaluate(h, 10**x.ravel())[0].reshape(x.shape)
+            change = (m[:, :-1] >= target) != (m[:, 1:] >= target)
+            # First section where the side changes, the last one if rounding hid it
+            j = np.where(change.any(axis=1), np.argmax(change, axis=1), k - 2)
+            rows = np.arange(len(a))
+            a = x[rows, j]
+            b = x[rows, j + 1]
+        return 10**((a + b)/2)
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+sp = lazy.LazyModule('scipy')
+
+# The computed responses are kept on disk when RESPONSE_STORE_PATH is set (or a
+# cache.ResponseStore is assigned here), and looked up there before evaluating
+store = None
+if (os.environ.get("RESPONSE_STORE_PATH")):
+    store = cache.ResponseStore(os.environ["RESPONSE_STORE_PATH"],
+                                maxbytes=int(os.environ.get("RESPONSE_STORE_MAX_BYTES", 256*2**20)))
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
@@ -0,0 +1,212 @@
+# ******************************************************************************
+# * @file sigio.py
+# * @author Pablo Joaquim
+# * @brief Block by block reading and writing of signals stored on disk
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+
+import numpy as np
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class SignalReader():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # * path is a signal file in one of the formats:
+    # *   'npy'  numpy .npy file, of shape (samples,) or (samples, channels)
+    # *   'raw'  raw binary samples of the given dtype, interleaved when there are
+    # *          several channels, starting at offset bytes
+    # *   'text' one line per sample with one column per channel, the number of
+    # *          channels is taken from the first line if it is not given
+    # * The format is guessed from the extension if it is not given. The file is
+    # * mapped in memory, so only the blocks being read are loaded.
+    # ******************************************************************************
+    def __init__(self, path, format=None, dtype=np.float64, channels=None, offset=0):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        self.path = path
+        self.format = format or guess(path)
+        self.channels = channels or 1
+        empty = (os.path.getsize(path) <= offset)
+        if (self.format == 'npy'):
+            self.data = np.load(path, mmap_mode='r')
+            self.channels = 1 if self.data.ndim == 1 else self.data.shape[1]
+        elif (self.format == 'raw'):
+            self.data = np.zeros(0, dtype=dtype) if empty else np.memmap(path, dtype=dtype, mode='r', offset=offset)
+            if (self.channels > 1):
+                self.data = self.data[:len(self.data) - len(self.data) % self.channels].reshape(-1, self.channels)
+        elif (self.format == 'text'):
+            self.data = np.zeros(0, dtype=np.uint8) if empty else np.memmap(path, dtype=np.uint8, mode='r', offset=offset)
+            if (channels is None):
+                line = self.data[:4096].tobytes().split(b'\n', 1)[0]
+                self.channels = max(1, len(line.replace(b',', b' ').split()))
+        else:
+            raise ValueError(f"Unknown format '{self.format}', it must be 'npy', 'raw' or 'text'")
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<SignalReader(path={0!r}, format={1!r}, channels={2})>'.format(self.path, self.format, self.channels)
+
+    # ******************************************************************************
+    # * @brief Return the number of samples, or None for text files, where it isn't
+    # * known without parsing the whole file
+    # ******************************************************************************
+    def length(self):
+        if (self.format == 'text'):
+            return None
+        return len(self.data)
+
+    # ******************************************************************************
+    # * @brief Generate the signal in blocks of up to size samples, with shape (n,)
+    # * or (n, channels). The blocks of the binary formats are views of the mapped
+    # * file, with no copy. The text blocks are parsed from about size lines.
+    # ******************************************************************************
+    def blocks(self, size=262144):
+        if (self.format != 'text'):
+            for start in range(0, len(self.data), size):
+                yield self.data[start:start+size]
+            return
+
+        step = size*24*self.channels
+        rest = b''
+        for start in range(0, len(self.data), step):
+            text = rest + self.data[start:start+step].tobytes()
+            end = text.rfind(b'\n') + 1
+            if (end == 0 and start + step < len(self.data)):
+                rest = text
+                continue
+            if (start + step >= len(self.data)):
+                end = len(text)
+            rest = text[end:]
+            values = parse(text[:end], self.channels)
+            if (len(values)):
+                yield values
+
+class SignalWriter():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # * path is the file to write in the same formats as SignalReader. When the number
+    # * of samples (length) is known the binary files are mapped in memory and each
+    # * block is stored straight in its place, otherwise the blocks are appended and
+    # * the .npy header is completed by close().
+    # ******************************************************************************
+    def __init__(self, path, format=None, dtype=np.float64, channels=1, length=None):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        self.path = path
+        self.format = format or guess(path)
+        self.dtype = np.dtype(dtype)
+        self.channels = channels
+        self.position = 0
+        self.data = None
+        self.file = None
+        if (self.format not in ('npy', 'raw', 'text')):
+            raise ValueError(f"Unknown format '{self.format}', it must be 'npy', 'raw' or 'text'")
+
+        shape = (length,) if channels == 1 else (length, channels)
+        if (length is not None and self.format == 'npy'):
+            self.data = np.lib.format.open_memmap(path, mode='w+', dtype=self.dtype, shape=shape)
+        elif (length is not None and self.format == 'raw' and length > 0):
+            self.data = np.memmap(path, dtype=self.dtype, mode='w+', shape=shape)
+        elif (self.format == 'text'):
+            self.file = open(path, 'w')
+        else:
+            self.file = open(path, 'wb')
+            if (self.format == 'npy'):
+                # Room for the header, it is written again with the final shape
+                self.file.write(header(self.dtype, shape[:0] + (0,) + shape[1:]))
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<SignalWriter(path={0!r}, format={1!r}, samples={2})>'.format(self.path, self.format, self.position)
+
+    # ******************************************************************************
+    # * @brief Use the writer in a with statement, closing it at the end
+    # ******************************************************************************
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # ******************************************************************************
+    # * @brief Append a block of samples, of shape (n,) or (n, channels)
+    # ******************************************************************************
+    def write(self, block):
+        block = np.asarray(block)
+        if (self.data is not None):
+            self.data[self.position:self.position+len(block)] = block
+        elif (self.format == 'text'):
+            np.savetxt(self.file, block, fmt='%.17g')
+        else:
+            # Written from the buffer of the block, it is copied only to change its type
+            self.file.write(np.ascontiguousarray(block, dtype=self.dtype).data)
+        self.position += len(block)
+
+    # ******************************************************************************
+    # * @brief Flush the data to the file and close it
+    # ******************************************************************************
+    def close(self):
+        if (self.data is not None):
+            self.data.flush()
+            self.data = None
+        if (self.file is not None):
+            if (self.format == 'npy'):
+                shape = (self.position,) if self.channels == 1 else (self.position, self.channels)
+                self.file.seek(0)
+                self.file.write(header(self.dtype, shape))
+            self.file.close()
+            self.file = None
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+# Size in bytes of the .npy headers written by SignalWriter, enough for any shape
+headerSize = 128
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief Guess the format of a signal file from its extension
+# ******************************************************************************
+def guess(path):
+    extension = os.path.splitext(path)[1].lower()
+    if (extension == '.npy'):
+        return 'npy'
+    if (extension in ('.txt', '.csv', '.dat')):
+        return 'text'
+    return 'raw'
+
+# ******************************************************************************
+# * @brief Parse whitespace or comma separated values in rows of channels columns
+# ******************************************************************************
+def parse(text, channels=1):
+    values = np.fromstring(text.replace(b',', b' ').decode(), dtype=float, sep=' ')
+    if (channels > 1):
+        values = values[:len(values) - len(values) % channels].reshape(-1, channels)
+    return values
+
+# ******************************************************************************
+# * @brief Build a version 1.0 .npy header of headerSize bytes, padded with spaces
+# * so it can be rewritten in place once the final shape is known
+# ******************************************************************************
+def header(dtype, shape):
+    description = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': tuple(shape)})
+    description = description.encode('latin1').ljust(headerSize - 10 - 1) + b'\n'
+    return b'\x93NUMPY\x01\x00' + len(description).to_bytes(2, 'little') + description
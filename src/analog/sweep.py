@@ -0,0 +1,262 @@
+# ******************************************************************************
+# * @file sweep.py
+# * @author Pablo Joaquim
+# * @brief Parameter sweeps of filter designs evaluated on a pool of processes
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import itertools
+import json
+import signal
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from . import filters
+from . import response
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class Sweep():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # * grid is a dict with the list of values of each parameter, like
+    # *   {"family": ["butter", "cheby1"], "btype": ["lowpass"], "order": [1, 2, 3, 4],
+    # *    "wc": [6283.18], "rp": [0.5, 1]}
+    # * where bandpass/bandstop designs take "wci" and "wcs" instead of "wc". A value
+    # * can also be {"start": a, "stop": b, "num": n} for n values evenly spaced, or
+    # * {"start": a, "stop": b, "num": n, "log": true} for them to be log spaced.
+    # ******************************************************************************
+    def __init__(self, grid):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        self.grid = {name: Sweep.values(value) for name, value in grid.items()}
+        self.results = None
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<Sweep(points={0})>'.format(len(self))
+
+    # ******************************************************************************
+    # * @brief Return the number of points of the grid (before dropping duplicates)
+    # ******************************************************************************
+    def __len__(self):
+        return int(np.prod([len(v) for v in self.grid.values()]))
+
+    # ******************************************************************************
+    # * @brief Load the grid from a json file
+    # ******************************************************************************
+    def load(path):
+        with open(path) as f:
+            return Sweep(json.load(f))
+
+    # ******************************************************************************
+    # * @brief Expand the definition of the values of a parameter
+    # ******************************************************************************
+    def values(value):
+        if (isinstance(value, dict)):
+            if (value.get('log', False)):
+                return list(np.logspace(np.log10(value['start']), np.log10(value['stop']), value['num']))
+            return list(np.linspace(value['start'], value['stop'], value['num']))
+        if (isinstance(value, (list, tuple))):
+            return list(value)
+        return [value]
+
+    # ******************************************************************************
+    # * @brief Return the table of all the designs of the grid, with the metrics
+    # * columns still empty. The ripple doesn't apply to the Butterworth designs, so
+    # * they are taken only once and their rp is left as nan. The bandpass and
+    # * bandstop points must have wci < wcs.
+    # ******************************************************************************
+    def points(self):
+        defaults = {'family': 'butter', 'btype': 'lowpass', 'order': 5, 'rp': 1}
+        names = list(self.grid.keys())
+        designs = {}
+        for combination in itertools.product(*self.grid.values()):
+            point = dict(defaults, **dict(zip(names, combination)))
+            if (point['btype'] in ('bandpass', 'bandstop')):
+                wci, wcs = point['wci'], point['wcs']
+                if (not wci < wcs):
+                    raise ValueError(f"The {point['btype']} edges must have wci < wcs, not wci={wci} and wcs={wcs}")
+            else:
+                wci = wcs = point['wc']
+            rp = point['rp'] if point['family'] == 'cheby1' else np.nan
+            key = (point['family'], point['btype'], int(point['order']), float(wci), float(wcs), float(rp))
+            designs[str(key)] = key
+
+        table = np.zeros(len(designs), dtype=resultType)
+        for i, name in enumerate(('family', 'btype', 'order', 'wci', 'wcs', 'rp')):
+            table[name] = [key[i] for key in designs.values()]
+        return table
+
+    # ******************************************************************************
+    # * @brief Evaluate every point of the grid on a pool of processes, in chunks of
+    # * chunk points. The results are written as each chunk finishes in self.results
+    # * and, if out is given, in a .npy file mapped in memory, so what has been
+    # * computed so far is kept if the run is interrupted (the 'done' column tells
+    # * which rows are filled). Returns the structured array with the results.
+    # ******************************************************************************
+    def run(self, out=None, workers=None, chunk=256):
+        table = self.points()
+        if (out is not None):
+            self.results = np.lib.format.open_memmap(out, mode='w+', dtype=resultType, shape=table.shape)
+            self.results[:] = table
+        else:
+            self.results = table
+
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=ignoreSigint)
+        try:
+            jobs = {}
+            for start in range(0, len(table), chunk):
+                jobs[pool.submit(evaluate, table[start:start+chunk])] = start
+            for job in as_completed(jobs):
+                rows = job.result()
+                self.results[jobs[job]:jobs[job]+len(rows)] = rows
+        finally:
+            # Either finished or interrupted (e.g. by the SIGINT handler of main.py).
+            # The rows done so far are saved first, and the pending chunks are
+            # cancelled one by one (cancel_futures of shutdown needs Python 3.9)
+            if (out is not None):
+                self.results.flush()
+            for job in jobs:
+                job.cancel()
+            pool.shutdown(wait=False)
+        return self.results
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+# The columns of the results table
+resultType = np.dtype([('family', 'U8'), ('btype', 'U8'), ('order', 'i4'),
+                       ('wci', 'f8'), ('wcs', 'f8'), ('rp', 'f8'),
+                       ('peak', 'f8'), ('w3dbLow', 'f8'), ('w3dbHigh', 'f8'),
+                       ('ripple', 'f8'), ('maxGroupDelay', 'f8'), ('done', '?')])
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief Let the SIGINT reach only the main process, which stops the sweep
+# ******************************************************************************
+def ignoreSigint():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+# ******************************************************************************
+# * @brief Design the filters of a chunk of points and evaluate their metrics all
+# * at once over a common frequency grid:
+# *   peak           maximum of |H(jw)| [dB], w = 0 and w = inf included
+# *   w3dbLow/High   lowest/highest frequency [rad/s] with |H| above peak - 3 dB,
+# *                  nan when |H| is still above it at the end of the grid (the
+# *                  lower edge of a lowpass, or the upper one of a highpass). For
+# *                  the bandstop designs, the lowest/highest frequency with |H|
+# *                  under peak - 3 dB, the inner edges of the stopband
+# *   ripple         max - min of |H| [dB] in the passband between the design edges
+# *   maxGroupDelay  maximum group delay [seconds]
+# * The peak and the -3 dB edges are bracketed on the grid and then narrowed, like
+# * AdaptiveResponse.peak and AdaptiveResponse.crossings do.
+# ******************************************************************************
+def evaluate(rows, n=1024):
+    rows = rows.copy()
+    H = []
+    for row in rows:
+        wn = [row['wci'], row['wcs']] if row['btype'] in ('bandpass', 'bandstop') else row['wci']
+        H.append(filters.design(str(row['family']), str(row['btype']), int(row['order']), wn,
+                                rp=row['rp'], output='zpk'))
+    z = response.BatchResponse.stackroots([h.z for h in H])
+    p = response.BatchResponse.stackroots([h.p for h in H])
+    k = np.array([h.k for h in H])
+
+    w = np.logspace(np.log10(np.min(rows['wci'])) - 2, np.log10(np.max(rows['wcs'])) + 2, n)
+    mag, phase, grpdelay = response.BatchResponse.evalroots(z, p, k, w)
+    mag = np.where(np.isfinite(mag), mag, -np.inf)
+    x = np.log10(w)
+    i = np.argmax(mag, axis=1)
+    peak = np.maximum(np.max(mag, axis=1), summit(z, p, k, x[np.maximum(i - 1, 0)], x[np.minimum(i + 1, n - 1)]))
+    # The gain may peak at the ends, at w = 0 or, with as many zeros as poles, at w = inf
+    with np.errstate(all='ignore'):
+        dc = response.BatchResponse.evalroots(z, p, k, np.zeros(1))[0][:, 0]
+        proper = np.sum(~np.isnan(z.real), axis=1) == np.sum(~np.isnan(p.real), axis=1)
+        peak = np.fmax(peak, np.fmax(dc, np.where(proper, 20*np.log10(np.abs(k)), np.nan)))
+    rows['peak'] = peak
+
+    # -3 dB edges, between the grid points around them
+    above = mag >= (peak - 3)[:, None]
+    first = np.argmax(above, axis=1)
+    last = n - 1 - np.argmax(above[:, ::-1], axis=1)
+    low = np.where(first > 0, x[np.maximum(first - 1, 0)], np.nan)
+    high = np.where(last < n - 1, x[np.minimum(last + 1, n - 1)], np.nan)
+    lowEnd = x[first]
+    highStart = x[last]
+    # and for the bandstop designs, around the first and last point under it
+    stop = (rows['btype'] == 'bandstop') & ~above.all(axis=1)
+    first = np.argmax(~above, axis=1)
+    last = n - 1 - np.argmax(~above[:, ::-1], axis=1)
+    low = np.where(stop, np.where(first > 0, x[np.maximum(first - 1, 0)], np.nan), low)
+    high = np.where(stop, np.where(last < n - 1, x[np.minimum(last + 1, n - 1)], np.nan), high)
+    lowEnd = np.where(stop, x[first], lowEnd)
+    highStart = np.where(stop, x[last], highStart)
+    rows['w3dbLow'] = refine(z, p, k, low, lowEnd, peak - 3)
+    rows['w3dbHigh'] = refine(z, p, k, highStart, high, peak - 3)
+
+    # Passband between the design edges
+    low = rows['wci'][:, None]
+    high = rows['wcs'][:, None]
+    passband = np.where((rows['btype'] == 'lowpass')[:, None], w <= high,
+               np.where((rows['btype'] == 'highpass')[:, None], w >= low,
+               np.where((rows['btype'] == 'bandpass')[:, None], (w >= low) & (w <= high),
+                        (w <= low) | (w >= high))))
+    inside = np.where(passband, mag, np.nan)
+    with np.errstate(invalid='ignore'):
+        rows['ripple'] = np.nanmax(inside, axis=1) - np.nanmin(inside, axis=1)
+        rows['maxGroupDelay'] = np.nanmax(np.where(np.isfinite(grpdelay), grpdelay, np.nan), axis=1)
+    rows['done'] = True
+    return rows
+
+# ******************************************************************************
+# * @brief Largest magnitude [dB] of each filter (the roots z, p and gains k of
+# * BatchResponse.evalroots) between the log10(w) a and b of its row, narrowed
+# * all at once by sections of points points down to xtol
+# ******************************************************************************
+def summit(z, p, k, a, b, points=32, xtol=1e-10):
+    best = np.full(len(k), -np.inf)
+    rows = np.arange(len(k))
+    while (np.max(b - a, initial=0) > xtol):
+        x = a[:, None] + (b - a)[:, None]*np.linspace(0, 1, points)
+        mag = response.BatchResponse.evalroots(z, p, k, 10**x)[0]
+        mag = np.where(np.isfinite(mag), mag, -np.inf)
+        i = np.argmax(mag, axis=1)
+        best = np.maximum(best, mag[rows, i])
+        a = x[rows, np.maximum(i - 1, 0)]
+        b = x[rows, np.minimum(i + 1, points - 1)]
+    return best
+
+# ******************************************************************************
+# * @brief Frequency [rad/s] where the magnitude of each filter crosses its level
+# * between the log10(w) a and b of its row, narrowed all at once by sections of
+# * points points down to xtol. The rows where a or b is nan have no crossing
+# * and give nan.
+# ******************************************************************************
+def refine(z, p, k, a, b, level, points=32, xtol=1e-13):
+    result = np.full(len(k), np.nan)
+    rows = np.nonzero(np.isfinite(a) & np.isfinite(b))[0]
+    z, p, k, a, b, level = z[rows], p[rows], k[rows], a[rows], b[rows], level[rows]
+    while (len(rows) > 0 and np.max(b - a) > xtol):
+        x = a[:, None] + (b - a)[:, None]*np.linspace(0, 1, points)
+        above = response.BatchResponse.evalroots(z, p, k, 10**x)[0] >= level[:, None]
+        change = above[:, :-1] != above[:, 1:]
+        # First section where the side changes, the last one if rounding hid it
+        j = np.where(change.any(axis=1), np.argmax(change, axis=1), points - 2)
+        index = np.arange(len(rows))
+        a = x[index, j]
+        b = x[index, j + 1]
+    result[rows] = 10**((a + b)/2)
+    return result
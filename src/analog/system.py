@@ -0,0 +1,222 @@
+# ******************************************************************************
+# * @file system.py
+# * @author Pablo Joaquim
+# * @brief Analog filter kept in zeros-poles-gain / second-order sections form
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import numpy as np
+from . import lazy
+from . import profiler
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class AnalogFilter():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # * The filter is defined by its zeros z, poles p and gain k. The polynomial and
+    # * second-order sections forms are only obtained if they are asked for.
+    # ******************************************************************************
+    def __init__(self, z, p, k):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        self.z = np.atleast_1d(np.asarray(z, dtype=complex))
+        self.p = np.atleast_1d(np.asarray(p, dtype=complex))
+        self.k = float(np.real(k))
+        self.__ba = None
+        self.__sos = None
+        self.__ss = None
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<AnalogFilter(order={0}, zeros={1}, k={2!r})>'.format(self.order(), len(self.z), self.k)
+
+    # ******************************************************************************
+    # * @brief Create the filter from its numerator and denominator polynomials
+    # ******************************************************************************
+    def from_ba(num, den):
+        z, p, k = filters.tf2zpk(num, den)
+        return AnalogFilter(z, p, k)
+
+    # ******************************************************************************
+    # * @brief Create the filter from an array of analog second-order sections
+    # ******************************************************************************
+    def from_sos(sos):
+        z, p, k = filters.sos2zpk(sos)
+        # sos2zpk adds a zero and a pole at the origin for each first order section
+        z, p = AnalogFilter.cancel(z, p)
+        h = AnalogFilter(z, p, k)
+        h.__sos = np.array(sos, dtype=float)
+        return h
+
+    # ******************************************************************************
+    # * @brief Remove the zeros and poles that are at the same place
+    # ******************************************************************************
+    def cancel(z, p):
+        z = list(z)
+        p = list(p)
+        for root in list(z):
+            for i in range(len(p)):
+                if (root == p[i]):
+                    z.remove(root)
+                    del p[i]
+                    break
+        return np.array(z, dtype=complex), np.array(p, dtype=complex)
+
+    # ******************************************************************************
+    # * @brief Return the order of the filter
+    # ******************************************************************************
+    def order(self):
+        return max(len(self.p), len(self.z))
+
+    # ******************************************************************************
+    # * @brief Return the filter as (zeros, poles, gain)
+    # ******************************************************************************
+    def zpk(self):
+        return self.z, self.p, self.k
+
+    # ******************************************************************************
+    # * @brief Return the filter as (num, den) polynomials
+    # ******************************************************************************
+    def ba(self):
+        if (self.__ba is None):
+            self.__ba = filters.zpk2tf(self.z, self.p, self.k)
+        return self.__ba
+
+    # ******************************************************************************
+    # * @brief Return the filter as an array of analog second-order sections, one row
+    # * [b0, b1, b2, a0, a1, a2] per section, with the polynomials in s
+    # ******************************************************************************
+    def sos(self):
+        if (self.__sos is None):
+            profiler.count('system.zpk2sos')
+            self.__sos = filters.zpk2sos(self.z, self.p, self.k, analog=True)
+        return self.__sos
+
+    # ******************************************************************************
+    # * @brief Return the filter as a state space (A, B, C, D), built as the series
+    # * connection of its second-order sections so the high order polynomials are
+    # * never expanded. zpk2sos leaves the whole gain in the first section (about
+    # * 1e38 for an order 10 filter at 1 kHz), so the realization is balanced: every
+    # * section is normalized to a gain of 1 (see sections) and the gain is spread
+    # * evenly among them, and the states of each section are scaled so its A, B
+    # * and C are of the same size (see section)
+    # ******************************************************************************
+    def ss(self):
+        if (self.__ss is None):
+            A = np.zeros((0, 0))
+            B = np.zeros((0, 1))
+            C = np.zeros((1, 0))
+            D = np.ones((1, 1))
+            for num, den in self.sections():
+                a2, b2, c2, d2 = AnalogFilter.section(num, den)
+                n1 = A.shape[0]
+                n2 = a2.shape[0]
+                A = np.block([[A, np.zeros((n1, n2))], [b2 @ C, a2]])
+                B = np.vstack([B, b2 @ D])
+                C = np.hstack([d2 @ C, c2])
+                D = d2 @ D
+            self.__ss = (A, B, C, D)
+        return self.__ss
+
+    # ******************************************************************************
+    # * @brief The second-order sections as a list of (num, den) polynomials in s,
+    # * without the leading zeros of the first order ones. Each section is divided
+    # * by its gain at a reference point, the largest of its gains at w = 0, at its
+    # * natural frequency and at w = inf, and the product of those gains is spread
+    # * as the same factor on every section
+    # ******************************************************************************
+    def sections(self):
+        sections = []
+        total = 1.0
+        for section in self.sos():
+            num = np.trim_zeros(section[:3], 'f')
+            den = np.trim_zeros(section[3:], 'f')
+            num = num/den[0]
+            den = den/den[0]
+            wn = np.sqrt(abs(den[-1])) if len(den) == 3 else abs(den[-1])
+            wn = wn if wn > 0 else 1.0
+            gains = [abs(np.polyval(num, s)/np.polyval(den, s)) for s in (0, 1j*wn)]
+            gains.append(abs(num[0]) if len(num) == len(den) else 0)
+            gain = max(g for g in gains if np.isfinite(g)) or 1.0
+            total *= gain
+            sections.append((num/gain, den))
+        if (sections):
+            factor = total**(1/len(sections))
+            sections = [(num*factor, den) for num, den in sections]
+        return sections
+
+    # ******************************************************************************
+    # * @brief State space of one section num/den, in the controllable form of
+    # * tf2ss with its states scaled so that A, B and C are all of the size of the
+    # * natural frequency wn of the section: the state of s^i X(s) is divided by
+    # * wn^i and the input is split evenly between B and C
+    # ******************************************************************************
+    def section(num, den):
+        A, B, C, D = filters.tf2ss(num, den)
+        n = A.shape[0]
+        if (n == 0):
+            return A, B, C, D
+        wn = abs(den[-1])**(1/n) or 1.0
+        # x = T z with the state s^i X(s) scaled by wn^i, T = diag(wn^(n-1), ..., 1)
+        T = wn**np.arange(n - 1, -1, -1.0)
+        A = A*T[None, :]/T[:, None]
+        B = B/T[:, None]
+        C = C*T[None, :]
+        b = np.linalg.norm(B)
+        c = np.linalg.norm(C)
+        t = np.sqrt(b/c) if c > 0 else 1.0
+        return A, B/t, C*t, D
+
+    # ******************************************************************************
+    # * @brief Evaluate the complex frequency response H(jw) as the product of the
+    # * contributions of each zero and pole, with a cost linear in the order
+    # ******************************************************************************
+    def freqresp(self, w):
+        s = 1j*np.asarray(w, dtype=float)
+        h = np.full(s.shape, self.k, dtype=complex)
+        for z in self.z:
+            h *= (s - z)
+        for p in self.p:
+            h /= (s - p)
+        return h
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+filters = lazy.LazyModule('scipy.signal')
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief Split an entry of a list of transfers in its filter and its label. The
+# * entry can be [num, den(, label)] or [AnalogFilter(, label)], or the filter alone.
+# * The filter is returned as an AnalogFilter or as a (num, den) tuple.
+# ******************************************************************************
+def split(h):
+    if (isinstance(h, AnalogFilter)):
+        return h, ""
+    if (isinstance(h[0], AnalogFilter)):
+        return h[0], (h[1] if len(h) >= 2 else "")
+    return (h[0], h[1]), (h[2] if len(h) >= 3 else "")
+
+# ******************************************************************************
+# * @brief Obtain the (zeros, poles, gain) of a filter, finding the roots only when
+# * it is given as polynomials
+# ******************************************************************************
+def zpk(h):
+    if (isinstance(h, AnalogFilter)):
+        return h.zpk()
+    with profiler.span('system.tf2zpk'):
+        return filters.tf2zpk(h[0], h[1])
@@ -0,0 +1,243 @@
+# ******************************************************************************
+# * @file tolerance.py
+# * @author Pablo Joaquim
+# * @brief Monte Carlo analysis of the component tolerances of a filter design:
+# * the design is perturbed many times at once and the cutoff, ripple and yield
+# * against a spec are taken over the whole batch
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from . import metrics
+from . import profiler
+from . import response
+from . import sweep
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class ToleranceAnalysis():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # * h is the nominal design, as an AnalogFilter or (num, den), and tol the
+    # * relative tolerance of the parts. With mode 'roots' every complex pair keeps
+    # * its own w0 and Q deviations, w0 (1 + d1) and Q (1 + d2), as the stages of an
+    # * active filter built from resistors and capacitors do, and every real root r
+    # * becomes r (1 + d) on its own, as a first order stage does (two real roots
+    # * aren't taken as the pair of one stage). With mode 'coefficients' every
+    # * coefficient of num and den (but the leading one of den) is c (1 + d), as in
+    # * a passive ladder or a direct form. The deviations d are 'normal' with tol as
+    # * 3 sigma or 'uniform' over +-tol.
+    # ******************************************************************************
+    def __init__(self, h, tol=0.05, mode='roots', distribution='normal'):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        if (mode not in ('roots', 'coefficients')):
+            raise ValueError(f"Unknown mode '{mode}', it must be 'roots' or 'coefficients'")
+        if (distribution not in ('normal', 'uniform')):
+            raise ValueError(f"Unknown distribution '{distribution}', it must be 'normal' or 'uniform'")
+        h = response.AdaptiveResponse.analog(h)
+        self.z = np.asarray(h.z, dtype=complex)
+        self.p = np.asarray(h.p, dtype=complex)
+        self.k = h.k
+        self.tol = tol
+        self.mode = mode
+        self.distribution = distribution
+        self.results = None
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<ToleranceAnalysis(order={0}, tol={1!r}, mode={2!r})>'.format(len(self.p), self.tol, self.mode)
+
+    # ******************************************************************************
+    # * @brief Relative deviations of the given shape drawn from rng
+    # ******************************************************************************
+    def deviation(self, rng, shape):
+        if (self.distribution == 'uniform'):
+            return rng.uniform(-self.tol, self.tol, shape)
+        return rng.normal(0, self.tol/3, shape)
+
+    # ******************************************************************************
+    # * @brief Draw count perturbed designs, as the stacked (z, p, k) of
+    # * BatchResponse.evalroots, with shapes (count, zeros), (count, poles), (count,)
+    # ******************************************************************************
+    def sample(self, rng, count):
+        if (self.mode == 'coefficients'):
+            return self.coefficients(rng, count)
+        z = self.roots(rng, self.z, count)
+        p = self.roots(rng, self.p, count)
+        k = np.full(count, self.k, dtype=complex)
+        if (not np.any(self.z == 0)):
+            # Keep the gain at w = 0, like the stages of a lowpass do
+            with np.errstate(all='ignore'):
+                k = k*np.real(np.prod(-p, axis=1)/np.prod(-self.p))*np.real(np.prod(-self.z)/np.prod(-z, axis=1))
+        return z, p, k
+
+    # ******************************************************************************
+    # * @brief Perturb count times the roots: the roots at the origin stay there, the
+    # * real ones scale by 1 + d and each complex pair moves with its own w0 and Q
+    # * as the roots w0 (-a +- sqrt(a^2 - 1)), a = 1/(2 Q), which turn into two real
+    # * roots when Q falls under 1/2. The roots on the imaginary axis (the zeros of
+    # * the bandstop filters) have a = 0 and only move along it.
+    # ******************************************************************************
+    def roots(self, rng, roots, count):
+        upper = roots[roots.imag > 0]
+        real = roots[(roots.imag == 0) & (roots != 0)]
+        origin = np.sum(roots == 0)
+        w0 = np.abs(upper)*(1 + self.deviation(rng, (count, len(upper))))
+        a = -upper.real/np.abs(upper)/(1 + self.deviation(rng, (count, len(upper))))
+        root = np.sqrt(a*a - 1 + 0j)
+        pairs = np.hstack([w0*(-a + root), w0*(-a - root)])
+        real = real.real*(1 + self.deviation(rng, (count, len(real))))
+        return np.hstack([pairs, real, np.zeros((count, origin))]).astype(complex)
+
+    # ******************************************************************************
+    # * @brief Perturb count times the coefficients of num and den and find the
+    # * roots of all of them at once, from the eigenvalues of their companion
+    # * matrices
+    # ******************************************************************************
+    def coefficients(self, rng, count):
+        num = np.real(self.k*np.poly(self.z)) if len(self.z) else np.array([np.real(self.k)])
+        den = np.real(np.poly(self.p))
+        num = num*(1 + self.deviation(rng, (count, len(num))))
+        den = den*np.hstack([np.ones((count, 1)), 1 + self.deviation(rng, (count, len(den) - 1))])
+        return ToleranceAnalysis.companion(num), ToleranceAnalysis.companion(den), num[:, 0]/den[:, 0]
+
+    # ******************************************************************************
+    # * @brief Roots of each row of the polynomial coefficients c, highest power first
+    # ******************************************************************************
+    def companion(c):
+        N = c.shape[1] - 1
+        if (N == 0):
+            return np.zeros((len(c), 0), dtype=complex)
+        C = np.zeros((len(c), N, N))
+        C[:, 0, :] = -c[:, 1:]/c[:, :1]
+        C[:, np.arange(1, N), np.arange(N - 1)] = 1
+        return np.linalg.eigvals(C).astype(complex)
+
+    # ******************************************************************************
+    # * @brief Draw and evaluate the chunk index, count designs taken from their own
+    # * stream of the seed, so a chunk gives the same designs on any worker. See run
+    # * for the fields of the returned rows.
+    # ******************************************************************************
+    def evaluate(self, index, count, spec=None, seed=0, n=256):
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+        z, p, k = self.sample(rng, count)
+        out = np.zeros(count, dtype=resultType)
+        for name in resultType.names:
+            if (resultType[name].base == float):
+                out[name] = np.nan
+        spec = spec or {}
+        with np.errstate(all='ignore'):
+            with profiler.span('tolerance.frequency'):
+                metrics.FilterMetrics.frequency(out, z, p, k, n)
+            if (spec.get('wp') is not None):
+                wp = np.asarray(spec['wp'], dtype=float)
+                ws = np.asarray(spec['ws'], dtype=float)
+                shape = (count,) + wp.shape[-1:] if wp.ndim else (count,)
+                with profiler.span('tolerance.bands'):
+                    metrics.FilterMetrics.bands(out, z, p, k, np.broadcast_to(wp, shape), np.broadcast_to(ws, shape), n)
+            out['qmax'] = metrics.FilterMetrics.quality(p, 1)[1]
+            out['stable'] = np.all(~(p.real >= 0), axis=1)
+        out['passed'] = ToleranceAnalysis.check(out, spec)
+        profiler.count('tolerance.samples', count)
+        return out
+
+    # ******************************************************************************
+    # * @brief Evaluate samples perturbed designs in chunks of chunk designs, on a
+    # * pool of workers processes when workers > 1. The samples only depend on the
+    # * seed and the chunk size, not on the workers. spec is a dict with any of
+    # *   wp, ws  passband and stopband edges [rad/s], as in FilterMetrics.eval
+    # *   rp      highest passband ripple [dB] (needs wp and ws)
+    # *   rs      lowest stopband attenuation [dB] (needs wp and ws)
+    # *   w3db    [low, high] limits of the -3 dB frequencies [rad/s], or one pair
+    # *           for each edge of the bandpass and bandstop filters
+    # * Returns the structured array with a row per design and the fields peak,
+    # * w3db, ripple, attenuation, gdpeak, gdpassband and gdflatness of
+    # * FilterMetrics.eval, qmax, stable and passed, also kept in self.results.
+    # * n is the number of points of the frequency grids.
+    # ******************************************************************************
+    @profiler.profiled('tolerance.run')
+    def run(self, samples=100000, spec=None, seed=0, workers=1, chunk=2048, n=256):
+        unknown = set(spec or {}) - {'wp', 'ws', 'rp', 'rs', 'w3db'}
+        if (unknown):
+            raise ValueError(f"Unknown spec keys {sorted(unknown)}")
+        if (spec and (spec.get('wp') is None) != (spec.get('ws') is None)):
+            raise ValueError("Both wp and ws must be given")
+        counts = [min(chunk, samples - start) for start in range(0, samples, chunk)]
+        if (workers is not None and workers <= 1):
+            parts = [self.evaluate(i, count, spec, seed, n) for i, count in enumerate(counts)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=sweep.ignoreSigint) as pool:
+                jobs = [pool.submit(shard, self, i, count, spec, seed, n) for i, count in enumerate(counts)]
+                parts = [job.result() for job in jobs]
+        self.results = np.concatenate(parts) if parts else np.zeros(0, dtype=resultType)
+        return self.results
+
+    # ******************************************************************************
+    # * @brief Tell which of the evaluated designs meet the spec (see run). The
+    # * unstable ones never do
+    # ******************************************************************************
+    def check(out, spec):
+        spec = spec or {}
+        passed = out['stable'].copy()
+        if (spec.get('rp') is not None):
+            passed &= out['ripple'] <= spec['rp']
+        if (spec.get('rs') is not None):
+            passed &= out['attenuation'] >= spec['rs']
+        if (spec.get('w3db') is not None):
+            limits = np.broadcast_to(np.asarray(spec['w3db'], dtype=float), (2, 2))
+            passed &= np.all((out['w3db'] >= limits[:, 0]) & (out['w3db'] <= limits[:, 1]), axis=1)
+        return passed
+
+    # ******************************************************************************
+    # * @brief Distribution of the metrics of the results of run: the yield (the
+    # * share of the designs that passed) with its standard error, the share of
+    # * stable designs, and the mean, std and the percentiles at 0, +-1, +-2 and +-3
+    # * sigma of each metric, leaving out the designs where it is nan
+    # ******************************************************************************
+    def summary(results):
+        N = len(results)
+        y = float(np.mean(results['passed'])) if N else np.nan
+        columns = {'peak': results['peak'], 'w3dbLow': results['w3db'][:, 0], 'w3dbHigh': results['w3db'][:, 1],
+                   'ripple': results['ripple'], 'attenuation': results['attenuation'], 'qmax': results['qmax']}
+        distributions = {}
+        for name, values in columns.items():
+            values = values[np.isfinite(values)]
+            if (len(values) == 0):
+                continue
+            distributions[name] = {'mean': float(np.mean(values)), 'std': float(np.std(values)),
+                                   'percentiles': dict(zip(percentiles, np.percentile(values, percentiles).tolist()))}
+        return {'samples': N, 'yield': y, 'yieldError': float(np.sqrt(y*(1 - y)/N)) if N else np.nan,
+                'stable': float(np.mean(results['stable'])) if N else np.nan, 'metrics': distributions}
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+# The columns of the results of each design
+resultType = np.dtype([('peak', float), ('w3db', float, (2,)), ('ripple', float), ('attenuation', float),
+                       ('gdpeak', float), ('gdpassband', float), ('gdflatness', float),
+                       ('qmax', float), ('stable', bool), ('passed', bool)])
+
+# The percentiles of the summary, at 0, +-1, +-2 and +-3 sigma of a normal distribution
+percentiles = [0.135, 2.275, 15.866, 50, 84.134, 97.725, 99.865]
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief Evaluate one chunk of ToleranceAnalysis.run in a worker process
+# ******************************************************************************
+def shard(analysis, index, count, spec, seed, n):
+    return analysis.evaluate(index, count, spec, seed, n)
@@ -0,0 +1,313 @@
+# ******************************************************************************
+# * @file transient.py
+# * @author Pablo Joaquim
+# * @brief Analytic impulse, step and ramp responses and sinusoidal steady state of
+# * analog filters, from the partial fraction expansion of their transfer
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import math
+
+import numpy as np
+from . import profiler
+from . import system
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class TransientResponse():
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # * h is the filter as an AnalogFilter or (num, den). Given as an AnalogFilter
+    # * the roots are exact, so only the equal poles are taken as a repeated one
+    # * and any multiplicity works. Given as (num, den) the poles closer than tol
+    # * (relative to their size) are taken as one repeated pole when they are
+    # * spread around their mean like the multiple roots that np.roots splits in
+    # * close ones (1e-4 apart for a quadruple root, 1e-3 for a quintuple one), see
+    # * group, while the close distinct poles of the narrow band filters are kept.
+    # * tol is 0 for an AnalogFilter and 1e-2 for (num, den) when it is None.
+    # ******************************************************************************
+    def __init__(self, h, tol=None):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        z, p, k = system.zpk(h)
+        self.z = np.atleast_1d(np.asarray(z, dtype=complex))
+        self.p = np.atleast_1d(np.asarray(p, dtype=complex))
+        self.k = k
+        if (tol is None):
+            tol = 0.0 if isinstance(h, system.AnalogFilter) else 1e-2
+        self.tol = tol
+        if (len(self.z) > len(self.p)):
+            raise ValueError("The transfer must be proper, with no more zeros than poles")
+        # Gain of the delta of the impulse response, nonzero when there are as many
+        # zeros as poles
+        self.direct = k if len(self.z) == len(self.p) else 0.0
+        # The expansion of H(s)/s^n, by n
+        self.__terms = {}
+
+    # ******************************************************************************
+    # * @brief Returns a string as a representation of the object.
+    # ******************************************************************************
+    def __repr__(self):
+        return '<TransientResponse(order={0}, direct={1})>'.format(len(self.p), self.direct)
+
+    # ******************************************************************************
+    # * @brief Impulse response at the times t (0 before t = 0). The delta of
+    # * weight self.direct that proper transfers with as many zeros as poles have
+    # * at t = 0 is left out, since it can't be sampled
+    # ******************************************************************************
+    def impulse(self, t):
+        return self.eval(t, 0)
+
+    # ******************************************************************************
+    # * @brief Step response at the times t
+    # ******************************************************************************
+    def step(self, t):
+        return self.eval(t, 1)
+
+    # ******************************************************************************
+    # * @brief Ramp (u(t) = t) response at the times t
+    # ******************************************************************************
+    def ramp(self, t):
+        return self.eval(t, 2)
+
+    # ******************************************************************************
+    # * @brief Sinusoidal steady state at the times t for the input components
+    # * [[A, f, phi]], with f in Hz and phi in rad as in SignalGenerator.signal:
+    # * sum(A |H(j 2 pi f)| sin(2 pi f t + phi + arg H(j 2 pi f)))
+    # ******************************************************************************
+    def steady(self, t, signals):
+        components = np.atleast_2d(np.asarray(signals, dtype=float))
+        A = components[:, 0]
+        w = 2*np.pi*components[:, 1]
+        phi = components[:, 2] if components.shape[1] > 2 else np.zeros(len(w))
+        H = self.freqresp(w)
+        t = np.asarray(t, dtype=float)
+        y = np.zeros(t.shape)
+        for i in range(len(w)):
+            y += A[i]*np.abs(H[i])*np.sin(w[i]*t + phi[i] + np.angle(H[i]))
+        return y
+
+    # ******************************************************************************
+    # * @brief H(jw) = k prod(jw - z)/prod(jw - p) at the frequencies w [rad/s]
+    # ******************************************************************************
+    def freqresp(self, w):
+        s = 1j*np.asarray(w, dtype=float)[..., None]
+        return self.k*np.prod(s - self.z, axis=-1)/np.prod(s - self.p, axis=-1)
+
+    # ******************************************************************************
+    # * @brief Response to t^(n-1)/(n-1)! (the impulse for n = 0, the step for 1, the
+    # * ramp for 2) at the times t, the sum of c t^m/m! exp(p t) over the terms of
+    # * H(s)/s^n. Only the poles with Im(p) >= 0 are evaluated, the coefficients of
+    # * the complex ones are doubled to add their conjugates.
+    # ******************************************************************************
+    def eval(self, t, n):
+        t = np.asarray(t, dtype=float)
+        poles, coefs, powers = self.terms(n)
+        y = np.zeros(t.shape)
+        after = np.maximum(t, 0)
+        with profiler.span('transient.eval'):
+            for j in range(len(poles)):
+                E = TransientResponse.exponential(poles[j:j+1], after)[0]
+                y += np.real(coefs[j]*E)*after**powers[j]/math.factorial(powers[j])
+        return np.where(t >= 0, y, 0)
+
+    # ******************************************************************************
+    # * @brief Upper bound of the integral of |h(t)| from T to infinity, the most the
+    # * part of the impulse response after T can add to the output for an input of
+    # * amplitude 1. Each term c t^m/m! exp(p t) is bounded by its modulus, whose
+    # * integral is |c| exp(-s T) sum_(i=0..m)(T^i/(i! s^(m-i+1))) with s = -Re(p).
+    # * It is infinite when there are poles on or right of the imaginary axis
+    # ******************************************************************************
+    def tail(self, T):
+        poles, coefs, powers = self.terms(0)
+        bound = 0.0
+        for p, c, m in zip(poles, coefs, powers):
+            s = -p.real
+            if (s <= 0):
+                return np.inf
+            i = np.arange(m + 1)
+            series = np.sum(float(T)**i/np.vectorize(math.factorial)(i)/s**(m - i + 1))
+            bound += abs(c)*math.exp(-s*T)*series
+        return bound
+
+    # ******************************************************************************
+    # * @brief exp(p t) for every p of the 1D array p over the times t, with shape
+    # * (len(p), len(t)). Over a uniform grid t0 + i dt, with i written as q*S + r
+    # * like in SignalGenerator, it is exp(p (t0 + q S dt)) exp(p r dt), the outer
+    # * product of two short vectors, so only about 2 sqrt(len(t)) exponentials are
+    # * taken per pole instead of len(t)
+    # ******************************************************************************
+    def exponential(p, t):
+        p = np.asarray(p, dtype=complex)[:, None]
+        N = len(t)
+        dt = (t[-1] - t[0])/(N - 1) if N > 2 else 0
+        if (dt <= 0 or np.max(np.abs(np.diff(t) - dt)) > 1e-9*dt):
+            return np.exp(p*t)
+        S = int(np.ceil(np.sqrt(N)))
+        Q = -(-N//S)
+        outer = np.exp(p*(t[0] + dt*S*np.arange(Q)))
+        inner = np.exp(p*(dt*np.arange(S)))
+        return (outer[:, :, None]*inner[:, None, :]).reshape(len(p), -1)[:, :N]
+
+    # ******************************************************************************
+    # * @brief The terms (poles, coefs, powers) of H(s)/s^n = sum(c/(s - p)^(m+1)),
+    # * whose inverse transforms are c t^m/m! exp(p t), with m the power. They are
+    # * computed once for each n. Half of the complex poles are dropped, see eval
+    # ******************************************************************************
+    def terms(self, n):
+        if (n not in self.__terms):
+            # Only the roots that coincide cancel, the zeros of a narrow bandstop are
+            # as close to its poles as the poles are to each other
+            zeros, poles = TransientResponse.cancel(self.z, np.concatenate([self.p, np.zeros(n)]), min(self.tol, 1e-9))
+            centers, multiplicity = TransientResponse.group(poles, self.tol)
+            coefs = TransientResponse.residues(zeros, centers, multiplicity, self.k)
+            powers = np.concatenate([np.arange(m - 1, -1, -1) for m in multiplicity])
+            poles = np.repeat(centers, multiplicity)
+            # Keep the upper half of each conjugate pair, doubled
+            real = max(self.tol, 1e-12)*np.abs(poles)
+            upper = poles.imag >= -real
+            double = poles.imag > real
+            poles = np.where(double, poles, poles.real)
+            self.__terms[n] = (poles[upper], np.where(double, 2*coefs, coefs)[upper], powers[upper])
+        return self.__terms[n]
+
+    # ******************************************************************************
+    # * @brief Remove the zeros and poles that cancel out, closer than tol relative
+    # * to their size, like the zeros at the origin of highpass and bandpass filters
+    # * against the poles at the origin of the step and the ramp
+    # ******************************************************************************
+    def cancel(zeros, poles, tol):
+        zeros = list(zeros)
+        kept = []
+        for p in poles:
+            near = [i for i, z in enumerate(zeros) if TransientResponse.close(z, p, tol)]
+            if (near):
+                zeros.pop(near[0])
+            else:
+                kept.append(p)
+        return np.array(zeros, dtype=complex), np.array(kept, dtype=complex)
+
+    # ******************************************************************************
+    # * @brief Tell if the roots a and b are closer than tol relative to their size
+    # ******************************************************************************
+    def close(a, b, tol):
+        return abs(a - b) <= tol*max(abs(a), abs(b)) or a == b
+
+    # ******************************************************************************
+    # * @brief Group the poles that are closer than tol relative to their size to
+    # * any other of the group, returning the center of each group and its
+    # * multiplicity. The mean of the roots that np.roots splits out of a multiple
+    # * root is much closer to it than any of them. The groups that don't look like
+    # * a split multiple root (see multiple) are kept as distinct poles.
+    # ******************************************************************************
+    def group(poles, tol):
+        centers = []
+        multiplicity = []
+        left = list(poles)
+        while (left):
+            members = [left.pop(0)]
+            for p in members:
+                near = [q for q in left if TransientResponse.close(p, q, tol)]
+                for q in near:
+                    left.remove(q)
+                members += near
+            if (TransientResponse.multiple(members)):
+                centers.append(np.mean(members))
+                multiplicity.append(len(members))
+            else:
+                centers += members
+                multiplicity += [1]*len(members)
+        return np.array(centers, dtype=complex), np.array(multiplicity, dtype=int)
+
+    # ******************************************************************************
+    # * @brief Tell if the m close roots look like the split of an m-fold root c by
+    # * rounding: their deviations d from the mean are then the roots of d^m = e,
+    # * within about (eps/1e4)^(1/m) of |c|, whose power sums sum(d^j) vanish for
+    # * j = 1..m-1. The distinct poles of a narrow band filter lie on an arc
+    # * instead, and their power sums don't vanish.
+    # ******************************************************************************
+    def multiple(roots):
+        m = len(roots)
+        if (m < 2):
+            return True
+        roots = np.asarray(roots, dtype=complex)
+        d = roots - np.mean(roots)
+        r = np.max(np.abs(d))
+        if (r == 0):
+            return True
+        if (r > np.abs(np.mean(roots))*1e-12**(1/m)):
+            return False
+        return all(np.abs(np.sum(d**j)) <= 0.1*m*r**j for j in range(2, m))
+
+    # ******************************************************************************
+    # * @brief Coefficients of the partial fraction expansion of
+    # * k prod(s - z)/prod((s - p_i)^M_i), for each pole p_i from its highest power
+    # * down: the coefficient of 1/(s - p_i)^(M_i - j) is f_j, the Taylor coefficient
+    # * at p_i of F_i(s) = (s - p_i)^M_i H(s). They are found from the series of
+    # * log F_i, sum(log(s - z)) - sum_(l != i)(M_l log(s - p_l)), whose terms are
+    # * simple powers, as f_j = sum(q l_q f_(j-q))/j, so repeated poles need no
+    # * derivatives
+    # ******************************************************************************
+    def residues(z, centers, multiplicity, k):
+        coefs = []
+        for i, (p, M) in enumerate(zip(centers, multiplicity)):
+            others = np.delete(centers, i)
+            weights = np.delete(multiplicity, i)
+            f = np.zeros(M, dtype=complex)
+            f[0] = k*np.prod(p - z)/np.prod((p - others)**weights)
+            # l_q of the log series, for q = 1..M-1
+            q = np.arange(1, M)[:, None]
+            sign = -(-1.0)**q
+            l = np.sum(sign/(q*(p - z)**q), axis=1) - np.sum(weights*sign/(q*(p - others)**q), axis=1)
+            for j in range(1, M):
+                f[j] = np.sum(np.arange(1, j + 1)*l[:j]*f[j-1::-1])/j
+            coefs.append(f)
+        return np.concatenate(coefs) if coefs else np.array([], dtype=complex)
+
+    # ******************************************************************************
+    # * @brief Evaluate the response of kind 'impulse', 'step' or 'ramp' of every
+    # * filter of H, a list in the form [num, den(, label)] or [AnalogFilter(, label)],
+    # * over the common time axis t. The terms of all the filters are stacked (padded
+    # * with zero coefficients) so the whole batch is evaluated at once, term by term.
+    # * Returns an array of shape (len(H), len(t))
+    # ******************************************************************************
+    @profiler.profiled('transient.batch')
+    def batch(H, t, kind='step', tol=None):
+        n = {'impulse': 0, 'step': 1, 'ramp': 2}.get(kind)
+        if (n is None):
+            raise ValueError(f"Unknown response '{kind}', it must be 'impulse', 'step' or 'ramp'")
+        responses = [TransientResponse(system.split(h)[0], tol) for h in H]
+        terms = [r.terms(n) for r in responses]
+        T = max([len(poles) for poles, coefs, powers in terms] + [0])
+        poles = np.zeros((len(H), T), dtype=complex)
+        coefs = np.zeros((len(H), T), dtype=complex)
+        powers = np.zeros((len(H), T), dtype=int)
+        for i, (p, c, m) in enumerate(terms):
+            poles[i, :len(p)] = p
+            coefs[i, :len(c)] = c
+            powers[i, :len(m)] = m
+        coefs = coefs/np.vectorize(math.factorial)(powers)
+
+        t = np.asarray(t, dtype=float)
+        after = np.maximum(t, 0)
+        y = np.zeros((len(H), len(t)))
+        for j in range(T):
+            E = TransientResponse.exponential(poles[:, j], after)
+            y += np.real(coefs[:, j:j+1]*E)*after**powers[:, j:j+1]
+        profiler.array('transient.batch', y)
+        return np.where(t >= 0, y, 0)
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
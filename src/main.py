@@ -10,13 +10,13 @@
 # ******************************************************************************
 # * import modules
 # ******************************************************************************
+import argparse
+import atexit
+import os
 import signal
 
-import control
-import numpy as np
-from analog import filters
-from analog import bode
-import matplotlib.pyplot as plt
+# Only the light modules are imported here, each command imports what it needs
+from analog import profiler
 
 # ******************************************************************************
 # * Objects Declarations
@@ -41,14 +41,364 @@ def sigintHandler(signum, frame):
     raise RuntimeError("Terminating...")
 
 # ******************************************************************************
-# * @brief The main entry point
+# * @brief Print the profile recorded during the run and, if path is given, save it
+# * as a Chrome trace. It is registered with atexit, so it also runs when the run
+# * is stopped by the SIGINT handler
 # ******************************************************************************
-if __name__ == '__main__':
-    signal.signal(signal.SIGINT, sigintHandler)
+def reportProfile(path=None):
+    print(profiler.summary(), flush=True)
+    if (path):
+        profiler.chrome(path)
+        print("Chrome trace saved in %s" % path, flush=True)
+
+# ******************************************************************************
+# * @brief Create the web service on first access to main.webserver, so it is only
+# * built when gunicorn asks for it (gunicorn main:webserver)
+# ******************************************************************************
+def __getattr__(name):
+    global webserver
+    if (name == 'webserver'):
+        import service
+        webserver = service.create()
+        return webserver
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# ******************************************************************************
+# * @brief Keep the designs (in designs.sqlite) and the computed responses (see
+# * cache.ResponseStore) in the directory path, looking them up there first
+# ******************************************************************************
+def openStore(path):
+    from analog import cache
+    from analog import filters
+    from analog import response
+    os.makedirs(path, exist_ok=True)
+    response.store = cache.ResponseStore(path, maxbytes=int(os.environ.get("RESPONSE_STORE_MAX_BYTES", 256*2**20)))
+    filters.designCache.persist(os.path.join(path, 'designs.sqlite'))
+
+# ******************************************************************************
+# * @brief The filters selected by the filter options of a command, one per order,
+# * as [num, den, label] (output='ba') or as [AnalogFilter, label] (output='zpk')
+# ******************************************************************************
+def transfers(args, output='ba'):
+    import numpy as np
+    from analog import filters
+    if (args.btype in ('bandpass', 'bandstop')):
+        if (args.fci is None or args.fcs is None):
+            raise SystemExit(f"{args.btype} filters need --fci and --fcs")
+        wn = [2*np.pi*args.fci, 2*np.pi*args.fcs]
+    else:
+        wn = 2*np.pi*args.fc
+    H = []
+    for order in args.order:
+        h = filters.design(args.family, args.btype, order, wn, rp=args.rp, output=output)
+        label = "%s %s - order = %d" % (args.family, args.btype, order)
+        H.append([h[0], h[1], label] if output == 'ba' else [h, label])
+    return H
+
+# ******************************************************************************
+# * @brief Save named arrays as .npz, .json or .csv (columns side by side)
+# ******************************************************************************
+def save(path, arrays):
+    import json
+    import numpy as np
+    extension = os.path.splitext(path)[1].lower()
+    if (extension == '.npz'):
+        np.savez(path, **arrays)
+    elif (extension == '.json'):
+        with open(path, 'w') as f:
+            json.dump({name: np.asarray(a).tolist() for name, a in arrays.items()}, f)
+    else:
+        columns = [np.asarray(a).reshape(len(a), -1) for a in arrays.values()]
+        names = [name if c.shape[1] == 1 else "%s_%d" % (name, i)
+                 for name, c in zip(arrays, columns) for i in range(c.shape[1])]
+        np.savetxt(path, np.hstack(columns), delimiter=',', header=','.join(names), comments='')
+    print("Saved in %s" % path, flush=True)
+
+# ******************************************************************************
+# * @brief design: print the coefficients of the filters
+# ******************************************************************************
+def design(args):
+    import numpy as np
+    np.set_printoptions(precision=6)
+    for h in transfers(args, 'ba' if args.output == 'ba' else 'zpk'):
+        print(h[-1])
+        if (args.output == 'ba'):
+            print("  num =", h[0])
+            print("  den =", h[1])
+            if (args.tf):
+                import control
+                print("H(s)=", control.tf(h[0], h[1]))
+        elif (args.output == 'zpk'):
+            print("  z =", h[0].z)
+            print("  p =", h[0].p)
+            print("  k =", h[0].k)
+        else:
+            print("  sos =", h[0].sos())
+
+# ******************************************************************************
+# * @brief response: evaluate the frequency response of the filters
+# ******************************************************************************
+def freqresp(args):
+    import numpy as np
+    from analog import response
+    H = transfers(args, 'zpk')
+    w, mag, phase, grpdelay = response.BatchResponse.eval(H, n=args.points)
+    arrays = {'f': w/(2*np.pi), 'mag': mag.T, 'phase': phase.T, 'grpdelay': grpdelay.T}
+    if (args.out):
+        save(args.out, arrays)
+        return
+    for i, h in enumerate(H):
+        print("%s: peak %.3f dB, max group delay %.6g s" % (h[-1], np.max(mag[i]), np.max(grpdelay[i])))
+
+# ******************************************************************************
+# * @brief metrics: print or save the figures of merit of the filters
+# ******************************************************************************
+def metrics(args):
+    import numpy as np
+    from analog import metrics
+    H = transfers(args, 'zpk')
+    if ((args.fpass is None) != (args.fstop is None)):
+        raise SystemExit("--fpass and --fstop go together")
+    wp = 2*np.pi*np.array(args.fpass) if args.fpass else None
+    ws = 2*np.pi*np.array(args.fstop) if args.fstop else None
+    if (wp is not None and len(wp) == 1):
+        wp, ws = wp[0], ws[0]
+    m = metrics.FilterMetrics.eval(H, wp, ws)
+    if (args.out):
+        save(args.out, {name: m[name]/(2*np.pi) if name == 'w3db' else m[name] for name in m.dtype.names})
+        return
+    for h, row in zip(H, m):
+        print("%s:" % h[-1])
+        print("  -3 dB at %s Hz, ripple %.4g dB, attenuation %.4g dB" % (np.round(row['w3db']/(2*np.pi), 3), row['ripple'], row['attenuation']))
+        print("  group delay peak %.6g s, passband %.6g s, flatness %.4g" % (row['gdpeak'], row['gdpassband'], row['gdflatness']))
+        print("  Q %s, step overshoot %.4g %%, settling %.6g s" % (np.round(row['q'], 4), row['overshoot'], row['settling']))
+
+# ******************************************************************************
+# * @brief tolerance: Monte Carlo yield of the last filter with its parts off by
+# * up to --tol
+# ******************************************************************************
+def tolerances(args):
+    import numpy as np
+    from analog import tolerance
+    h = transfers(args, 'zpk')[-1]
+    if ((args.fpass is None) != (args.fstop is None)):
+        raise SystemExit("--fpass and --fstop go together")
+    spec = {}
+    if (args.fpass):
+        spec['wp'] = 2*np.pi*np.array(args.fpass) if len(args.fpass) > 1 else 2*np.pi*args.fpass[0]
+        spec['ws'] = 2*np.pi*np.array(args.fstop) if len(args.fstop) > 1 else 2*np.pi*args.fstop[0]
+        spec['rp'] = args.max_ripple
+        spec['rs'] = args.min_attenuation
+    if (args.f3db):
+        spec['w3db'] = 2*np.pi*np.array(args.f3db).reshape(-1, 2)
+    analysis = tolerance.ToleranceAnalysis(h[0], args.tol, args.mode, args.distribution)
+    results = analysis.run(args.samples, spec, seed=args.seed, workers=args.workers)
+    if (args.out):
+        save(args.out, {name: results[name]/(2*np.pi) if name == 'w3db' else results[name] for name in results.dtype.names})
+        return
+    summary = tolerance.ToleranceAnalysis.summary(results)
+    print("%s, %d samples with %g %% parts (%s):" % (h[-1], summary['samples'], 100*args.tol, args.mode))
+    print("  yield %.4f +- %.4f, stable %.4f" % (summary['yield'], summary['yieldError'], summary['stable']))
+    for name, d in summary['metrics'].items():
+        scale = 2*np.pi if name.startswith('w3db') else 1
+        low, high = d['percentiles'][tolerance.percentiles[0]], d['percentiles'][tolerance.percentiles[-1]]
+        print("  %-12s mean %.6g, std %.4g, -3 sigma %.6g, +3 sigma %.6g%s" % (name, d['mean']/scale, d['std']/scale,
+              low/scale, high/scale, " [Hz]" if scale != 1 else ""))
+
+# ******************************************************************************
+# * @brief simulate: filter a synthesized signal or a signal file
+# ******************************************************************************
+def simulate(args):
+    import numpy as np
+    from analog import filters
+    h = transfers(args, 'zpk')[-1][0]
+    if (args.input is not None):
+        if (args.output is None or args.fs is None):
+            raise SystemExit("filtering a file needs --output and --fs")
+        n = filters.ApplyFilter.file(h, 1/args.fs, args.input, args.output, method=args.method or 'foh')
+        print("%d samples filtered, saved in %s" % (n, args.output), flush=True)
+        return
+    if (args.response is not None):
+        # Standard test signals, evaluated analytically instead of simulated
+        from analog import transient
+        t = args.tmin + args.step*np.arange(filters.SignalGenerator.samples(args.step, args.tmin, args.tmax))
+        u = {'impulse': np.where(t == 0, 1/args.step, 0), 'step': np.where(t >= 0, 1.0, 0), 'ramp': np.maximum(t, 0)}[args.response]
+        y = getattr(transient.TransientResponse(h), args.response)(t)
+        if (args.out):
+            save(args.out, {'t': t, 'u': u, 'y': y})
+            return
+        print("%d samples of the %s response, peak %.6g, final %.6g" % (len(t), args.response, np.max(np.abs(y)), y[-1]))
+        return
+    # By default the 4 Hz, 40 Hz and 80 Hz signal of the demo
+    tones = [[1, 4, np.pi/2], [0.6, 40, 0], [0.5, 80, np.pi/2]]
+    if (args.tone):
+        tones = [[float(v) for v in tone.split(',')] + [0]*(3 - len(tone.split(','))) for tone in args.tone]
+    u, t = filters.SignalGenerator.signal(tones, args.step, args.tmin, args.tmax)
+    y = filters.ApplyFilter.eval(h, u, t, method=args.method)
+    if (args.plot is not None):
+        from analog import bode
+        outdir = os.environ.get("PLOT_OUTDIR")
+        plotter = bode.FreqResponse(headless=(bool(args.plot) or outdir is not None), outdir=outdir)
+        title = "%s %s - order = %d" % (args.family, args.btype, args.order[-1])
+        plotter.timeplot(t, [[u, 'input', 'r'], [y, 'output', 'k']], title, output=args.plot or None)
+        if (args.plot):
+            print("Saved in %s" % args.plot, flush=True)
+    if (args.out):
+        save(args.out, {'t': t, 'u': u, 'y': y})
+        return
+    print("%d samples, rms input %.6g, rms output %.6g" % (len(t), np.sqrt(np.mean(u**2)), np.sqrt(np.mean(y**2))))
+
+# ******************************************************************************
+# * @brief plot: draw the filters, on screen or in the file given with --out
+# ******************************************************************************
+def plot(args):
+    import numpy as np
+    from analog import bode
+    outdir = os.environ.get("PLOT_OUTDIR")
+    plotter = bode.FreqResponse(headless=(args.out is not None or outdir is not None), outdir=outdir)
+    title = args.title or "%s - %s" % (args.family, args.btype)
+    fc = args.fc if args.fc is not None else args.fci
+    if (args.kind in ('bode', 'pzmap')):
+        import control
+        H = [control.tf(h[0], h[1]) for h in transfers(args)]
+        # control.pzmap takes a single system
+        H = H[0] if args.kind == 'pzmap' else H
+        output = getattr(plotter, args.kind)(H, output=args.out)
+    elif (args.kind == 'pzplot'):
+        output = plotter.pzplot(transfers(args, 'zpk'), 2*np.pi*fc, title=title, output=args.out)
+    else:
+        # The markers go at the -3 dB frequencies of each filter, found on its response
+        plotter.plot(transfers(args, 'zpk'), 'auto', title, output=args.out, tol=args.tol)
+        output = args.out
+    if (isinstance(output, str)):
+        print("Saved in %s" % output, flush=True)
+
+# ******************************************************************************
+# * @brief sweep: evaluate a grid of designs on a pool of processes
+# ******************************************************************************
+def sweepGrid(args):
+    from analog import sweep
+    try:
+        print("Sweeping...", flush=True)
+        results = sweep.Sweep.load(args.grid).run(args.out, args.workers, args.chunk)
+        print("%d points evaluated, saved in %s" % (len(results), args.out), flush=True)
+    except RuntimeError:
+        # The partial results are already saved in args.out, see Sweep.run
+        print("Finishing...", flush=True)
+
+# ******************************************************************************
+# * @brief serve: run the web service with the embedded Flask server
+# ******************************************************************************
+def serve(args):
+    host, port = args.address.rsplit(":", 1)
+    __getattr__('webserver').run(host=host, port=int(port))
+
+# ******************************************************************************
+# * @brief Build the parser of the command line
+# ******************************************************************************
+def parser():
+    parser = argparse.ArgumentParser(description="Design, evaluate and plot analog filters. "
+                                     "Without a command the demo plots are drawn.")
+    parser.add_argument("--profile", action="store_true", help="print the time spent in each stage at exit")
+    parser.add_argument("--trace", metavar="FILE", help="with --profile, also save a Chrome trace json in FILE")
+    parser.add_argument("--store", metavar="DIR", help="keep the designs and the computed responses in DIR and "
+                        "reuse them in the next runs")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    spec = argparse.ArgumentParser(add_help=False)
+    spec.add_argument("--family", choices=["butter", "cheby1"], default="butter")
+    spec.add_argument("--btype", choices=["lowpass", "highpass", "bandpass", "bandstop"], default="lowpass")
+    spec.add_argument("--order", type=int, nargs="+", default=[4], help="one or more orders")
+    spec.add_argument("--fc", type=float, default=1000, help="cutoff frequency [Hz]")
+    spec.add_argument("--fci", type=float, help="lower band edge of bandpass/bandstop filters [Hz]")
+    spec.add_argument("--fcs", type=float, help="upper band edge of bandpass/bandstop filters [Hz]")
+    spec.add_argument("--rp", type=float, default=1, help="passband ripple of the Chebyshev filters [dB]")
+
+    command = commands.add_parser("design", parents=[spec], help="print the coefficients of the filters")
+    command.add_argument("--output", choices=["ba", "zpk", "sos"], default="ba")
+    command.add_argument("--tf", action="store_true", help="also print H(s) with the control package")
+    command.set_defaults(run=design)
+
+    command = commands.add_parser("response", parents=[spec], help="evaluate the frequency response")
+    command.add_argument("--points", type=int, default=100, help="number of frequencies")
+    command.add_argument("--out", help="file (.npz, .json or .csv) where the response is saved")
+    command.set_defaults(run=freqresp)
+
+    command = commands.add_parser("metrics", parents=[spec], help="figures of merit of the filters")
+    command.add_argument("--fpass", type=float, nargs="+", help="passband edge(s) for the ripple [Hz]")
+    command.add_argument("--fstop", type=float, nargs="+", help="stopband edge(s) for the attenuation [Hz]")
+    command.add_argument("--out", help="file (.npz, .json or .csv) where the metrics are saved")
+    command.set_defaults(run=metrics)
+
+    command = commands.add_parser("tolerance", parents=[spec], help="Monte Carlo yield under part tolerances")
+    command.add_argument("--tol", type=float, default=0.05, help="relative tolerance of the parts")
+    command.add_argument("--mode", choices=["roots", "coefficients"], default="roots",
+                         help="perturb the w0 and Q of each stage or the polynomial coefficients")
+    command.add_argument("--distribution", choices=["normal", "uniform"], default="normal")
+    command.add_argument("--samples", type=int, default=100000)
+    command.add_argument("--seed", type=int, default=0)
+    command.add_argument("--workers", type=int, default=1, help="number of processes")
+    command.add_argument("--fpass", type=float, nargs="+", help="passband edge(s) of the spec [Hz]")
+    command.add_argument("--fstop", type=float, nargs="+", help="stopband edge(s) of the spec [Hz]")
+    command.add_argument("--max-ripple", type=float, help="highest passband ripple of the spec [dB]")
+    command.add_argument("--min-attenuation", type=float, help="lowest stopband attenuation of the spec [dB]")
+    command.add_argument("--f3db", type=float, nargs="+", metavar="F",
+                         help="low high limits of the -3 dB frequency, or of each edge (4 values) [Hz]")
+    command.add_argument("--out", help="file (.npz, .json or .csv) where the metrics of every sample are saved")
+    command.set_defaults(run=tolerances)
+
+    command = commands.add_parser("simulate", parents=[spec], help="filter a signal")
+    command.add_argument("--tone", action="append", default=None, metavar="A,f,phi",
+                         help="component of the input signal (amplitude, Hz, rad), can be repeated")
+    command.add_argument("--step", type=float, default=1e-4, help="sample period [s]")
+    command.add_argument("--tmin", type=float, default=0)
+    command.add_argument("--tmax", type=float, default=1)
+    command.add_argument("--method", choices=["foh", "zoh", "bilinear", "matched", "fft"], default=None,
+                         help="discretization, or fft for the convolution with the impulse response, lsim by default")
+    command.add_argument("--response", choices=["impulse", "step", "ramp"],
+                         help="analytic response to a test signal instead of the tones")
+    command.add_argument("--input", help="signal file to filter instead (.npy, .txt/.csv or raw float64)")
+    command.add_argument("--output", help="file where the filtered signal file is written")
+    command.add_argument("--fs", type=float, help="sample rate of the signal file [Hz]")
+    command.add_argument("--out", help="file (.npz, .json or .csv) where t, u and y are saved")
+    command.add_argument("--plot", nargs="?", const="", metavar="FILE",
+                         help="plot the input and the output, on screen or in FILE")
+    command.set_defaults(run=simulate)
+
+    command = commands.add_parser("plot", parents=[spec], help="plot the filters")
+    command.add_argument("--kind", choices=["plot", "pzplot", "bode", "pzmap"], default="plot")
+    command.add_argument("--title")
+    command.add_argument("--tol", type=float, help="evaluate each filter on an adaptive grid to this error [dB]")
+    command.add_argument("--out", help="image file, the figure is shown on screen if not given")
+    command.set_defaults(run=plot)
+
+    command = commands.add_parser("sweep", help="evaluate a grid of designs")
+    command.add_argument("grid", help="json file with the parameter grid to sweep")
+    command.add_argument("--out", default="sweep.npy", help="npy file where the sweep results are saved")
+    command.add_argument("--workers", type=int, default=None, help="number of processes of the sweep")
+    command.add_argument("--chunk", type=int, default=256, help="number of points evaluated by each job")
+    command.set_defaults(run=sweepGrid)
+
+    command = commands.add_parser("serve", help="run the web service (for development)")
+    command.add_argument("address", nargs="?", default="0.0.0.0:5000", metavar="HOST:PORT")
+    command.set_defaults(run=serve)
+    return parser
+
+# ******************************************************************************
+# * @brief The original demo, plotting the Butterworth and Chebyshev lowpass filters
+# ******************************************************************************
+def demo(args):
+    import control
+    import numpy as np
+    import matplotlib.pyplot as plt
+    from analog import bode
+    from analog import filters
 
     try:
         print("Initializing...", flush=True)
-        plotter = bode.FreqResponse()        
+        # Without a display (e.g. in the container) set PLOT_OUTDIR to render the figures there
+        outdir = os.environ.get("PLOT_OUTDIR")
+        plotter = bode.FreqResponse(headless=(outdir is not None), outdir=outdir)
 
         fo = 1000
         wc = 2*np.pi*fo
@@ -112,14 +462,9 @@ if __name__ == '__main__':
         # # The filter should mostly eliminate the 40 Hz and 80 Hz components, leaving just the 4 Hz signal.
         # num, den = filters.Butterworth.butter_lowpass(wc=2*np.pi*12, order=5)
         # h = [num, den]
-        # inputSignal,t = filters.SignalGenerator.signal([[1,4,np.pi/2], [0.6,40,0], [0.5,80,np.pi/2]], 1.25, 0, 500)
+        # inputSignal,t = filters.SignalGenerator.signal([[1,4,np.pi/2], [0.6,40,0], [0.5,80,np.pi/2]], 1.25/500, 0, 1.25)
         # outputSignal = filters.ApplyFilter.eval(h, inputSignal, t)
-        # plt.plot(t, inputSignal, 'r', alpha=0.5, linewidth=1, label='input')
-        # plt.plot(t, outputSignal, 'k', linewidth=1.5, label='output')
-        # plt.legend(loc='best', shadow=True, framealpha=1)
-        # plt.grid(alpha=0.3)
-        # plt.xlabel('t')
-        # plt.show()
+        # plotter.timeplot(t, [[inputSignal, 'input', 'r'], [outputSignal, 'output', 'k']], "Time response")
         
         # # Get the order of a Butterworth filter
         # wp=1000
@@ -182,22 +527,17 @@ if __name__ == '__main__':
         # # The filter should mostly eliminate the 40 Hz and 80 Hz components, leaving just the 4 Hz signal.
         # num, den = filters.Chebyshev.cheby_lowpass(wc=2*np.pi*12, rp=1, order=5)
         # h = [num, den]
-        # inputSignal,t = filters.SignalGenerator.signal([[1,4,np.pi/2], [0.6,40,0], [0.5,80,np.pi/2]], 1.25, 0, 500)
+        # inputSignal,t = filters.SignalGenerator.signal([[1,4,np.pi/2], [0.6,40,0], [0.5,80,np.pi/2]], 1.25/500, 0, 1.25)
         # outputSignal = filters.ApplyFilter.eval(h, inputSignal, t)
-        # plt.plot(t, inputSignal, 'r', alpha=0.5, linewidth=1, label='input')
-        # plt.plot(t, outputSignal, 'k', linewidth=1.5, label='output')
-        # plt.legend(loc='best', shadow=True, framealpha=1)
-        # plt.grid(alpha=0.3)
-        # plt.xlabel('t')
-        # plt.show()
+        # plotter.timeplot(t, [[inputSignal, 'input', 'r'], [outputSignal, 'output', 'k']], "Time response")
         
         # # Get the order of a Chebyshev filter
         # wp=1000
         # ws=2000
         # rp=1
         # rs=15
-        # N=filters.Chebyshev.cheby_lowpass_order(wp, ws, rp, rs)
-        # print(N)
+        # N, Wn = filters.Chebyshev.cheby_lowpass_order(wp, ws, rp, rs)
+        # print(N, Wn)
         
         # H = []
         # num, den = filters.Chebyshev.cheby_lowpass(wc=wp, rp=1, order=N)
@@ -208,22 +548,40 @@ if __name__ == '__main__':
         # plotter.pzplot(H, wp, title="Chebyshev")
         
         
-        # Butterworth - lowpass
+        # Butterworth - lowpass, as zpk so pzplot draws the closed-form roots
         H = []
         for order in orders:
-            num, den = filters.Butterworth.butter_lowpass(wc=wc, order=order)
-            h = control.tf(num, den)
-            print("H(s)=", h)
-            H.append([num, den, "Butter - order = %d" % order])
+            h = filters.Butterworth.butter_lowpass(wc=wc, order=order, output='zpk')
+            print("H(s)=", control.tf(*h.ba()))
+            H.append([h, "Butter - order = %d" % order])
         # Chebyshev - lowpass
         for order in orders:
-            num, den = filters.Chebyshev.cheby_lowpass(wc=wc, rp=1, order=order)
-            h = control.tf(num, den)
-            print("H(s)=", h)
-            H.append([num, den, "Cheby - order = %d" % order])
+            h = filters.Chebyshev.cheby_lowpass(wc=wc, rp=1, order=order, output='zpk')
+            print("H(s)=", control.tf(*h.ba()))
+            H.append([h, "Cheby - order = %d" % order])
         plotter.plot(H, [fo,-3], "Chebyshev - lowpass")
         plotter.pzplot(H, wc, title="Chebyshev - lowpass")
         
         
     except RuntimeError:
         print("Finishing...", flush=True)
+
+# ******************************************************************************
+# * @brief The main entry point
+# ******************************************************************************
+if __name__ == '__main__':
+    signal.signal(signal.SIGINT, sigintHandler)
+
+    args = parser().parse_args()
+
+    if (args.profile):
+        profiler.enable()
+        atexit.register(reportProfile, args.trace)
+
+    if (args.store):
+        openStore(args.store)
+
+    if (args.command is None):
+        demo(args)
+    else:
+        args.run(args)
@@ -0,0 +1,354 @@
+# ******************************************************************************
+# * @file service.py
+# * @author Pablo Joaquim
+# * @brief Web service over the filters and bode classes, served by gunicorn as
+# * main:webserver
+# *
+# * Every endpoint takes a json body and returns its arrays as json, npz or msgpack,
+# * chosen with ?format= or with the Accept header:
+# *   POST /design    {"family", "btype", "order", "wc" | "wci"+"wcs", "rp", "output"}
+# *   POST /response  {"filters": [filter, ...], "n": 100, "w": [rad/s, ...]}
+# *                    with at most RESPONSE_MAX_POINTS (100000) frequencies
+# *   POST /pzmap     {"filters": [filter, ...]}
+# *   POST /simulate  {"filter": filter, "signals": [[A, f, phi], ...], "step", "tmin",
+# *                    "tmax", "method": "foh" | "zoh" | "bilinear" | "matched" | "fft" | null}
+# *   POST /plot      {"filters": [filter, ...], "kind": "plot" | "pzplot", "title",
+# *                    "marker": [f, dB] | "auto", "tol": dB}, returns the figure as png
+# *                    (or ?format=svg), "auto" marks the -3 dB frequencies of each filter
+# *   GET  /stats     cache and response store statistics
+# * where a filter is a design like the body of /design, {"num": [...], "den": [...]}
+# * or {"z": [...], "p": [...], "k": k}, with complex roots given as [re, im], and
+# * can have a "label".
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import io
+import json
+import os
+import threading
+
+import numpy as np
+from flask import Flask, Response, request
+from analog import cache
+from analog import filters
+from analog import response
+from analog import system
+
+# ******************************************************************************
+# * Objects Declarations
+# ******************************************************************************
+class Uncached(Exception):
+    # ******************************************************************************
+    # * @brief The __init__() function is called automatically every time the class
+    # * is being used to create a new object.
+    # * Raised from inside the cache to hand over a response too large to be kept
+    # ******************************************************************************
+    def __init__(self, payload):
+        # The self parameter is a reference to the current instance of the class,
+        # and is used to access variables that belong to the class.
+        super().__init__(len(payload))
+        self.payload = payload
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+# The encoded responses, by canonical hash of the request, kept in memory up to
+# RESPONSE_CACHE_SIZE entries and RESPONSE_CACHE_MEMORY_BYTES in all. With
+# RESPONSE_CACHE_PATH set they are also stored in that directory, shared by all the
+# gunicorn workers, which drops the least recently used over RESPONSE_CACHE_DISK_BYTES
+responseCache = cache.DesignCache(maxsize=int(os.environ.get("RESPONSE_CACHE_SIZE", 512)),
+                                  maxbytes=int(os.environ.get("RESPONSE_CACHE_MEMORY_BYTES", 64*2**20)))
+responseStore = None
+if (os.environ.get("RESPONSE_CACHE_PATH")):
+    responseStore = cache.ResponseStore(os.environ["RESPONSE_CACHE_PATH"],
+                                        maxbytes=int(os.environ.get("RESPONSE_CACHE_DISK_BYTES", 256*2**20)))
+
+# Largest signal /simulate accepts, in samples, and largest response cached, in bytes
+maxSamples = int(os.environ.get("SIMULATE_MAX_SAMPLES", 10000000))
+# Most frequencies of a /response, as n or as the length of w
+maxPoints = int(os.environ.get("RESPONSE_MAX_POINTS", 100000))
+# Largest order of the filters, designed or given as num/den or as roots
+maxOrder = int(os.environ.get("FILTER_MAX_ORDER", 64))
+maxCached = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 8*2**20))
+
+# Media type of each output format
+mimetypes = {'json': 'application/json', 'npz': 'application/x-npz', 'msgpack': 'application/msgpack',
+             'png': 'image/png', 'svg': 'image/svg+xml'}
+
+# Headless plotter of the worker, matplotlib can draw only one figure at a time
+plotter = None
+plotLock = threading.Lock()
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief Create the Flask application
+# ******************************************************************************
+def create():
+    app = Flask(__name__)
+    app.add_url_rule('/design', 'design', lambda: handle(design), methods=['POST'])
+    app.add_url_rule('/response', 'response', lambda: handle(freqresp), methods=['POST'])
+    app.add_url_rule('/pzmap', 'pzmap', lambda: handle(pzmap), methods=['POST'])
+    app.add_url_rule('/simulate', 'simulate', lambda: handle(simulate), methods=['POST'])
+    app.add_url_rule('/plot', 'plot', lambda: handle(plot, 'png'), methods=['POST'])
+    app.add_url_rule('/stats', 'stats', stats, methods=['GET'])
+    return app
+
+# ******************************************************************************
+# * @brief Serve a request with the endpoint fn, which takes the json body and
+# * returns a dict of arrays (or the rendered bytes for the figures). The encoded
+# * response is cached, in memory and in the response store, by the hash of the
+# * path, the format and the canonical body (unless it is larger than maxCached),
+# * and the X-Cache header tells if it was a hit, a miss or it was not cached.
+# ******************************************************************************
+def handle(fn, default='json'):
+    computed = []
+    try:
+        body = request.get_json(force=True, silent=True)
+        if (not isinstance(body, dict)):
+            raise ValueError("The body must be a json object")
+        format = negotiate(default)
+        def run():
+            computed.append('miss')
+            result = fn(body, format)
+            payload = result if isinstance(result, bytes) else encode(result, format)
+            if (len(payload) > maxCached):
+                raise Uncached(payload)
+            return (np.frombuffer(payload, dtype=np.uint8),)
+        def stored():
+            if (responseStore is None):
+                return run()
+            describe = {'path': request.path, 'format': format}
+            return (responseStore.get(params, lambda: {'payload': run()[0]}, describe)['payload'],)
+        params = (request.path, format, json.dumps(canonical(body), sort_keys=True, separators=(',', ':')))
+        payload = responseCache.get(params, stored)[0].tobytes()
+    except Uncached as uncached:
+        payload = uncached.payload
+        computed.append('bypass')
+    except (ValueError, KeyError, TypeError, IndexError) as error:
+        message = str(error) if not isinstance(error, KeyError) else f"Missing field {error}"
+        return Response(json.dumps({'error': message}), status=400, mimetype=mimetypes['json'])
+    return Response(payload, mimetype=mimetypes[format], headers={'X-Cache': computed[-1] if computed else 'hit'})
+
+# ******************************************************************************
+# * @brief Return the statistics of the response and design caches
+# ******************************************************************************
+def stats():
+    body = {'responses': responseCache.stats(), 'designs': filters.designCache.stats(), 'pid': os.getpid()}
+    if (responseStore is not None):
+        body['store'] = responseStore.stats()
+    return Response(json.dumps(body), mimetype=mimetypes['json'])
+
+# ******************************************************************************
+# * @brief Choose the output format from ?format= or the Accept header
+# ******************************************************************************
+def negotiate(default):
+    format = request.args.get('format')
+    if (format is None):
+        for name, mimetype in mimetypes.items():
+            if (mimetype in request.headers.get('Accept', '')):
+                format = name
+                break
+    format = format or default
+    images = ('png', 'svg')
+    if (format not in mimetypes or (format in images) != (default in images)):
+        raise ValueError(f"Unsupported format '{format}'")
+    return format
+
+# ******************************************************************************
+# * @brief Normalize the numbers of a json body, so 2 and 2.0 hash the same
+# ******************************************************************************
+def canonical(value):
+    if (isinstance(value, dict)):
+        return {k: canonical(v) for k, v in value.items()}
+    if (isinstance(value, list)):
+        return [canonical(v) for v in value]
+    if (isinstance(value, float) and value.is_integer()):
+        return int(value)
+    return value
+
+# ******************************************************************************
+# * @brief Encode a dict of arrays and numbers in the format:
+# *   'json'     lists, with the complex values as [re, im] pairs
+# *   'npz'      numpy .npz archive, one array per name
+# *   'msgpack'  map of {"dtype", "shape", "data"} with the raw little-endian data
+# ******************************************************************************
+def encode(result, format):
+    arrays = {name: np.asarray(value) for name, value in result.items()}
+    if (format == 'npz'):
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+    if (format == 'msgpack'):
+        import msgpack
+        packed = {}
+        for name, a in arrays.items():
+            a = np.ascontiguousarray(a, dtype=a.dtype.newbyteorder('<'))
+            packed[name] = {'dtype': a.dtype.str, 'shape': list(a.shape), 'data': a.tobytes()}
+        return msgpack.packb(packed)
+    lists = {}
+    for name, a in arrays.items():
+        finite = np.isfinite(a) if a.dtype.kind in 'fc' else np.ones(a.shape, dtype=bool)
+        if (np.iscomplexobj(a)):
+            a = np.stack([a.real, a.imag], axis=-1)
+            finite = np.stack([finite, finite], axis=-1)
+        # nan and inf aren't valid json
+        lists[name] = np.where(finite, a, None).tolist() if not np.all(finite) else a.tolist()
+    return json.dumps(lists).encode()
+
+# ******************************************************************************
+# * @brief Decode the list name as an array of dtype with at most size finite
+# * values, and at least one unless empty is allowed
+# ******************************************************************************
+def numbers(values, name, size, empty=False, dtype=float):
+    a = np.asarray(values, dtype=dtype)
+    if (a.ndim != 1 or len(a) > size or (len(a) == 0 and not empty)):
+        raise ValueError(f"{name} must be a list of {0 if empty else 1} to {size} numbers")
+    if (not np.all(np.isfinite(a))):
+        raise ValueError(f"{name} must be finite")
+    return a
+
+# ******************************************************************************
+# * @brief Decode value as an integer from low to high
+# ******************************************************************************
+def integer(value, name, low, high):
+    number = float(value)
+    if (not number.is_integer() or not low <= number <= high):
+        raise ValueError(f"{name} must be an integer from {low} to {high}")
+    return int(number)
+
+# ******************************************************************************
+# * @brief Decode a list of numbers or [re, im] pairs as a complex array
+# ******************************************************************************
+def roots(values, name):
+    a = np.asarray(values, dtype=float)
+    if (a.ndim == 2 and a.shape[1] == 2):
+        a = a[:, 0] + 1j*a[:, 1]
+    return numbers(a, name, maxOrder, empty=True, dtype=complex)
+
+# ******************************************************************************
+# * @brief Decode the signals of /simulate, a non empty list of finite [A, f] or
+# * [A, f, phi] components (or a single one)
+# ******************************************************************************
+def components(values):
+    a = np.atleast_2d(np.asarray(values, dtype=float))
+    if (a.ndim != 2 or a.size == 0 or a.shape[1] not in (2, 3)):
+        raise ValueError("signals must be a non empty list of [A, f] or [A, f, phi] components")
+    if (not np.all(np.isfinite(a))):
+        raise ValueError("signals must be finite")
+    return a
+
+# ******************************************************************************
+# * @brief Build the filter described by spec, as an AnalogFilter or (num, den)
+# ******************************************************************************
+def transfer(spec, output='zpk'):
+    if ('num' in spec):
+        num = numbers(spec['num'], 'num', maxOrder + 1)
+        den = numbers(spec['den'], 'den', maxOrder + 1)
+        if (den[0] == 0):
+            raise ValueError("The leading coefficient of den can't be zero")
+        return (num, den)
+    if ('p' in spec):
+        k = float(spec.get('k', 1))
+        if (not np.isfinite(k)):
+            raise ValueError("k must be finite")
+        return system.AnalogFilter(roots(spec.get('z', []), 'z'), roots(spec['p'], 'p'), k)
+    btype = spec.get('btype', 'lowpass')
+    if (btype in ('bandpass', 'bandstop')):
+        wn = [float(spec['wci']), float(spec['wcs'])]
+    else:
+        wn = float(spec['wc'])
+    return filters.design(spec.get('family', 'butter'), btype, integer(spec.get('order', 5), 'order', 1, maxOrder), wn,
+                          rp=spec.get('rp', 1), output=output)
+
+# ******************************************************************************
+# * @brief The list of [filter, label] of a body with a "filters" list
+# ******************************************************************************
+def transfers(body):
+    if (not body['filters']):
+        raise ValueError("The filters list is empty")
+    H = []
+    for spec in body['filters']:
+        h = transfer(spec)
+        label = spec.get('label', '')
+        H.append([h, label] if isinstance(h, system.AnalogFilter) else [h[0], h[1], label])
+    return H
+
+# ******************************************************************************
+# * @brief POST /design
+# ******************************************************************************
+def design(body, format):
+    output = body.get('output', 'ba')
+    h = transfer(body, output)
+    if (output == 'ba'):
+        return {'num': h[0], 'den': h[1]}
+    if (output == 'sos'):
+        return {'sos': h.sos()}
+    return {'z': h.z, 'p': h.p, 'k': h.k}
+
+# ******************************************************************************
+# * @brief POST /response
+# ******************************************************************************
+def freqresp(body, format):
+    w = body.get('w')
+    if (w is not None):
+        w = numbers(w, 'w', maxPoints)
+    n = integer(body.get('n', 100), 'n', 1, maxPoints)
+    w, mag, phase, grpdelay = response.BatchResponse.eval(transfers(body), w, n)
+    return {'w': w, 'mag': mag, 'phase': phase, 'grpdelay': grpdelay}
+
+# ******************************************************************************
+# * @brief POST /pzmap, the roots of each filter in a row padded with nan
+# ******************************************************************************
+def pzmap(body, format):
+    zpk = [system.zpk(system.split(h)[0]) for h in transfers(body)]
+    return {'zeros': response.BatchResponse.stackroots([z for z, p, k in zpk]),
+            'poles': response.BatchResponse.stackroots([p for z, p, k in zpk]),
+            'gain': np.array([k for z, p, k in zpk], dtype=float)}
+
+# ******************************************************************************
+# * @brief POST /simulate
+# ******************************************************************************
+def simulate(body, format):
+    step = float(body['step'])
+    tmin = float(body.get('tmin', 0))
+    tmax = float(body['tmax'])
+    if (not np.all(np.isfinite([step, tmin, tmax])) or step <= 0 or
+        not 2 <= filters.SignalGenerator.samples(step, tmin, tmax) <= maxSamples):
+        raise ValueError(f"The signal must have between 2 and {maxSamples} samples")
+    signals = components(body['signals'])
+    h = transfer(body['filter'])
+    u, t = filters.SignalGenerator.signal(signals, step, tmin, tmax)
+    method = body.get('method', 'foh')
+    y = filters.ApplyFilter.eval(h, u, t, method=method)
+    return {'t': t, 'u': u, 'y': y}
+
+# ******************************************************************************
+# * @brief POST /plot, the figure rendered as png or svg
+# ******************************************************************************
+def plot(body, format):
+    global plotter
+    H = transfers(body)
+    kind = body.get('kind', 'plot')
+    title = str(body.get('title', ''))
+    buffer = io.BytesIO()
+    with plotLock:
+        if (plotter is None):
+            from analog import bode
+            plotter = bode.FreqResponse(headless=True)
+        plotter.format = format
+        if (kind == 'plot'):
+            tol = body.get('tol')
+            plotter.plot(H, body.get('marker', [0, 0]), title, output=buffer, tol=float(tol) if tol is not None else None)
+        elif (kind == 'pzplot'):
+            plotter.pzplot(H, float(body.get('wo', 0)), title, output=buffer)
+        else:
+            raise ValueError(f"Unknown kind '{kind}', it must be 'plot' or 'pzplot'")
+    return buffer.getvalue()
@@ -0,0 +1,92 @@
+# ******************************************************************************
+# * @file test_bode.py
+# * @author Pablo Joaquim
+# * @brief Tests of the headless rendering of the plots to buffers, files and
+# * over a pool of processes
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import bode
+from analog import filters
+from analog import response
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+lowpass = filters.design('butter', 'lowpass', 4, 2*np.pi*1000, output='zpk')
+bandpass = filters.design('cheby1', 'bandpass', 3, [2*np.pi*1000, 2*np.pi*2000], rp=1, output='ba')
+H = [[lowpass, 'lowpass'], [bandpass[0], bandpass[1], 'bandpass']]
+
+# Leading bytes of each format
+magic = {'png': b'\x89PNG', 'svg': b'<?xml', 'pdf': b'%PDF'}
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+@pytest.mark.parametrize('format', ['png', 'svg', 'pdf'])
+def test_plot_buffer(format):
+    plotter = bode.FreqResponse(headless=True, format=format)
+    w, mag, phase, grpdelay = plotter.plot(H, [1000, -3], 'test')
+    assert plotter.buffer.getvalue().startswith(magic[format])
+    # The curves drawn are the batch responses
+    expected = response.BatchResponse.eval(H)
+    assert all(np.array_equal(a, b) for a, b in zip((w, mag, phase, grpdelay), expected))
+
+def test_plot_reuse():
+    # The figure and its axes are reused and each render replaces the last one
+    plotter = bode.FreqResponse(headless=True)
+    plotter.plot(H, [0, 0], 'first')
+    first = plotter.buffer.getvalue()
+    plotter.plot(H[:1], [0, 0], 'second')
+    second = plotter.buffer.getvalue()
+    assert first != second and second.startswith(magic['png'])
+    assert len(bode.plt.figure('FreqResponse.plot').axes) == 3
+
+def test_plot_adaptive():
+    plotter = bode.FreqResponse(headless=True)
+    w, mag, phase, grpdelay = plotter.plot(H, 'auto', 'adaptive', tol=0.1)
+    assert len(w) == 2 and all(len(w[i]) == len(mag[i]) for i in range(2))
+
+def test_pzplot():
+    plotter = bode.FreqResponse(headless=True, format='svg')
+    out = io.BytesIO()
+    assert plotter.pzplot(H, 2*np.pi*1000, 'poles', output=out) is out
+    assert out.getvalue().startswith(magic['svg'])
+
+def test_timeplot():
+    t = np.linspace(0, 1, 100001)
+    plotter = bode.FreqResponse(headless=True)
+    plotter.timeplot(t, [[np.sin(2*np.pi*50*t), 'u'], [np.cos(2*np.pi*50*t), 'y', 'red']], 'time')
+    assert plotter.buffer.getvalue().startswith(magic['png'])
+
+def test_outdir(tmp_path):
+    # The format is given by the extension of the output or by the plotter
+    plotter = bode.FreqResponse(headless=True, outdir=str(tmp_path/'figures'))
+    plotter.plot(H, title='Low pass: 1 kHz')
+    second = plotter.pzplot(H, title='')
+    named = plotter.pzplot(H, output=str(tmp_path/'pz.svg'))
+    assert sorted(os.listdir(tmp_path/'figures')) == ['0001_Low_pass_1_kHz.png', '0002_figure.png']
+    assert second == str(tmp_path/'figures'/'0002_figure.png') and plotter.count == 2
+    with open(named, 'rb') as file:
+        assert file.read().startswith(magic['svg'])
+
+def test_render(tmp_path):
+    out = str(tmp_path/'bode.png')
+    jobs = [['plot', (H, [1000, -3], 'bode'), out], ['pzplot', (H, 0, 'pz'), None], ['plot', (H[:1],), None]]
+    results = bode.FreqResponse.render(jobs, processes=2, format='svg', chunksize=1)
+    assert results[0] == out and os.path.getsize(out) > 0
+    assert results[1].startswith(magic['svg']) and results[2].startswith(magic['svg'])
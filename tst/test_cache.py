@@ -0,0 +1,269 @@
+# ******************************************************************************
+# * @file test_cache.py
+# * @author Pablo Joaquim
+# * @brief Tests of the memoization of the filter designs: the canonical keys,
+# * the shared read-only arrays, the LRU limits and the sqlite persistence, and of
+# * the on-disk store of the computed responses
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+from scipy import signal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import cache
+from analog import filters
+from analog import response
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief An empty design cache in place of the one of the filters module
+# ******************************************************************************
+@pytest.fixture
+def designs(monkeypatch):
+    designs = cache.DesignCache(maxsize=16)
+    monkeypatch.setattr(filters, 'designCache', designs)
+    return designs
+
+# ******************************************************************************
+# * @brief A design function that counts its calls
+# ******************************************************************************
+def counter(*arrays):
+    calls = []
+    def design():
+        calls.append(1)
+        return [np.array(a) for a in arrays]
+    return design, calls
+
+@pytest.mark.parametrize('a, b', [
+    (('butter', 'lowpass', 2, 1000), ('butter', 'lowpass', 2.0, 1000.0)),
+    (('butter', 'lowpass', np.int64(2), np.float32(1000)), ('butter', 'lowpass', 2, 1000)),
+    (('butter', 'bandpass', 2, [1000, 2000]), ('butter', 'bandpass', 2, np.array([1000.0, 2000.0]))),
+    (('butter', 'bandpass', 2, (1000, 2000)), ('butter', 'bandpass', 2, [1000, 2000])),
+    (('cheby1', 'lowpass', 2, 1000, 0.5), ('cheby1', 'lowpass', 2, 1000, np.float64(0.5))),
+])
+def test_key_equal(a, b):
+    assert cache.DesignCache.key(a) == cache.DesignCache.key(b)
+
+@pytest.mark.parametrize('a, b', [
+    (('butter', 'lowpass', 2, 1000), ('butter', 'lowpass', 3, 1000)),
+    (('butter', 'lowpass', 2, 1000), ('butter', 'highpass', 2, 1000)),
+    (('butter', 'lowpass', 2, 1000), ('butter', 'lowpass', 2, 1000 + 1e-9)),
+    (('butter', 'lowpass', 2, 1000), ('butter', 'lowpass', 2, '1000')),
+    (('cheby1', 'lowpass', 2, 1000, 0.1), ('cheby1', 'lowpass', 2, 1000, 0.1 + 2**-55)),
+    (('butter', 'bandpass', 2, [1000, 2000]), ('butter', 'bandpass', 2, [2000, 1000])),
+    (('butter', 'lowpass', 2, 1000), ('butter', 'lowpass', 2, 1000, None)),
+])
+def test_key_different(a, b):
+    assert cache.DesignCache.key(a) != cache.DesignCache.key(b)
+
+def test_get():
+    designs = cache.DesignCache()
+    design, calls = counter([1, 2], [3.0])
+    first = designs.get(('a', 1), design)
+    second = designs.get(('a', 1.0), design)
+    assert len(calls) == 1 and first is second
+    assert np.array_equal(first[0], [1, 2]) and np.array_equal(first[1], [3.0])
+    # Shared by every caller, so they can't be changed
+    with pytest.raises(ValueError):
+        first[0][0] = 5
+    assert designs.stats() == {'hits': 1, 'diskHits': 0, 'misses': 1, 'size': 1, 'maxsize': 1024,
+                               'bytes': first[0].nbytes + first[1].nbytes, 'maxbytes': None}
+
+def test_lru():
+    designs = cache.DesignCache(maxsize=2)
+    design, calls = counter([1.0])
+    for key in ('a', 'b', 'a', 'c'):
+        designs.get((key,), design)
+    # b was the least recently used when c came in
+    assert len(calls) == 3
+    designs.get(('a',), design)
+    assert len(calls) == 3
+    designs.get(('b',), design)
+    assert len(calls) == 4 and designs.stats()['size'] == 2
+
+def test_maxbytes():
+    designs = cache.DesignCache(maxbytes=80*8)
+    for n in (10, 20, 30, 40):
+        designs.get((n,), lambda: [np.zeros(n)])
+    stats = designs.stats()
+    assert stats['bytes'] == (30 + 40)*8 and stats['size'] == 2
+    # An entry larger than the whole cache isn't kept
+    designs.get((100,), lambda: [np.zeros(100)])
+    assert designs.stats()['size'] == 0 and designs.stats()['bytes'] == 0
+
+def test_clear():
+    designs = cache.DesignCache()
+    design, calls = counter([1.0])
+    designs.get(('a',), design)
+    designs.get(('a',), design)
+    designs.clear()
+    assert designs.stats()['size'] == 0 and designs.stats()['hits'] == 0
+    designs.get(('a',), design)
+    assert len(calls) == 2
+
+def test_persist(tmp_path):
+    path = str(tmp_path/'designs.sqlite')
+    designs = cache.DesignCache(path=path)
+    design, calls = counter([1.0, 2.0], np.array([1j, -1j]), 3.5)
+    first = designs.get(('a', 2), design)
+    # Another process, with an empty memory, finds the design on disk
+    other = cache.DesignCache(path=path)
+    second = other.get(('a', 2.0), design)
+    assert len(calls) == 1 and other.stats()['diskHits'] == 1
+    assert all(np.array_equal(a, b) and a.dtype == b.dtype and a.shape == b.shape for a, b in zip(first, second))
+    assert not second[1].flags.writeable
+    # Persisting can start later and stop
+    late = cache.DesignCache()
+    late.persist(path)
+    late.get(('a', 2), design)
+    late.persist(None)
+    late.clear()
+    late.get(('a', 2), design)
+    assert len(calls) == 2
+
+@pytest.mark.parametrize('output', ['ba', 'zpk'])
+def test_design(designs, output):
+    # The designs through the cache are the scipy designs
+    wn = 2*np.pi*np.array([1000, 2000])
+    first = filters.design('cheby1', 'bandpass', 3, wn, rp=1, output=output)
+    second = filters.design('cheby1', 'bandpass', 3.0, list(wn), rp=1.0, output=output)
+    stats = designs.stats()
+    assert stats['misses'] == 1 and stats['hits'] == 1
+    if (output == 'ba'):
+        num, den = signal.cheby1(3, 1, wn, 'bandpass', analog=True)
+        assert first[0] is second[0]
+        assert np.allclose(first[0], num, rtol=1e-9) and np.allclose(first[1], den, rtol=1e-9)
+    else:
+        z, p, k = signal.cheby1(3, 1, wn, 'bandpass', analog=True, output='zpk')
+        assert np.allclose(np.sort_complex(first.p), np.sort_complex(p), rtol=1e-9)
+        assert np.isclose(first.k, k, rtol=1e-9) and np.array_equal(first.p, second.p)
+
+def test_design_variants(designs):
+    # The ripple is part of the key of the Chebyshev designs only
+    filters.design('butter', 'lowpass', 3, 1000)
+    filters.design('butter', 'lowpass', 3, 1000, rp=2)
+    filters.design('cheby1', 'lowpass', 3, 1000, rp=1)
+    filters.design('cheby1', 'lowpass', 3, 1000, rp=2)
+    assert designs.stats()['misses'] == 3 and designs.stats()['hits'] == 1
+
+# ******************************************************************************
+# * @brief Arrays of about size bytes once stored
+# ******************************************************************************
+def blob(size, value=0.0):
+    return {'y': np.full(size//8, value)}
+
+# ******************************************************************************
+# * @brief Store a blob for key in the store at path from a worker process
+# ******************************************************************************
+def fill(path, key):
+    store = cache.ResponseStore(path, maxbytes=10**6)
+    store.get(('worker', key), lambda: blob(1000, key))
+    return store.load(('worker', key))['y'][0]
+
+def test_store_roundtrip(tmp_path):
+    store = cache.ResponseStore(str(tmp_path))
+    calls = []
+    def compute():
+        calls.append(1)
+        return {'w': np.logspace(0, 3, 10), 'p': np.array([-1 + 1j, -1 - 1j]), 'n': np.arange(3)}
+    first = store.get(('butter', 2, 1000), compute, {'kind': 'test'})
+    second = store.get(('butter', 2.0, np.float64(1000)), compute)
+    assert len(calls) == 1
+    for name, value in first.items():
+        assert np.array_equal(second[name], value) and second[name].dtype == value.dtype
+    assert store.load(('butter', 3, 1000)) is None
+    stats = store.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 2 and stats['entries'] == 1
+    # Another process, or a later run, finds it
+    assert np.array_equal(cache.ResponseStore(str(tmp_path)).load(('butter', 2, 1000))['w'], first['w'])
+
+def test_store_replace(tmp_path):
+    store = cache.ResponseStore(str(tmp_path))
+    store.save(('a',), blob(1000, 1))
+    store.save(('a',), blob(1000, 2))
+    assert store.load(('a',))['y'][0] == 2
+    assert store.stats()['entries'] == 1 and len(os.listdir(str(tmp_path/'blobs'))) == 1
+
+def test_store_lru(tmp_path):
+    # Room for three entries of the same size
+    store = cache.ResponseStore(str(tmp_path/'size'))
+    store.save(('a',), blob(1000))
+    size = store.stats()['bytes']
+    store = cache.ResponseStore(str(tmp_path/'lru'), maxbytes=3*size + size//2)
+    for key in range(3):
+        store.save((key,), blob(1000))
+    # Use 0 so 1 and 2 are the least recently used when 3 and 4 come in
+    assert store.load((0,)) is not None
+    store.save((3,), blob(1000))
+    store.save((4,), blob(1000))
+    stats = store.stats()
+    assert stats['entries'] == 3 and stats['bytes'] == 3*size and stats['evictions'] == 2
+    assert store.load((1,)) is None and store.load((2,)) is None
+    assert all(store.load((key,)) is not None for key in (0, 3, 4))
+    # The files of the evicted entries are removed
+    assert len(os.listdir(str(tmp_path/'lru'/'blobs'))) == 3
+
+def test_store_too_large(tmp_path):
+    store = cache.ResponseStore(str(tmp_path), maxbytes=5000)
+    store.save(('small',), blob(1000))
+    store.save(('large',), blob(10000))
+    assert store.load(('large',)) is None and store.load(('small',)) is not None
+
+def test_store_missing_blob(tmp_path):
+    # A blob removed by another process is taken as missing
+    store = cache.ResponseStore(str(tmp_path))
+    store.save(('a',), blob(1000))
+    for name in os.listdir(str(tmp_path/'blobs')):
+        os.remove(str(tmp_path/'blobs'/name))
+    assert store.load(('a',)) is None and store.stats()['entries'] == 0
+
+def test_store_clear(tmp_path):
+    store = cache.ResponseStore(str(tmp_path))
+    for key in range(3):
+        store.get((key,), lambda: blob(1000))
+    store.clear()
+    assert store.stats() == {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0, 'bytes': 0, 'maxbytes': 256*2**20}
+    assert os.listdir(str(tmp_path/'blobs')) == []
+
+def test_store_processes(tmp_path):
+    # Several processes share the same directory
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        values = list(pool.map(fill, [str(tmp_path)]*20, range(20)))
+    assert values == list(range(20))
+    store = cache.ResponseStore(str(tmp_path), maxbytes=10**6)
+    assert store.stats()['entries'] == 20
+    assert all(store.load(('worker', key))['y'][0] == key for key in range(20))
+    assert not [name for name in os.listdir(str(tmp_path/'blobs')) if name.endswith('.tmp')]
+
+def test_store_responses(tmp_path, monkeypatch):
+    # The batch and adaptive responses are the same through the store, and the
+    # second time they are read from it
+    monkeypatch.setattr(response, 'store', cache.ResponseStore(str(tmp_path)))
+    h = filters.design('cheby1', 'bandpass', 3, 2*np.pi*np.array([1000, 2000]), rp=1, output='zpk')
+    num, den = filters.design('butter', 'lowpass', 4, 2*np.pi*1000)
+    H = [[h, 'bandpass'], [num, den, 'lowpass']]
+    first = response.BatchResponse.eval(H)
+    adaptive = response.AdaptiveResponse.adaptive(h)
+    hits = response.store.stats()['hits']
+    second = response.BatchResponse.eval(H)
+    assert response.AdaptiveResponse.adaptive(h)[0].tobytes() == adaptive[0].tobytes()
+    # The grid and the two transfers, and the adaptive grid
+    assert response.store.stats()['hits'] == hits + 4
+    monkeypatch.setattr(response, 'store', None)
+    computed = response.BatchResponse.eval(H)
+    assert all(np.array_equal(a, b) and np.array_equal(a, c) for a, b, c in zip(first, second, computed))
+    assert np.array_equal(response.AdaptiveResponse.adaptive(h)[1], adaptive[1])
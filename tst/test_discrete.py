@@ -0,0 +1,68 @@
+# ******************************************************************************
+# * @file test_discrete.py
+# * @author Pablo Joaquim
+# * @brief Tests of the accuracy of the discretized filters against lsim
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy import signal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import discrete
+from analog import filters
+from analog import system
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+# Cutoff, or lower edge of the 1 kHz to 1.5 kHz bands [Hz]
+fc = 1000
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief The analog filter of the given family, band and order, as an
+# * AnalogFilter with output 'zpk' or as (num, den) with output 'ba'
+# ******************************************************************************
+def design(family, btype, order, output):
+    wn = 2*np.pi*fc*np.array([1, 1.5]) if btype in ('bandpass', 'bandstop') else 2*np.pi*fc
+    if (family == 'butter'):
+        h = signal.butter(order, wn, btype, analog=True, output=output)
+    else:
+        h = signal.cheby1(order, 1, wn, btype, analog=True, output=output)
+    return system.AnalogFilter(*h) if output == 'zpk' else h
+
+# ******************************************************************************
+# * @brief 3000 samples every dt of a tone under the cutoff plus some noise
+# ******************************************************************************
+def noise(dt):
+    t = dt*np.arange(3000)
+    u = np.sin(np.pi*fc*t) + 0.3*np.random.default_rng(0).standard_normal(len(t))
+    return u, t
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('btype', ['lowpass', 'highpass', 'bandpass', 'bandstop'])
+@pytest.mark.parametrize('order', [2, 4, 8, 12, 16])
+@pytest.mark.parametrize('output, ratio, bound', [('zpk', 20, 1e-10), ('zpk', 100, 1e-10), ('zpk', 10000, 1e-8),
+                                                  ('ba', 20, 1e-7), ('ba', 10000, 1e-5)])
+def test_foh_accuracy(family, btype, order, output, ratio, bound):
+    h = design(family, btype, order, output)
+    u, t = noise(1/(ratio*fc))
+    assert filters.ApplyFilter.accuracy(h, u, t, method='foh') < bound
+
+def test_ss2sos_not_finite():
+    A = np.array([[np.inf]])
+    with pytest.raises(ValueError):
+        discrete.Discretizer.ss2sos(A, np.ones((1, 1)), np.ones((1, 1)), np.zeros((1, 1)))
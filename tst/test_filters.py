@@ -0,0 +1,181 @@
+# ******************************************************************************
+# * @file test_filters.py
+# * @author Pablo Joaquim
+# * @brief Tests of the filters run by blocks of a signal against lsim over the
+# * whole signal, for high order designs, and of the filtering of several channels
+# * and filter banks at once
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy import signal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import filters
+from analog import system
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+# 20 kHz sampling of a 1 kHz cutoff, or a 1 kHz to 3 kHz band
+dt = 1/20000
+edges = {'lowpass': 2*np.pi*1000, 'highpass': 2*np.pi*1000,
+         'bandpass': 2*np.pi*np.array([1000, 3000]), 'bandstop': 2*np.pi*np.array([1000, 3000])}
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief The analog filter of the given family, band and order, as an
+# * AnalogFilter with output 'zpk' or as (num, den) with output 'ba'
+# ******************************************************************************
+def design(family, btype, order, output='zpk'):
+    if (family == 'butter'):
+        h = signal.butter(order, edges[btype], btype, analog=True, output=output)
+    else:
+        h = signal.cheby1(order, 1, edges[btype], btype, analog=True, output=output)
+    return system.AnalogFilter(*h) if output == 'zpk' else h
+
+# ******************************************************************************
+# * @brief N samples of noise starting at a non zero value, and their time
+# ******************************************************************************
+def noise(N=5000):
+    t = dt*np.arange(N)
+    u = 1 + np.random.default_rng(0).standard_normal(len(t))
+    return u, t
+
+# ******************************************************************************
+# * @brief Largest error of y relative to the peak of the reference
+# ******************************************************************************
+def error(y, reference):
+    return np.max(np.abs(y - reference))/np.max(np.abs(reference))
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('btype', ['lowpass', 'highpass', 'bandpass', 'bandstop'])
+@pytest.mark.parametrize('order', [8, 10, 12, 16])
+def test_stream_lsim(family, btype, order):
+    h = design(family, btype, order)
+    u, t = noise()
+    reference = filters.ApplyFilter.eval(h, u, t)
+    stream = filters.StreamFilter(h, dt)
+    y = np.concatenate(list(stream.stream(np.array_split(u, 7))))
+    assert np.all(np.isfinite(y))
+    assert error(y, reference) < 1e-9
+
+@pytest.mark.parametrize('order', [10, 16])
+def test_stream_lsim_ba(order):
+    h = design('butter', 'lowpass', order, 'ba')
+    u, t = noise()
+    stream = filters.StreamFilter(h, dt)
+    y = np.concatenate([stream.process(chunk) for chunk in np.array_split(u, 3)])
+    assert error(y, filters.ApplyFilter.eval(h, u, t)) < 1e-9
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('btype', ['lowpass', 'highpass', 'bandpass', 'bandstop'])
+@pytest.mark.parametrize('order', [8, 10, 12, 16])
+def test_fft_lsim(family, btype, order):
+    h = design(family, btype, order)
+    u, t = noise(40000)
+    reference = filters.ApplyFilter.eval(h, u, t)
+    fft = filters.FFTFilter(h, dt)
+    # Blocks of twice the taps, so the signal is run in several of them
+    y = fft.process(u, size=1 << int(np.ceil(np.log2(2*fft.length))))
+    assert np.all(np.isfinite(y))
+    # tol bounds the error of the truncated taps to 1e-9 times the peak input
+    assert np.max(np.abs(y - reference)) < 1e-9*np.max(np.abs(u))
+
+@pytest.mark.parametrize('order', [10, 16])
+def test_fft_lsim_ba(order):
+    h = design('cheby1', 'bandpass', order, 'ba')
+    u, t = noise(40000)
+    y = filters.ApplyFilter.eval(h, u, t, method='fft')
+    assert np.max(np.abs(y - filters.ApplyFilter.eval(h, u, t))) < 1e-9*np.max(np.abs(u))
+
+@pytest.mark.parametrize('axis', [0, 1, -1])
+@pytest.mark.parametrize('workers', [None, 3])
+def test_channels(axis, workers):
+    # Each channel of an N-d input is filtered as it would be alone
+    h = design('cheby1', 'bandpass', 6)
+    u, t = noise(2000)
+    rng = np.random.default_rng(1)
+    input = np.moveaxis(u*rng.uniform(0.5, 2, (2, 3, 1)) + rng.standard_normal((2, 3, len(t))), -1, axis)
+    y = filters.ApplyFilter.channels(h, input, t, axis=axis, workers=workers)
+    assert y.shape == input.shape
+    channels = np.moveaxis(input, axis, -1).reshape(-1, len(t))
+    output = np.moveaxis(y, axis, -1).reshape(-1, len(t))
+    for u, y in zip(channels, output):
+        assert error(y, filters.ApplyFilter.eval(h, u, t)) < 1e-12
+
+def test_channels_methods():
+    h = design('butter', 'lowpass', 8)
+    u, t = noise(20000)
+    input = np.stack([u, -2*u, np.roll(u, 100)])
+    for method in ('bilinear', 'fft'):
+        y = filters.ApplyFilter.channels(h, input, t, method=method, workers=2)
+        for i in range(len(input)):
+            assert np.allclose(y[i], filters.ApplyFilter.eval(h, input[i], t, method=method), rtol=0, atol=1e-12)
+
+def test_bank():
+    # Designs of different orders, and so of different number of sections, given
+    # as AnalogFilter and as (num, den)
+    H = [[design('butter', 'lowpass', order), f'butter {order}'] for order in (1, 2, 3, 4)]
+    H += [[*design('cheby1', 'lowpass', order, 'ba'), f'cheby1 {order}'] for order in (1, 2, 3, 4)]
+    u, t = noise(2000)
+    input = np.stack([u, u[::-1]], axis=1)
+    y = filters.ApplyFilter.bank(H, input, t, axis=0, workers=2)
+    assert y.shape == (len(H),) + input.shape
+    for i, h in enumerate(H):
+        h = system.split(h)[0]
+        for channel in range(2):
+            assert error(y[i][:, channel], filters.ApplyFilter.eval(h, input[:, channel], t)) < 1e-9
+
+# ******************************************************************************
+# * @brief Direct sum of the components [A, f, phi] of signals at the times t,
+# * with the cycles of each one at tmin taken apart so they stay exact at long times
+# ******************************************************************************
+def tones(signals, step, tmin, n):
+    i = np.arange(n)
+    u = np.zeros(n)
+    for A, f, phi in signals:
+        u += A*np.sin(2*np.pi*(np.mod(f*tmin, 1) + np.mod(f*step*i, 1)) + phi)
+    return u
+
+@pytest.mark.parametrize('tmin', [0, 0.37, 1e5])
+def test_signal(tmin):
+    signals = [[1, 50, 0], [0.5, 1234.5, 1], [0.25, 7000, -2.5]]
+    u, t = filters.SignalGenerator.signal(signals, 1e-5, tmin, tmin + 0.05, size=1000)
+    assert len(u) == len(t) == 5000 and np.allclose(t, tmin + 1e-5*np.arange(5000), rtol=1e-15)
+    assert np.max(np.abs(u - tones(signals, 1e-5, tmin, 5000))) < 1e-9
+    # float32 to its own precision, and a component without phase
+    u32, t = filters.SignalGenerator.signal([[1, 50], [0.5, 1234.5]], 1e-5, tmin, tmin + 0.05, dtype=np.float32)
+    assert u32.dtype == np.float32
+    assert np.max(np.abs(u32 - tones([[1, 50, 0], [0.5, 1234.5, 0]], 1e-5, tmin, 5000))) < 1e-5
+
+@pytest.mark.parametrize('size', [1, 7, 1000, 4096, 10000])
+def test_signal_blocks(size, tmp_path):
+    # The blocks join without steps at their boundaries, whatever their size
+    signals = [[1, 50, 0.3], [0.5, 3333.3, 1]]
+    u, t = filters.SignalGenerator.signal(signals, 1e-5, 0.1, 0.14)
+    blocks = list(filters.SignalGenerator.blocks(signals, 1e-5, 0.1, 0.14, size=size))
+    assert all(len(block) == min(size, len(u) - i*size) for i, (block, tblock) in enumerate(blocks))
+    assert np.max(np.abs(np.concatenate([block for block, tblock in blocks]) - u)) < 1e-12
+    assert np.array_equal(np.concatenate([tblock for block, tblock in blocks]), t)
+    mapped = filters.SignalGenerator.write(signals, 1e-5, 0.1, 0.14, str(tmp_path/'u.npy'), size=size)
+    assert np.max(np.abs(np.load(str(tmp_path/'u.npy')) - u)) < 1e-12 and len(mapped) == len(u)
+
+def test_signal_samples():
+    assert filters.SignalGenerator.samples(1e-3, 0, 1) == 1000
+    assert filters.SignalGenerator.samples(0.1, 0, 0.3) == 3
+    assert filters.SignalGenerator.samples(1e-3, 1, 0) == 0
+    u, t = filters.SignalGenerator.signal([[1, 50, 0]], 1e-3, 1, 1)
+    assert len(u) == 0 and len(t) == 0
@@ -0,0 +1,161 @@
+# ******************************************************************************
+# * @file test_lod.py
+# * @author Pablo Joaquim
+# * @brief Tests of the level of detail of the large plots: the points kept by the
+# * min/max and LTTB decimations, and the collection decimated when it is drawn
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+import sys
+
+import numpy as np
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import lod
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief A noisy curve of N points with a single spike up and one down
+# ******************************************************************************
+def noisy(N, seed=0):
+    rng = np.random.default_rng(seed)
+    y = np.cumsum(rng.standard_normal(N))
+    y[N//3] = np.max(y) + 100
+    y[2*N//3] = np.min(y) - 100
+    return y
+
+# ******************************************************************************
+# * @brief An empty axes of width pixels on an Agg canvas
+# ******************************************************************************
+def axes(pixels=400):
+    figure = Figure(figsize=(pixels/100, 3), dpi=100)
+    FigureCanvasAgg(figure)
+    return figure, figure.add_axes([0, 0, 1, 1])
+
+@pytest.mark.parametrize('N, buckets', [(10, 3), (1000, 100), (1001, 100), (100000, 800), (5, 10)])
+def test_minmax(N, buckets):
+    y = noisy(N)
+    index = lod.Decimator.minmax(y, buckets)
+    # Sorted, each point once, with both ends
+    assert np.all(np.diff(index) > 0) and index[0] == 0 and index[-1] == N - 1
+    assert y[index].max() == y.max() and y[index].min() == y.min()
+    # The lowest and the highest point of every bucket
+    size = -(-N//buckets)
+    assert len(index) <= 2*(-(-N//size)) + 2
+    for start in range(0, N, size):
+        kept = y[index[(index >= start) & (index < start + size)]]
+        assert kept.min() == y[start:start + size].min() and kept.max() == y[start:start + size].max()
+
+def test_minmax_not_finite():
+    # The extremes are taken among the finite points, unless there are none
+    y = noisy(1000)
+    y[::7] = np.nan
+    y[3] = np.inf
+    index = lod.Decimator.minmax(y, 10)
+    assert np.nanmax(y[np.isfinite(y)]) in y[index] and np.nanmin(y[np.isfinite(y)]) in y[index]
+    assert np.sum(~np.isfinite(y[index])) <= 2
+    index = lod.Decimator.minmax(np.full(100, np.nan), 10)
+    assert np.all(np.diff(index) > 0) and index[0] == 0 and index[-1] == 99
+
+@pytest.mark.parametrize('N, n', [(1000, 50), (1001, 3), (100000, 800)])
+def test_lttb(N, n):
+    x = np.linspace(0, 1, N)
+    y = noisy(N)
+    index = lod.Decimator.lttb(x, y, n)
+    assert len(index) == n and np.all(np.diff(index) > 0)
+    assert index[0] == 0 and index[-1] == N - 1
+    # One point from each bucket between the ends
+    edges = np.linspace(1, N - 1, n - 1).astype(int)
+    assert np.all((index[1:-1] >= edges[:-1]) & (index[1:-1] < edges[1:]))
+    # The spikes make the largest triangles of their buckets, when they are in
+    # different ones
+    assert N//3 in index and (n == 3 or 2*N//3 in index)
+
+@pytest.mark.parametrize('n', [1, 2, 1000, 2000])
+def test_lttb_all(n):
+    # Too few points to decimate
+    assert np.array_equal(lod.Decimator.lttb(np.arange(1000.0), noisy(1000), n), np.arange(1000))
+
+def test_lttb_not_finite():
+    x = np.linspace(0, 1, 1000)
+    y = noisy(1000)
+    y[100:200] = np.nan
+    index = lod.Decimator.lttb(x, y, 40)
+    assert len(index) == 40 and np.all(np.diff(index) > 0) and 1000//3 in index
+
+@pytest.mark.parametrize('method', ['minmax', 'lttb'])
+def test_select(method):
+    x = np.linspace(0, 10, 100001)
+    y = noisy(len(x))
+    xs, ys = lod.Decimator.select(x, y, 2, 8, 300, method)
+    assert len(xs) <= 2*300 + 2 and np.all(np.diff(xs) > 0)
+    # The visible points and one more at each side
+    assert xs[0] < 2 and xs[0] == x[np.searchsorted(x, 2) - 1]
+    assert xs[-1] > 8 and xs[-1] == x[np.searchsorted(x, 8, side='right')]
+    assert ys.max() == y[(x >= xs[0]) & (x <= xs[-1])].max()
+    # The limits in any order, and few points kept as they are
+    assert np.array_equal(lod.Decimator.select(x, y, 8, 2, 300, method)[0], xs)
+    xs, ys = lod.Decimator.select(x, y, 2, 2.001, 300, method)
+    assert np.array_equal(xs, x[(x >= xs[0]) & (x <= xs[-1])]) and len(xs) < 600
+
+def test_select_log():
+    # LTTB measures x in decades on log axes, so the decades get the same points
+    x = np.logspace(0, 6, 600001)
+    y = noisy(len(x))
+    xs = lod.Decimator.select(x, y, 1, 1e6, 300, 'lttb', log=True)[0]
+    counts = np.histogram(np.log10(xs), bins=6, range=(0, 6))[0]
+    assert np.all(np.abs(counts - 100) <= 2)
+
+def test_collection_invalid():
+    with pytest.raises(ValueError):
+        lod.LODCollection('mean')
+
+def test_collection_add():
+    collection = lod.LODCollection()
+    collection.add([3, 1, 2], [30, 10, 20])
+    collection.add([-1, 0, 1], [np.nan, 5, 7])
+    x, y = collection.curves[0]
+    assert np.array_equal(x, [1, 2, 3]) and np.array_equal(y, [10, 20, 30])
+    # Only the finite points
+    assert np.array_equal(collection.limits(), [[0, 5], [3, 30]])
+    assert np.array_equal(collection.limits(log=True), [[1, 7], [3, 30]])
+
+@pytest.mark.parametrize('method', ['minmax', 'lttb'])
+def test_plot(method):
+    # The collection drawn has about two points per pixel, the extremes of the
+    # curves and their whole extent in the limits of the axes
+    figure, ax = axes(400)
+    x = np.logspace(0, 5, 200001)
+    curves = [[x, noisy(len(x), 0), 'C0', 'first'], [x, noisy(len(x), 1), 'C1', '']]
+    collection = lod.plot(ax, curves, method=method, xscale='log')
+    assert ax.get_xscale() == 'log' and ax.get_xlim()[0] <= 1 and ax.get_xlim()[1] >= 1e5
+    assert [line.get_label() for line in ax.get_lines()] == ['first']
+    figure.canvas.draw()
+    pixels = ax.get_window_extent().width
+    segments = collection.get_segments()
+    assert len(segments) == 2
+    for segment, curve in zip(segments, curves):
+        assert len(segment) <= 2*pixels + 2
+        assert segment[:, 1].max() == curve[1].max() and segment[:, 1].min() == curve[1].min()
+    # Zooming in shows the detail of the view
+    view = collection.view
+    figure.canvas.draw()
+    assert collection.view is view
+    ax.set_xlim(10, 20)
+    figure.canvas.draw()
+    segment = collection.get_segments()[0]
+    assert segment[0, 0] < 10 and segment[-1, 0] > 20 and len(segment) <= 2*pixels + 2
+    inside = (x >= segment[0, 0]) & (x <= segment[-1, 0])
+    assert segment[:, 1].max() == curves[0][1][inside].max()
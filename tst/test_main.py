@@ -0,0 +1,136 @@
+# ******************************************************************************
+# * @file test_main.py
+# * @author Pablo Joaquim
+# * @brief Smoke tests of the subcommands of the command line, run as separate
+# * processes, and of the lazy import of the heavy dependencies
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import filters
+from analog import response
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+src = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief Run main.py with the arguments args in the directory cwd and return
+# * its output. It must end with the exit code status
+# ******************************************************************************
+def run(cwd, *args, status=0):
+    env = {name: value for name, value in os.environ.items()
+           if name not in ('PLOT_OUTDIR', 'DESIGN_CACHE_PATH', 'ANALOG_PROFILE')}
+    env['MPLBACKEND'] = 'Agg'
+    process = subprocess.run([sys.executable, os.path.join(src, 'main.py')] + [str(a) for a in args], cwd=str(cwd),
+                             env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True,
+                             timeout=300)
+    assert process.returncode == status, process.stdout
+    return process.stdout
+
+def test_lazy_imports():
+    # Importing the package and the entry point doesn't load scipy.signal, the
+    # plotting libraries or the web framework
+    code = ('import sys, main\n'
+            'from analog import bode, cache, discrete, filters, metrics, order, prototype, response\n'
+            'from analog import sigio, sweep, system, tolerance, transient\n'
+            'print(" ".join(m for m in ("scipy.signal", "matplotlib", "control", "flask", "service") if m in sys.modules))\n')
+    process = subprocess.run([sys.executable, '-c', code], cwd=src, stdout=subprocess.PIPE, universal_newlines=True)
+    assert process.returncode == 0 and process.stdout.strip() == ''
+
+@pytest.mark.parametrize('output, names', [('ba', ['num =', 'den =']), ('zpk', ['z =', 'p =', 'k =']), ('sos', ['sos ='])])
+def test_design(tmp_path, output, names):
+    out = run(tmp_path, 'design', '--order', 2, 3, '--output', output)
+    assert 'butter lowpass - order = 2' in out and 'butter lowpass - order = 3' in out
+    assert all(out.count(name) == 2 for name in names)
+
+def test_band_edges(tmp_path):
+    out = run(tmp_path, 'design', '--btype', 'bandpass', status=1)
+    assert 'bandpass filters need --fci and --fcs' in out
+
+def test_response(tmp_path):
+    run(tmp_path, 'response', '--family', 'cheby1', '--btype', 'bandpass', '--fci', 1000, '--fcs', 2000,
+        '--order', 2, 4, '--points', 50, '--out', 'response.npz')
+    H = [[filters.design('cheby1', 'bandpass', order, 2*np.pi*np.array([1000, 2000]), rp=1, output='zpk'), '']
+         for order in (2, 4)]
+    w, mag, phase, grpdelay = response.BatchResponse.eval(H, n=50)
+    with np.load(str(tmp_path/'response.npz')) as data:
+        assert np.allclose(data['f'], w/(2*np.pi)) and np.allclose(data['mag'], mag.T)
+        assert data['grpdelay'].shape == (50, 2)
+
+def test_metrics(tmp_path):
+    out = run(tmp_path, 'metrics', '--order', 3, '--fpass', 1000, '--fstop', 3000)
+    assert 'ripple' in out and 'settling' in out
+    run(tmp_path, 'metrics', '--order', 3, 5, '--out', 'metrics.json')
+    with open(str(tmp_path/'metrics.json')) as file:
+        m = json.load(file)
+    # The -3 dB frequency of a Butterworth is next to its cutoff, where it is 3.01 dB down
+    assert np.allclose(np.array(m['w3db'])[:, 1], 1000, rtol=1e-3)
+    assert '--fpass and --fstop go together' in run(tmp_path, 'metrics', '--fpass', 1000, status=1)
+
+def test_tolerance(tmp_path):
+    out = run(tmp_path, 'tolerance', '--order', 4, '--samples', 2000, '--fpass', 800, '--fstop', 3000,
+              '--max-ripple', 3, '--min-attenuation', 30)
+    assert '2000 samples with 5 % parts (roots)' in out and 'yield' in out
+
+def test_simulate(tmp_path):
+    run(tmp_path, 'simulate', '--tone', '1,50', '--tone', '0.5,2000,1', '--step', 1e-4, '--tmax', 0.1,
+        '--method', 'foh', '--out', 'sim.csv')
+    data = np.genfromtxt(str(tmp_path/'sim.csv'), delimiter=',', names=True)
+    u, t = filters.SignalGenerator.signal([[1, 50, 0], [0.5, 2000, 1]], 1e-4, 0, 0.1)
+    h = filters.design('butter', 'lowpass', 4, 2*np.pi*1000, output='zpk')
+    assert np.allclose(data['u'], u) and np.allclose(data['y'], filters.ApplyFilter.eval(h, u, t), atol=1e-9)
+    out = run(tmp_path, 'simulate', '--response', 'step', '--step', 1e-5, '--tmax', 0.01)
+    assert '1000 samples of the step response' in out and 'final 1' in out
+
+def test_simulate_file(tmp_path):
+    np.save(str(tmp_path/'u.npy'), np.ones(1000))
+    out = run(tmp_path, 'simulate', '--input', 'u.npy', '--output', 'y.npy', '--fs', 20000)
+    assert '1000 samples filtered' in out
+    y = np.load(str(tmp_path/'y.npy'))
+    h = filters.design('butter', 'lowpass', 4, 2*np.pi*1000, output='zpk')
+    assert np.allclose(y, filters.ApplyFilter.eval(h, np.ones(1000), np.arange(1000)/20000), atol=1e-9)
+    assert 'needs --output and --fs' in run(tmp_path, 'simulate', '--input', 'u.npy', status=1)
+
+@pytest.mark.parametrize('kind, name', [('plot', 'bode.png'), ('pzplot', 'pz.svg')])
+def test_plot(tmp_path, kind, name):
+    out = run(tmp_path, 'plot', '--kind', kind, '--order', 2, 4, '--out', name)
+    assert f'Saved in {name}' in out and os.path.getsize(str(tmp_path/name)) > 0
+
+def test_sweep(tmp_path):
+    with open(str(tmp_path/'grid.json'), 'w') as file:
+        json.dump({'family': ['butter', 'cheby1'], 'order': [1, 2, 3], 'wc': [6000.0]}, file)
+    out = run(tmp_path, 'sweep', 'grid.json', '--out', 'sweep.npy', '--workers', 1, '--chunk', 2)
+    assert '6 points evaluated' in out
+    assert np.load(str(tmp_path/'sweep.npy'))['done'].all()
+
+def test_profile_store(tmp_path):
+    trace = tmp_path/'trace.json'
+    out = run(tmp_path, '--profile', '--trace', trace, '--store', 'store', 'response', '--order', 3)
+    assert 'design.prototype' in out and 'Chrome trace saved' in out
+    with open(str(trace)) as file:
+        assert json.load(file)['traceEvents']
+    # The design and the response are kept in the store for the next run
+    assert os.path.exists(str(tmp_path/'store'/'designs.sqlite'))
+    blobs = sorted(os.listdir(str(tmp_path/'store'/'blobs')))
+    assert len(blobs) > 0
+    out = run(tmp_path, '--profile', '--store', 'store', 'response', '--order', 3)
+    assert 'design.prototype' not in out and sorted(os.listdir(str(tmp_path/'store'/'blobs'))) == blobs
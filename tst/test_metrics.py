@@ -0,0 +1,132 @@
+# ******************************************************************************
+# * @file test_metrics.py
+# * @author Pablo Joaquim
+# * @brief Tests of the figures of merit of the filters against brute force
+# * metrics over dense grids of frequencies and times
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import filters
+from analog import metrics
+from analog import system
+from analog import transient
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+# Cutoff, or band edges, of the designs [rad/s]
+edges = {'lowpass': 2*np.pi*1000, 'highpass': 2*np.pi*1000,
+         'bandpass': 2*np.pi*np.array([1000, 2000]), 'bandstop': 2*np.pi*np.array([1000, 2000])}
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief The AnalogFilter of a design of the given family, band and order
+# ******************************************************************************
+def design(family, btype, order):
+    return filters.design(family, btype, order, edges[btype], rp=1, output='zpk')
+
+# ******************************************************************************
+# * @brief Overshoot [%] and settling time [s] of the step response sampled at
+# * the times t (TransientResponse, checked against lsim in test_transient.py)
+# ******************************************************************************
+def stepmetrics(h, t, settle=0.02):
+    y = transient.TransientResponse(h).step(t)
+    final = np.real(h.freqresp(np.zeros(1)))[0]
+    reference = abs(final) if abs(final) > 1e-9 else np.max(np.abs(y))
+    overshoot = 100*(np.max(y*np.sign(final)) - abs(final))/reference if final != 0 else np.nan
+    outside = np.nonzero(np.abs(y - final) > settle*reference)[0]
+    return max(overshoot, 0), t[outside[-1] + 1] if len(outside) else 0
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('btype', ['lowpass', 'highpass', 'bandpass', 'bandstop'])
+@pytest.mark.parametrize('order', [1, 2, 4, 7])
+def test_step(family, btype, order):
+    h = design(family, btype, order)
+    m = metrics.FilterMetrics.eval([h])[0]
+    t = np.linspace(0, 2*m['settling'], 1000001)
+    overshoot, settling = stepmetrics(h, t)
+    assert abs(m['settling'] - settling) <= 2*t[1]
+    if (btype in ('lowpass', 'bandstop')):
+        assert abs(m['overshoot'] - overshoot) < 1e-6
+    else:
+        assert np.isnan(m['overshoot'])
+
+def test_step_reference():
+    # The band of a response that ends at 0 is relative to the refined peak, not
+    # to the peak over the coarse grid of the time axis
+    h = design('butter', 'bandpass', 4)
+    m = metrics.FilterMetrics.eval([h])[0]
+    t = np.linspace(0, 0.01, 1000001)
+    assert abs(m['settling'] - stepmetrics(h, t)[1]) <= 2*t[1]
+    assert abs(m['settling'] - 0.0047289) < 1e-6
+
+@pytest.mark.parametrize('poles', [[-1]*2, [-1]*3, [-1 + 2j]*2 + [-1 - 2j]*2])
+def test_step_repeated(poles):
+    h = system.AnalogFilter([], np.array(poles, dtype=complex), np.real(np.prod(-np.array(poles))))
+    m = metrics.FilterMetrics.eval([h])[0]
+    t = np.linspace(0, 2*m['settling'], 1000001)
+    overshoot, settling = stepmetrics(h, t)
+    assert abs(m['settling'] - settling) <= 2*t[1]
+    assert abs(m['overshoot'] - overshoot) < 1e-6
+
+def test_step_batch():
+    # Each filter of a batch gets the metrics it gets alone
+    H = [design(family, btype, order) for family in ('butter', 'cheby1') for btype in edges for order in (1, 3, 6)]
+    H.append(system.AnalogFilter([], np.array([-1, -1, -1], dtype=complex), 1))
+    m = metrics.FilterMetrics.eval(H)
+    for i, h in enumerate(H):
+        alone = metrics.FilterMetrics.eval([h])[0]
+        assert np.allclose([m['settling'][i], m['overshoot'][i]], [alone['settling'], alone['overshoot']],
+                           rtol=1e-9, equal_nan=True)
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('btype', ['lowpass', 'highpass', 'bandpass', 'bandstop'])
+@pytest.mark.parametrize('order', [1, 4, 7])
+def test_frequency(family, btype, order):
+    h = design(family, btype, order)
+    m = metrics.FilterMetrics.eval([h])[0]
+    w = 2*np.pi*np.logspace(0, 6, 2000001)
+    mag = 20*np.log10(np.abs(h.freqresp(w)))
+    # The gain at the ends, w = 0 and w = inf
+    with np.errstate(divide='ignore'):
+        ends = 20*np.log10(np.abs([h.freqresp(np.zeros(1))[0], h.k if len(h.z) == len(h.p) else 0]))
+    assert abs(m['peak'] - max(np.max(mag), np.max(ends))) < 1e-6
+    above = mag >= m['peak'] - 3
+    change = np.nonzero(above[:-1] != above[1:])[0]
+    assert np.allclose(m['w3db'], [w[change[0]], w[change[-1]]], rtol=1e-5)
+    grpdelay = -np.gradient(np.unwrap(np.angle(h.freqresp(w))), w)
+    assert abs(m['gdpeak'] - np.max(grpdelay)) < 1e-4*np.max(grpdelay)
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('order', [2, 5])
+def test_bands(family, order):
+    # Lowpass with the passband up to the cutoff and the stopband from twice it
+    h = design(family, 'lowpass', order)
+    wc = edges['lowpass']
+    m = metrics.FilterMetrics.eval([h], wc, 2*wc)[0]
+    passband = 20*np.log10(np.abs(h.freqresp(np.linspace(0, wc, 1000001))))
+    stopband = 20*np.log10(np.abs(h.freqresp(np.linspace(2*wc, 2000*wc, 10000001))))
+    assert abs(m['ripple'] - (np.max(passband) - np.min(passband))) < 1e-6
+    assert abs(m['attenuation'] - (m['peak'] - np.max(stopband))) < 1e-6
+
+def test_quality():
+    h = design('cheby1', 'lowpass', 5)
+    m = metrics.FilterMetrics.eval([h])[0]
+    upper = h.p[h.p.imag > 0]
+    assert np.allclose(m['q'], np.sort(np.abs(upper)/(2*np.abs(upper.real)))[::-1])
+    assert m['qmax'] == np.max(m['q'])
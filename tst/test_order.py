@@ -0,0 +1,88 @@
+# ******************************************************************************
+# * @file test_order.py
+# * @author Pablo Joaquim
+# * @brief Tests of the batched order solver against scipy buttord/cheb1ord
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy import signal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import filters
+from analog import order
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief Random specs of the band type btype, with the edges in rad/s
+# ******************************************************************************
+def specs(btype, n, seed=0):
+    rng = np.random.default_rng(seed)
+    rp = rng.uniform(0.1, 3, n)
+    rs = rng.uniform(20, 80, n)
+    f = np.sort(10**rng.uniform(2, 5, (n, 4)), axis=1)
+    if (btype == 'lowpass'):
+        return f[:, 0], f[:, 1], rp, rs
+    if (btype == 'highpass'):
+        return f[:, 1], f[:, 0], rp, rs
+    if (btype == 'bandpass'):
+        return f[:, 1:3], f[:, [0, 3]], rp, rs
+    return f[:, [0, 3]], f[:, 1:3], rp, rs
+
+# ******************************************************************************
+# * @brief The scalar scipy function of the family
+# ******************************************************************************
+def scipyord(family):
+    return signal.buttord if family == 'butter' else signal.cheb1ord
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('btype', ['lowpass', 'highpass', 'bandpass', 'bandstop'])
+def test_solve(family, btype):
+    wp, ws, rp, rs = specs(btype, 200)
+    N, Wn = order.OrderSolver.solve(wp, ws, rp, rs, family)
+    assert N.shape == (200,) and Wn.shape == wp.shape
+    for i in range(len(wp)):
+        N0, Wn0 = scipyord(family)(wp[i], ws[i], rp[i], rs[i], analog=True)
+        assert N[i] == N0
+        # The bandstop edges are searched with another method than fminbound
+        assert np.allclose(Wn[i], Wn0, rtol=1e-6 if btype == 'bandstop' else 1e-12)
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('wp, ws', [(1000, 2000), (2000, 1000)])
+def test_scalar(family, wp, ws):
+    N, Wn = order.OrderSolver.solve(wp, ws, 1, 40, family)
+    N0, Wn0 = scipyord(family)(wp, ws, 1, 40, analog=True)
+    assert isinstance(N, int) and np.ndim(Wn) == 0
+    assert N == N0 and np.isclose(Wn, Wn0, rtol=1e-12)
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+def test_broadcast(family):
+    # Many stopband edges for the same passband edge, and the other way round
+    ws = np.array([1500, 2000, 4000])
+    N, Wn = order.OrderSolver.solve(1000, ws, 1, 40, family)
+    assert np.array_equal(N, [scipyord(family)(1000, w, 1, 40, analog=True)[0] for w in ws])
+    wp = np.array([[1000, 2000], [1100, 1900]])
+    N, Wn = order.OrderSolver.solve(wp, [500, 4000], 1, 40, family)
+    for i in range(len(wp)):
+        N0, Wn0 = scipyord(family)(wp[i], [500, 4000], 1, 40, analog=True)
+        assert N[i] == N0 and np.allclose(Wn[i], Wn0, rtol=1e-12)
+
+def test_unknown_family():
+    with pytest.raises(ValueError):
+        order.OrderSolver.solve(1000, 2000, 1, 40, 'ellip')
+
+def test_lowpass_order():
+    assert filters.Chebyshev.cheby_lowpass_order(1000, 2000, 1, 15) == signal.cheb1ord(1000, 2000, 1, 15, analog=True)
+    assert filters.Butterworth.butter_lowpass_order(1000, 2000, 1, 15) == signal.buttord(1000, 2000, 1, 15, analog=True)
@@ -0,0 +1,156 @@
+# ******************************************************************************
+# * @file test_profiler.py
+# * @author Pablo Joaquim
+# * @brief Tests of the profiling spans, counters and array sizes, and of their
+# * summary and Chrome trace
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import cache
+from analog import filters
+from analog import profiler
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief The default profiler, enabled and empty, disabled again after the test
+# ******************************************************************************
+@pytest.fixture
+def default():
+    profiler.reset()
+    profiler.enable()
+    yield profiler.default
+    profiler.disable()
+    profiler.reset()
+
+def test_disabled():
+    p = profiler.Profiler()
+    assert p.span('a') is profiler.noSpan
+    with p.span('a'):
+        pass
+    p.count('b')
+    p.array('c', np.zeros(10))
+    assert p.spans == {} and p.counters == {} and p.arrays == {} and p.events == []
+
+def test_span():
+    p = profiler.Profiler()
+    p.enable()
+    for delay in (0.001, 0.02, 0.001):
+        with p.span('sleep'):
+            time.sleep(delay)
+    calls, total, longest = p.spans['sleep']
+    assert calls == 3 and total >= 22e6 and 20e6 <= longest <= total
+    assert [event[0] for event in p.events] == ['sleep']*3
+    # Disabling keeps what was recorded
+    p.disable()
+    with p.span('sleep'):
+        pass
+    assert p.spans['sleep'][0] == 3
+
+def test_nested():
+    p = profiler.Profiler()
+    p.enable()
+    with p.span('outer'):
+        with p.span('inner'):
+            time.sleep(0.005)
+    assert p.spans['outer'][1] >= p.spans['inner'][1]
+
+def test_counters_arrays():
+    p = profiler.Profiler()
+    p.enable()
+    p.count('calls')
+    p.count('calls', 4)
+    p.array('block', np.zeros(10), np.zeros(100, dtype=np.float32))
+    p.array('block', np.zeros(20))
+    p.array('block', [1, 2])
+    assert p.counters == {'calls': 5} and p.arrays == {'block': 400}
+
+def test_max_events():
+    p = profiler.Profiler(maxEvents=5)
+    p.enable()
+    for i in range(10):
+        with p.span('a'):
+            pass
+    # The totals are kept beyond the events
+    assert len(p.events) == 5 and p.spans['a'][0] == 10
+
+def test_threads():
+    p = profiler.Profiler()
+    p.enable()
+    # All the threads alive at once, so none reuses the id of another
+    barrier = threading.Barrier(8)
+    def run():
+        barrier.wait()
+        for i in range(1000):
+            p.count('n')
+            with p.span('s'):
+                pass
+        barrier.wait()
+    threads = [threading.Thread(target=run) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert p.counters['n'] == 8000 and p.spans['s'][0] == 8000
+    assert len({event[3] for event in p.events}) == 8
+
+def test_summary_chrome(tmp_path):
+    p = profiler.Profiler()
+    p.enable()
+    with p.span('short'):
+        pass
+    with p.span('long'):
+        time.sleep(0.01)
+    p.count('calls', 3)
+    p.array('block', np.zeros(2**20))
+    lines = p.summary().split('\n')
+    # The spans sorted by their total time
+    assert lines[1].startswith('long') and lines[2].startswith('short')
+    assert any(line.split() == ['calls', '3'] for line in lines)
+    assert any(line.split() == ['block', '8.000'] for line in lines)
+    path = str(tmp_path/'trace.json')
+    p.chrome(path)
+    with open(path) as file:
+        events = json.load(file)['traceEvents']
+    spans = [event for event in events if event['ph'] == 'X']
+    assert [event['name'] for event in spans] == ['short', 'long']
+    assert spans[1]['ts'] >= spans[0]['ts'] and spans[1]['dur'] >= 1e4
+    assert [event['args'] for event in events if event['ph'] == 'C'] == [{'count': 3}]
+
+def test_profiled(default):
+    @profiler.profiled('double')
+    def double(x):
+        return 2*x
+    assert double(2) == 4 and double.__name__ == 'double'
+    assert default.spans['double'][0] == 1
+    profiler.disable()
+    assert double(3) == 6 and default.spans['double'][0] == 1
+
+def test_instrumented(default, monkeypatch):
+    # The stages of the package are recorded in the default profiler
+    monkeypatch.setattr(filters, 'designCache', cache.DesignCache())
+    h = filters.design('butter', 'lowpass', 4, 2*np.pi*1000, output='zpk')
+    filters.design('butter', 'lowpass', 4, 2*np.pi*1000, output='zpk')
+    u, t = filters.SignalGenerator.signal([[1, 100, 0]], 1e-5, 0, 0.01)
+    filters.ApplyFilter.eval(h, u, t, method='foh')
+    assert default.counters['design.calls'] == 2 and default.counters['design.prototype'] == 1
+    assert default.counters['simulate.samples'] == len(u)
+    assert 'synth.block' in default.spans and 'simulate.sosfilt' in default.spans
+    assert default.arrays['simulate.input'] == u.nbytes
@@ -0,0 +1,132 @@
+# ******************************************************************************
+# * @file test_prototype.py
+# * @author Pablo Joaquim
+# * @brief Tests of the closed-form roots of the Butterworth and Chebyshev type I
+# * filters against scipy.signal.butter and cheby1
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy import signal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import prototype
+from analog import system
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+# Cutoff, or band edges, of the designs [rad/s]
+edges = {'lowpass': 2*np.pi*1000, 'highpass': 2*np.pi*1000,
+         'bandpass': 2*np.pi*np.array([1000, 3000]), 'bandstop': 2*np.pi*np.array([1000, 3000])}
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief The scipy design of the family, band and order
+# ******************************************************************************
+def scipyzpk(family, btype, N, wn, rp=1):
+    if (family == 'butter'):
+        return signal.butter(N, wn, btype, analog=True, output='zpk')
+    return signal.cheby1(N, rp, wn, btype, analog=True, output='zpk')
+
+# ******************************************************************************
+# * @brief Largest distance between the roots a and their nearest roots of b,
+# * each root of b taken once, relative to the largest root
+# ******************************************************************************
+def distance(a, b):
+    assert len(a) == len(b)
+    b = list(b)
+    largest = 0
+    for r in a:
+        i = int(np.argmin(np.abs(np.array(b) - r)))
+        largest = max(largest, abs(b.pop(i) - r))
+    return largest/max(np.max(np.abs(a), initial=0), 1e-300)
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('btype', ['lowpass', 'highpass', 'bandpass', 'bandstop'])
+@pytest.mark.parametrize('N', [1, 2, 3, 4, 5, 8, 11, 16])
+def test_zpk(family, btype, N):
+    z, p, k = prototype.Prototype.zpk(family, btype, N, edges[btype], rp=1)
+    z0, p0, k0 = scipyzpk(family, btype, N, edges[btype])
+    assert distance(p, p0) < 1e-12 and distance(z, z0) < 1e-12
+    assert np.isclose(k, k0, rtol=1e-10)
+
+@pytest.mark.parametrize('rp', [0.01, 0.5, 3, 10])
+@pytest.mark.parametrize('N', [1, 2, 7])
+def test_cheby1_ripple(rp, N):
+    z, p, k = prototype.Prototype.zpk('cheby1', 'lowpass', N, 1, rp)
+    z0, p0, k0 = signal.cheb1ap(N, rp)
+    assert distance(p, p0) < 1e-12 and np.isclose(k, k0, rtol=1e-12)
+    # Inside the passband |H| swings between 0 and -rp dB
+    mag = 20*np.log10(np.abs(system.AnalogFilter(z, p, k).freqresp(np.linspace(0, 1, 10001))))
+    assert abs(np.max(mag)) < 1e-6 and abs(np.min(mag) + rp) < 1e-6
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('N', [1, 4, 5, 12])
+def test_conjugate(family, N):
+    # The complex roots of the prototype come in exact conjugate pairs and the
+    # real one is exactly real
+    p = prototype.Prototype.zpk(family, 'lowpass', N, 1, rp=1)[1]
+    assert np.array_equal(p, np.conj(p[::-1]))
+    assert np.sum(p.imag == 0) == N % 2
+    # After the transforms, to the rounding of the roots
+    for btype in ('bandpass', 'bandstop'):
+        z, p, k = prototype.Prototype.zpk(family, btype, N, edges[btype], rp=1)
+        assert distance(p, np.conj(p)) < 1e-15 and distance(z, np.conj(z)) < 1e-15
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('btype', ['lowpass', 'highpass', 'bandpass', 'bandstop'])
+@pytest.mark.parametrize('N', [1, 4, 9])
+def test_ba(family, btype, N):
+    num, den = prototype.Prototype.ba(*prototype.Prototype.zpk(family, btype, N, edges[btype], rp=1))
+    if (family == 'butter'):
+        num0, den0 = signal.butter(N, edges[btype], btype, analog=True)
+    else:
+        num0, den0 = signal.cheby1(N, 1, edges[btype], btype, analog=True)
+    assert np.allclose(den, den0, rtol=1e-9, atol=0)
+    # scipy keeps the leading zeros of the numerator
+    assert np.allclose(np.trim_zeros(num0, 'f'), num, rtol=1e-9, atol=1e-9*np.max(np.abs(num)))
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('width', [1e-3, 1e-6, 1e-9])
+def test_narrow_band(family, width):
+    # The roots of very narrow bands keep their digits: the gain at the center of
+    # a Butterworth bandpass is 1 and the -3 dB edges are the design edges, to
+    # about the rounding of the roots over the width of the band
+    w1 = 2*np.pi*1000
+    wn = [w1, w1*(1 + width)]
+    h = system.AnalogFilter(*prototype.Prototype.zpk(family, 'bandpass', 6, wn, rp=1))
+    wo = np.sqrt(wn[0]*wn[1])
+    mag = 20*np.log10(np.abs(h.freqresp(np.array([wo, wn[0], wn[1]]))))
+    tol = 1e-8 + 1e-14/width
+    if (family == 'butter'):
+        assert abs(mag[0]) < tol and np.allclose(mag[1:], -10*np.log10(2), atol=tol)
+    else:
+        # The Chebyshev edges are at -rp
+        assert np.allclose(mag[1:], -1, atol=tol)
+
+@pytest.mark.parametrize('args', [
+    ('butter', 'lowpass', 0, 1),
+    ('cheby1', 'lowpass', 3, 1, 0),
+    ('cheby1', 'lowpass', 3, 1, None),
+    ('butter', 'lowpass', 3, -1),
+    ('butter', 'bandpass', 3, [2, 1]),
+    ('butter', 'bandstop', 3, [0, 1]),
+    ('butter', 'allpass', 3, 1),
+    ('ellip', 'lowpass', 3, 1),
+])
+def test_invalid(args):
+    with pytest.raises(ValueError):
+        prototype.Prototype.zpk(*args)
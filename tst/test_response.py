@@ -0,0 +1,198 @@
+# ******************************************************************************
+# * @file test_response.py
+# * @author Pablo Joaquim
+# * @brief Tests of the batch evaluation of the frequency responses and of the
+# * adaptive grids, peaks and crossings against scipy.signal.freqs and freqs_zpk
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy import signal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import filters
+from analog import response
+from analog import system
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+# Cutoff, or band edges, of the designs [rad/s]
+edges = {'lowpass': 2*np.pi*1000, 'highpass': 2*np.pi*1000,
+         'bandpass': 2*np.pi*np.array([1000, 2000]), 'bandstop': 2*np.pi*np.array([1000, 2000])}
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief A mixed batch: every band type of both families, as [num, den, label]
+# * and as [AnalogFilter, label]
+# ******************************************************************************
+def batch(order=4):
+    H = []
+    for family in ('butter', 'cheby1'):
+        for btype in edges:
+            h = filters.design(family, btype, order, edges[btype], rp=1, output='zpk')
+            num, den = filters.design(family, btype, order, edges[btype], rp=1, output='ba')
+            H.append([h, f'{family} {btype}'])
+            H.append([num, den, f'{family} {btype} ba'])
+    return H
+
+# ******************************************************************************
+# * @brief Magnitude [dB], phase [degrees] and group delay [s] of h from scipy,
+# * the group delay as a central difference of the phase around each frequency
+# ******************************************************************************
+def reference(h, w, step=1e-6):
+    h = system.split(h)[0]
+    if (isinstance(h, system.AnalogFilter)):
+        freqs = lambda w: signal.freqs_zpk(h.z, h.p, h.k, w)[1]
+    else:
+        freqs = lambda w: signal.freqs(h[0], h[1], w)[1]
+    H = freqs(w)
+    grpdelay = -np.angle(freqs(w*(1 + step))/freqs(w*(1 - step)))/(2*step*w)
+    return 20*np.log10(np.abs(H)), np.angle(H)*180/np.pi, grpdelay
+
+def test_stack():
+    num, den = response.BatchResponse.stack([[[1], [1, 2]], [[1, 2, 3], [1, 2, 3, 4]]])
+    assert np.array_equal(num, [[0, 0, 0, 1], [0, 1, 2, 3]])
+    assert np.array_equal(den, [[0, 0, 1, 2], [1, 2, 3, 4]])
+    roots = response.BatchResponse.stackroots([np.array([1j]), np.array([]), np.array([1, 2])])
+    assert roots.shape == (3, 2)
+    assert np.isnan(roots[0, 1]) and np.all(np.isnan(roots[1])) and np.array_equal(roots[2], [1, 2])
+
+def test_eval():
+    H = batch()
+    w = np.logspace(2, 6, 2001)
+    W, mag, phase, grpdelay = response.BatchResponse.eval(H, w)
+    assert np.array_equal(W, w) and mag.shape == (len(H), len(w))
+    for i, h in enumerate(H):
+        m, ph, gd = reference(h, w)
+        assert np.max(np.abs(mag[i] - m)) < 1e-6
+        # The same phase up to whole turns (the zeros of a bandstop on the j axis
+        # turn it by 180 degrees each)
+        offset = phase[i] - ph
+        assert np.max(np.abs(offset - 360*np.round(offset/360))) < 1e-6
+        assert np.max(np.abs(grpdelay[i] - gd)) < 1e-6*np.max(np.abs(gd))
+
+def test_eval_zpk_ba():
+    # The same filter given as roots and as polynomials
+    H = batch()
+    W, mag, phase, grpdelay = response.BatchResponse.eval(H, np.logspace(2, 6, 501))
+    assert np.max(np.abs(mag[0::2] - mag[1::2])) < 1e-6
+    assert np.max(np.abs(grpdelay[0::2] - grpdelay[1::2])) < 1e-9*np.max(np.abs(grpdelay))
+
+def test_high_order():
+    # The polynomials of an order 30 filter overflow, its roots don't
+    h = filters.design('butter', 'lowpass', 30, 2*np.pi*1e5, output='zpk')
+    w = np.logspace(3, 8, 501)
+    W, mag, phase, grpdelay = response.BatchResponse.eval([[h, '']], w)
+    assert np.all(np.isfinite(mag)) and np.all(np.isfinite(grpdelay))
+    assert np.max(np.abs(mag[0] - 20*np.log10(np.abs(h.freqresp(w))))) < 1e-9
+
+def test_grid():
+    H = batch()
+    W, mag, phase, grpdelay = response.BatchResponse.eval(H, n=200)
+    assert len(W) == 200 and np.all(np.diff(W) > 0)
+    # The grid covers the grids scipy.signal.bode would pick for each transfer
+    for h in H:
+        h = system.split(h)[0]
+        w = signal.findfreqs(h.z, h.p, 2, kind='zp') if isinstance(h, system.AnalogFilter) else signal.findfreqs(h[0], h[1], 2)
+        assert W[0] <= w[0]*(1 + 1e-12) and W[-1] >= w[-1]*(1 - 1e-12)
+
+@pytest.mark.parametrize('k', [1, -2.5])
+def test_evalroots(k):
+    z = np.array([[1j, -1j, np.nan], [-3, np.nan, np.nan]])
+    p = np.array([[-1 + 1j, -1 - 1j, -2], [-1, -4, np.nan]])
+    w = np.logspace(-2, 2, 101)
+    mag, phase, grpdelay = response.BatchResponse.evalroots(z, p, np.array([k, k]), w)
+    for i in range(2):
+        zi, pi = z[i][~np.isnan(z[i])], p[i][~np.isnan(p[i])]
+        H = signal.freqs_zpk(zi, pi, k, w)[1]
+        with np.errstate(divide='ignore'):
+            assert np.allclose(mag[i], 20*np.log10(np.abs(H)), atol=1e-9, equal_nan=True)
+        # The phase is undefined on the zeros of the j axis
+        nonzero = np.abs(H) > 1e-12
+        assert np.allclose(np.exp(1j*phase[i][nonzero]*np.pi/180), H[nonzero]/np.abs(H[nonzero]), atol=1e-9)
+
+# ******************************************************************************
+# * @brief Magnitude [dB] of h at w, from scipy
+# ******************************************************************************
+def magnitude(h, w):
+    return 20*np.log10(np.abs(signal.freqs_zpk(h.z, h.p, h.k, w)[1]))
+
+# ******************************************************************************
+# * @brief A second-order bandpass with its peak at w0 and quality factor Q, so
+# * narrow that a log spaced grid misses it
+# ******************************************************************************
+def resonance(w0=2*np.pi*1000, Q=1e4):
+    return system.AnalogFilter.from_ba([w0/Q, 0], [1, w0/Q, w0**2])
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('btype', ['lowpass', 'highpass', 'bandpass', 'bandstop'])
+@pytest.mark.parametrize('tol', [0.1, 0.01])
+def test_adaptive(family, btype, tol):
+    h = filters.design(family, btype, 6, edges[btype], rp=1, output='zpk')
+    w, mag, phase, grpdelay = response.AdaptiveResponse.adaptive(h, tol)
+    assert np.all(np.diff(w) > 0) and len(w) < 20000
+    assert np.allclose(mag, magnitude(h, w), atol=1e-9)
+    # Between the points the response is the line between them, in log w, to
+    # about tol (only the middle of each interval is checked)
+    dense = np.logspace(np.log10(w[0]), np.log10(w[-1]), 200001)
+    exact = magnitude(h, dense)
+    interpolated = np.interp(np.log10(dense), np.log10(w), mag)
+    above = exact > np.max(exact) - 120
+    assert np.max(np.abs(interpolated - exact)[above]) < 2*tol
+
+def test_adaptive_resonance():
+    h = resonance()
+    w, mag, phase, grpdelay = response.AdaptiveResponse.adaptive(h, 0.01)
+    # The points cluster around the peak, 0 dB at w0
+    assert np.max(mag) > -0.01
+    assert np.sum(np.abs(w/(2*np.pi*1000) - 1) < 1e-3) > 20
+
+def test_adaptive_maxpoints():
+    w, mag, phase, grpdelay = response.AdaptiveResponse.adaptive(resonance(Q=1e6), 1e-6, maxpoints=500)
+    assert len(w) < 2*500
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('btype', ['lowpass', 'highpass', 'bandpass', 'bandstop'])
+@pytest.mark.parametrize('order', [1, 4, 7])
+def test_peak_crossings(family, btype, order):
+    h = filters.design(family, btype, order, edges[btype], rp=1, output='zpk')
+    w = 2*np.pi*np.logspace(0, 6, 2000001)
+    mag = magnitude(h, w)
+    wpeak, peak = response.AdaptiveResponse.peak(h)
+    assert peak >= np.max(mag) - 1e-9
+    # At w = inf the gain is k
+    assert abs((magnitude(h, [wpeak])[0] if np.isfinite(wpeak) else 20*np.log10(abs(h.k))) - peak) < 1e-12
+    wc = response.AdaptiveResponse.crossings(h, -3)
+    above = mag >= peak - 3
+    change = np.nonzero(above[:-1] != above[1:])[0]
+    assert len(wc) == len(change)
+    assert np.allclose(wc, w[change], rtol=1e-5)
+    assert np.allclose(magnitude(h, wc), peak - 3, atol=1e-9)
+
+def test_peak_resonance():
+    h = resonance()
+    wpeak, peak = response.AdaptiveResponse.peak(h)
+    assert abs(wpeak/(2*np.pi*1000) - 1) < 1e-9 and abs(peak) < 1e-9
+    # The half-power band of a second-order bandpass is w0/Q wide
+    low, high = response.AdaptiveResponse.crossings([h.ba()[0], h.ba()[1], 'resonance'], -10*np.log10(2))
+    assert abs((high - low) - 2*np.pi*1000/1e4) < 1e-6*2*np.pi*1000/1e4
+
+def test_crossings_reference():
+    # Relative to 0 dB instead of the peak, the -20 dB edge of a lowpass
+    h = filters.design('butter', 'lowpass', 2, 1000, output='zpk')
+    wc = response.AdaptiveResponse.crossings(h, -20, reference=0)
+    assert len(wc) == 1 and abs(magnitude(h, wc)[0] + 20) < 1e-9
+    assert abs(wc[0] - 1000*99**0.25) < 1e-9*wc[0]
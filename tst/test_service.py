@@ -0,0 +1,196 @@
+# ******************************************************************************
+# * @file test_service.py
+# * @author Pablo Joaquim
+# * @brief Tests of the endpoints of the web service with the Flask test client:
+# * the results against the library, the response cache and the invalid requests
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import io
+import os
+import sys
+
+import msgpack
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import service
+from analog import cache
+from analog import filters
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+lowpass = {'family': 'butter', 'btype': 'lowpass', 'order': 4, 'wc': 2*np.pi*1000}
+bandpass = {'family': 'cheby1', 'btype': 'bandpass', 'order': 3, 'wci': 2*np.pi*1000, 'wcs': 2*np.pi*2000, 'rp': 1}
+signals = [[1, 300, 0], [0.5, 3000, 1]]
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief A test client over empty response caches, without the on-disk store
+# ******************************************************************************
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(service, 'responseCache', cache.DesignCache(maxsize=512, maxbytes=64*2**20))
+    monkeypatch.setattr(service, 'responseStore', None)
+    return service.create().test_client()
+
+# ******************************************************************************
+# * @brief The arrays of a json response, with the [re, im] pairs of complex as
+# * the last axis
+# ******************************************************************************
+def arrays(reply):
+    assert reply.status_code == 200, reply.data
+    return {name: np.array(value, dtype=float) for name, value in reply.get_json().items()}
+
+@pytest.mark.parametrize('output', ['ba', 'sos', 'zpk'])
+def test_design(client, output):
+    body = arrays(client.post('/design', json=dict(bandpass, output=output)))
+    if (output == 'ba'):
+        num, den = filters.design('cheby1', 'bandpass', 3, [2*np.pi*1000, 2*np.pi*2000], rp=1, output='ba')
+        assert np.allclose(body['num'], num, rtol=1e-12) and np.allclose(body['den'], den, rtol=1e-12)
+    elif (output == 'sos'):
+        h = filters.design('cheby1', 'bandpass', 3, [2*np.pi*1000, 2*np.pi*2000], rp=1, output='zpk')
+        assert np.allclose(body['sos'], h.sos(), rtol=1e-12)
+    else:
+        h = filters.design('cheby1', 'bandpass', 3, [2*np.pi*1000, 2*np.pi*2000], rp=1, output='zpk')
+        assert np.allclose(body['p'][:, 0] + 1j*body['p'][:, 1], h.p, rtol=1e-12)
+        assert np.isclose(body['k'], h.k, rtol=1e-12)
+
+@pytest.mark.parametrize('format', ['json', 'npz', 'msgpack'])
+def test_formats(client, format):
+    reply = client.post(f'/design?format={format}', json=lowpass)
+    assert reply.status_code == 200 and reply.mimetype == service.mimetypes[format]
+    if (format == 'npz'):
+        with np.load(io.BytesIO(reply.data)) as data:
+            den = data['den']
+    elif (format == 'msgpack'):
+        packed = msgpack.unpackb(reply.data)['den']
+        den = np.frombuffer(packed['data'], dtype=packed['dtype']).reshape(packed['shape'])
+    else:
+        den = np.array(reply.get_json()['den'])
+    assert np.allclose(den, filters.design('butter', 'lowpass', 4, 2*np.pi*1000, output='ba')[1], rtol=1e-12)
+
+def test_accept(client):
+    reply = client.post('/design', json=lowpass, headers={'Accept': 'application/msgpack'})
+    assert reply.mimetype == 'application/msgpack'
+
+def test_response(client):
+    w = np.logspace(2, 5, 30)
+    body = arrays(client.post('/response', json={'filters': [lowpass, bandpass], 'w': w.tolist()}))
+    assert np.allclose(body['w'], w)
+    assert body['mag'].shape == (2, 30) and body['phase'].shape == (2, 30) and body['grpdelay'].shape == (2, 30)
+    h = filters.design('butter', 'lowpass', 4, 2*np.pi*1000, output='zpk')
+    assert np.allclose(body['mag'][0], 20*np.log10(np.abs(h.freqresp(w))), atol=1e-9)
+    body = arrays(client.post('/response', json={'filters': [lowpass], 'n': 50}))
+    assert body['w'].shape == (50,) and body['mag'].shape == (1, 50)
+
+def test_pzmap(client):
+    body = arrays(client.post('/pzmap', json={'filters': [lowpass, bandpass]}))
+    # Rows padded with nan, which json gives back as null
+    assert body['poles'].shape == (2, 6, 2)
+    assert np.sum(np.isfinite(body['poles'][0, :, 0])) == 4
+    assert np.all(np.isfinite(body['poles'][1, :, 0]))
+    assert np.allclose(body['gain'][0], filters.design('butter', 'lowpass', 4, 2*np.pi*1000, output='zpk').k)
+
+def test_simulate(client):
+    body = arrays(client.post('/simulate', json={'filter': lowpass, 'signals': signals, 'step': 1e-5, 'tmax': 0.01}))
+    u, t = filters.SignalGenerator.signal(signals, 1e-5, 0, 0.01)
+    h = filters.design('butter', 'lowpass', 4, 2*np.pi*1000, output='zpk')
+    assert np.allclose(body['t'], t) and np.allclose(body['u'], u)
+    assert np.allclose(body['y'], filters.ApplyFilter.eval(h, u, t, method='foh'), atol=1e-12)
+
+@pytest.mark.parametrize('kind, format, magic', [('plot', 'png', b'\x89PNG'), ('pzplot', 'png', b'\x89PNG'),
+                                                 ('plot', 'svg', b'<?xml')])
+def test_plot(client, kind, format, magic):
+    reply = client.post(f'/plot?format={format}', json={'filters': [lowpass], 'kind': kind, 'title': 'test'})
+    assert reply.status_code == 200 and reply.mimetype == service.mimetypes[format]
+    assert reply.data.startswith(magic)
+
+def test_cache_hit(client):
+    first = client.post('/response', json={'filters': [lowpass], 'n': 20})
+    # The same body with the numbers written otherwise and the keys in other order
+    second = client.post('/response', json={'n': 20.0, 'filters': [dict(lowpass, order=4.0)]})
+    assert first.headers['X-Cache'] == 'miss' and second.headers['X-Cache'] == 'hit'
+    assert first.data == second.data
+    assert client.post('/response?format=npz', json={'filters': [lowpass], 'n': 20}).headers['X-Cache'] == 'miss'
+    stats = client.get('/stats').get_json()['responses']
+    assert stats['hits'] == 1 and stats['misses'] == 2
+
+def test_cache_bypass(client, monkeypatch):
+    monkeypatch.setattr(service, 'maxCached', 100)
+    body = {'filters': [lowpass], 'n': 20}
+    first = client.post('/response', json=body)
+    second = client.post('/response', json=body)
+    assert first.headers['X-Cache'] == 'bypass' and second.headers['X-Cache'] == 'bypass'
+    assert first.data == second.data and len(first.data) > 100
+    assert client.get('/stats').get_json()['responses']['size'] == 0
+
+def test_cache_bytes(client, monkeypatch):
+    monkeypatch.setattr(service, 'responseCache', cache.DesignCache(maxsize=512, maxbytes=20000))
+    sizes = [len(client.post('/response', json={'filters': [lowpass], 'n': n}).data) for n in range(20, 120, 10)]
+    stats = client.get('/stats').get_json()['responses']
+    assert sum(sizes) > 20000
+    assert stats['bytes'] <= 20000 and stats['bytes'] == sum(sizes[-stats['size']:])
+    # The least recently used were dropped
+    assert client.post('/response', json={'filters': [lowpass], 'n': 110}).headers['X-Cache'] == 'hit'
+    assert client.post('/response', json={'filters': [lowpass], 'n': 20}).headers['X-Cache'] == 'miss'
+
+def test_store(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(service, 'responseStore', cache.ResponseStore(str(tmp_path), maxbytes=20000))
+    body = {'filters': [lowpass], 'n': 100}
+    first = client.post('/response', json=body)
+    service.responseCache.clear()
+    # Another worker, with nothing in memory, finds it in the store
+    second = client.post('/response', json=body)
+    assert first.headers['X-Cache'] == 'miss' and second.headers['X-Cache'] == 'hit'
+    assert first.data == second.data
+    for n in range(110, 200, 10):
+        client.post('/response', json={'filters': [lowpass], 'n': n})
+    stats = client.get('/stats').get_json()['store']
+    assert stats['evictions'] > 0 and stats['bytes'] <= 20000
+    assert len(os.listdir(tmp_path/'blobs')) == stats['entries']
+
+@pytest.mark.parametrize('path, body', [
+    ('/design', []),
+    ('/design', {'wc': 1000, 'order': 3000}),
+    ('/design', {'wc': 1000, 'order': 0}),
+    ('/design', {'wc': 1000, 'order': 2.5}),
+    ('/design', {'wc': 1000, 'order': 'x'}),
+    ('/design', {'order': 4}),
+    ('/design', {'num': [1], 'den': [0, 1]}),
+    ('/design', {'num': [1], 'den': [1] + [0]*100}),
+    ('/design', {'z': [], 'p': [[-1, 'x']]}),
+    ('/response', {'filters': []}),
+    ('/response', {'filters': [lowpass], 'n': 10**9}),
+    ('/response', {'filters': [lowpass], 'n': 0}),
+    ('/response', {'filters': [lowpass], 'w': list(range(1, 200002))}),
+    ('/response', {'filters': [lowpass], 'w': []}),
+    ('/pzmap', {}),
+    ('/simulate', {'filter': lowpass, 'signals': signals, 'step': 1e-4, 'tmax': 1e-4}),
+    ('/simulate', {'filter': lowpass, 'signals': signals, 'step': 1e-4, 'tmax': -1}),
+    ('/simulate', {'filter': lowpass, 'signals': signals, 'step': 0, 'tmax': 1}),
+    ('/simulate', {'filter': lowpass, 'signals': signals, 'step': 1e-9, 'tmax': 1e3}),
+    ('/simulate', {'filter': lowpass, 'signals': [], 'step': 1e-4, 'tmax': 1}),
+    ('/simulate', {'filter': lowpass, 'signals': [[1, 100, 0, 4]], 'step': 1e-4, 'tmax': 1}),
+    ('/simulate', {'filter': lowpass, 'step': 1e-4, 'tmax': 1}),
+    ('/plot', {'filters': [lowpass], 'kind': 'bode'}),
+])
+def test_invalid(client, path, body):
+    reply = client.post(path, json=body)
+    assert reply.status_code == 400
+    message = reply.get_json()['error']
+    assert 'out of bounds' not in message
+
+def test_invalid_format(client):
+    assert client.post('/design?format=png', json=lowpass).status_code == 400
+    assert client.post('/plot?format=json', json={'filters': [lowpass]}).status_code == 400
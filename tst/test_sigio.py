@@ -0,0 +1,139 @@
+# ******************************************************************************
+# * @file test_sigio.py
+# * @author Pablo Joaquim
+# * @brief Tests of the block by block reading and writing of signal files and of
+# * the filtering of a file into another
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import filters
+from analog import sigio
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief n samples of noise in the given number of channels, (n,) for one
+# ******************************************************************************
+def noise(n, channels=1):
+    u = np.random.default_rng(0).standard_normal((n, channels))
+    return u[:, 0] if channels == 1 else u
+
+# ******************************************************************************
+# * @brief Write u to path in blocks of size samples and read it back in blocks of
+# * size samples, returning the blocks read
+# ******************************************************************************
+def roundtrip(path, u, size, dtype=np.float64, length=None, **options):
+    channels = 1 if u.ndim == 1 else u.shape[1]
+    with sigio.SignalWriter(path, dtype=dtype, channels=channels, length=length, **options) as writer:
+        for start in range(0, len(u), size):
+            writer.write(u[start:start+size])
+    assert writer.position == len(u)
+    reader = sigio.SignalReader(path, dtype=dtype, channels=channels, **options)
+    assert reader.channels == channels
+    return list(reader.blocks(size))
+
+@pytest.mark.parametrize('channels', [1, 3])
+@pytest.mark.parametrize('known', [True, False])
+@pytest.mark.parametrize('size', [1, 7, 1000])
+def test_npy(tmp_path, channels, known, size):
+    u = noise(1000, channels)
+    path = str(tmp_path/'u.npy')
+    blocks = roundtrip(path, u, size, length=len(u) if known else None)
+    assert np.array_equal(np.concatenate(blocks), u)
+    assert all(len(block) <= size for block in blocks)
+    # A regular .npy file
+    assert np.array_equal(np.load(path), u)
+    assert sigio.SignalReader(path).length() == len(u)
+
+@pytest.mark.parametrize('channels', [1, 2])
+@pytest.mark.parametrize('known', [True, False])
+@pytest.mark.parametrize('dtype', [np.float64, np.float32, np.int16])
+def test_raw(tmp_path, channels, known, dtype):
+    u = (1000*noise(999, channels)).astype(dtype)
+    path = str(tmp_path/'u.bin')
+    blocks = roundtrip(path, u, 100, dtype=dtype, length=len(u) if known else None, format='raw')
+    assert np.array_equal(np.concatenate(blocks), u) and blocks[0].dtype == dtype
+    assert os.path.getsize(path) == u.nbytes
+
+def test_raw_offset(tmp_path):
+    # Samples after a header, and a last incomplete sample of the channels ignored
+    u = noise(10, 2)
+    path = str(tmp_path/'u.dat2')
+    with open(path, 'wb') as file:
+        file.write(b'HEADER' + u.tobytes() + np.zeros(1).tobytes())
+    reader = sigio.SignalReader(path, channels=2, offset=6)
+    assert reader.format == 'raw' and reader.length() == 10
+    assert np.array_equal(np.concatenate(list(reader.blocks(3))), u)
+
+@pytest.mark.parametrize('channels', [1, 4])
+@pytest.mark.parametrize('size', [1, 3, 50, 10000])
+def test_text(tmp_path, channels, size):
+    # The small blocks cut the lines of text in any place, even in the middle of a
+    # number, and the rows are rebuilt across the cuts
+    u = noise(500, channels)
+    u[::7] *= 1e-300
+    blocks = roundtrip(str(tmp_path/'u.txt'), u, size)
+    assert np.array_equal(np.concatenate(blocks), u)
+    assert sigio.SignalReader(str(tmp_path/'u.txt')).channels == channels
+
+def test_text_long_lines(tmp_path):
+    # Lines longer than the blocks are joined until their end is found
+    u = noise(20, 100)
+    path = str(tmp_path/'u.csv')
+    np.savetxt(path, u, fmt='%.17g', delimiter=',')
+    reader = sigio.SignalReader(path)
+    assert reader.channels == 100 and reader.length() is None
+    blocks = list(reader.blocks(1))
+    assert np.array_equal(np.concatenate(blocks), u)
+
+def test_text_last_line(tmp_path):
+    # The last line doesn't need to end with a new line
+    path = str(tmp_path/'u.txt')
+    with open(path, 'w') as file:
+        file.write('1 2\n3 4\n5 6')
+    blocks = list(sigio.SignalReader(path).blocks(1))
+    assert np.array_equal(np.concatenate(blocks), [[1, 2], [3, 4], [5, 6]])
+
+@pytest.mark.parametrize('name', ['u.npy', 'u.bin', 'u.txt'])
+def test_empty(tmp_path, name):
+    path = str(tmp_path/name)
+    with sigio.SignalWriter(path, length=0 if name != 'u.txt' else None):
+        pass
+    assert list(sigio.SignalReader(path).blocks()) == []
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        sigio.SignalWriter(str(tmp_path/'u.wav'), format='wav')
+    open(str(tmp_path/'u.wav'), 'w').close()
+    with pytest.raises(ValueError):
+        sigio.SignalReader(str(tmp_path/'u.wav'), format='wav')
+
+@pytest.mark.parametrize('source, target', [('u.npy', 'y.npy'), ('u.txt', 'y.bin'), ('u.bin', 'y.txt')])
+def test_file(tmp_path, source, target):
+    # The file filtered by blocks is the signal filtered at once
+    dt = 1/20000
+    u = 1 + noise(5000, 2)
+    t = dt*np.arange(len(u))
+    h = filters.design('cheby1', 'bandpass', 4, 2*np.pi*np.array([1000, 3000]), rp=1, output='zpk')
+    with sigio.SignalWriter(str(tmp_path/source), channels=2) as writer:
+        writer.write(u)
+    reader = sigio.SignalReader(str(tmp_path/source), channels=2)
+    assert filters.ApplyFilter.file(h, dt, reader, str(tmp_path/target), size=333) == len(u)
+    y = np.concatenate(list(sigio.SignalReader(str(tmp_path/target), channels=2).blocks()))
+    for channel in range(2):
+        reference = filters.ApplyFilter.eval(h, u[:, channel], t)
+        assert np.max(np.abs(y[:, channel] - reference)) < 1e-9*np.max(np.abs(reference))
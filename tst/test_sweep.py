@@ -0,0 +1,105 @@
+# ******************************************************************************
+# * @file test_sweep.py
+# * @author Pablo Joaquim
+# * @brief Tests of the parameter sweeps: the points of the grid, the metrics of
+# * each design and the rows kept when a run is interrupted
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import filters
+from analog import sweep
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief Magnitude [dB] of a row of the sweep at the frequencies w [rad/s]
+# ******************************************************************************
+def magnitude(row, w):
+    wn = [row['wci'], row['wcs']] if row['btype'] in ('bandpass', 'bandstop') else row['wci']
+    h = filters.design(str(row['family']), str(row['btype']), int(row['order']), wn, rp=row['rp'], output='zpk')
+    return 20*np.log10(np.abs(h.freqresp(np.atleast_1d(w))))
+
+def test_values():
+    assert sweep.Sweep.values({'start': 1, 'stop': 3, 'num': 3}) == [1, 2, 3]
+    assert np.allclose(sweep.Sweep.values({'start': 10, 'stop': 1000, 'num': 3, 'log': True}), [10, 100, 1000])
+    assert sweep.Sweep.values(5) == [5]
+
+def test_points_dedup():
+    # The rp of the Butterworth designs doesn't matter, so they are taken once
+    grid = sweep.Sweep({'family': ['butter', 'cheby1'], 'order': [2, 3], 'wc': [1000.0, 1000], 'rp': [0.5, 1]})
+    assert len(grid) == 16
+    table = grid.points()
+    assert len(table) == 2 + 4
+    assert np.all(np.isnan(table['rp'][table['family'] == 'butter']))
+    assert sorted(table['rp'][table['family'] == 'cheby1']) == [0.5, 0.5, 1, 1]
+    assert not table['done'].any()
+
+@pytest.mark.parametrize('btype', ['bandpass', 'bandstop'])
+@pytest.mark.parametrize('wci, wcs', [(1000, 1000), (2000, 1000)])
+def test_points_band_edges(btype, wci, wcs):
+    with pytest.raises(ValueError):
+        sweep.Sweep({'btype': [btype], 'wci': [wci], 'wcs': [wcs]}).points()
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+def test_evaluate(family):
+    grid = sweep.Sweep({'family': [family], 'btype': ['lowpass', 'highpass'], 'order': [1, 4, 7], 'wc': [6000.0]})
+    bands = sweep.Sweep({'family': [family], 'btype': ['bandpass', 'bandstop'], 'order': [1, 4, 7],
+                         'wci': [6000.0], 'wcs': [12000.0]})
+    rows = sweep.evaluate(np.concatenate([grid.points(), bands.points()]))
+    assert rows['done'].all()
+    w = np.logspace(1, 7, 200001)
+    for row in rows:
+        # The gain may peak at the ends, w = 0 or w = inf
+        mag = magnitude(row, np.hstack([0, w, 1e12]))
+        assert abs(row['peak'] - np.max(mag)) < 1e-6
+        for edge in ('w3dbLow', 'w3dbHigh'):
+            if (np.isfinite(row[edge])):
+                assert abs(magnitude(row, row[edge])[0] - (row['peak'] - 3)) < 1e-6
+        # The ends of the band that |H| never leaves are nan
+        assert np.isnan(row['w3dbLow']) == (row['btype'] == 'lowpass')
+        assert np.isnan(row['w3dbHigh']) == (row['btype'] == 'highpass')
+
+def test_bandstop_edges():
+    # The -3 dB edges of a bandstop are the edges of its notch, next to the design
+    # edges (where a Butterworth is 3.01 dB down)
+    table = sweep.Sweep({'btype': ['bandstop'], 'order': [4], 'wci': [6000.0], 'wcs': [12000.0]}).points()
+    row = sweep.evaluate(table)[0]
+    assert 5990 < row['w3dbLow'] < 6000 and 12000 < row['w3dbHigh'] < 12010
+    w = np.linspace(row['w3dbLow'], row['w3dbHigh'], 1001)[1:-1]
+    assert np.all(magnitude(row, w) < row['peak'] - 3)
+
+def test_run(tmp_path):
+    grid = sweep.Sweep({'family': ['butter', 'cheby1'], 'order': [1, 2, 3, 4, 5], 'wc': [6000.0, 8000.0]})
+    out = str(tmp_path/'sweep.npy')
+    results = grid.run(out, workers=2, chunk=3)
+    assert results['done'].all()
+    assert np.load(out).tobytes() == results.tobytes()
+    expected = sweep.evaluate(grid.points())
+    assert np.allclose(results['peak'], expected['peak']) and np.allclose(results['w3dbHigh'], expected['w3dbHigh'])
+
+def test_run_interrupted(tmp_path):
+    # A design that can't be made (a ripple of 0 dB) stops the run. The rows of the
+    # chunks finished until then are kept in the file with their 'done' flag
+    grid = sweep.Sweep({'family': ['butter', 'cheby1'], 'order': [1, 2, 3, 4, 5, 6], 'wc': [6000.0], 'rp': [0, 1]})
+    out = str(tmp_path/'sweep.npy')
+    with pytest.raises(ValueError):
+        grid.run(out, workers=1, chunk=1)
+    saved = np.load(out)
+    failed = (saved['family'] == 'cheby1') & (saved['rp'] == 0)
+    assert not saved['done'][failed].any()
+    assert np.all(np.isfinite(saved['peak'][saved['done']]))
+    assert np.all(saved['peak'][~saved['done']] == 0)
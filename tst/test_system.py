@@ -0,0 +1,104 @@
+# ******************************************************************************
+# * @file test_system.py
+# * @author Pablo Joaquim
+# * @brief Tests of the state space realization of the analog filters against
+# * lsim on a balanced cascade of second-order sections
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy import linalg
+from scipy import signal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import system
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+# 20 kHz sampling of a 1 kHz cutoff, or a 1 kHz to 3 kHz band
+dt = 1/20000
+edges = {'lowpass': 2*np.pi*1000, 'highpass': 2*np.pi*1000,
+         'bandpass': 2*np.pi*np.array([1000, 3000]), 'bandstop': 2*np.pi*np.array([1000, 3000])}
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief The analog (z, p, k) of a design of the given family, band and order
+# ******************************************************************************
+def design(family, btype, order):
+    if (family == 'butter'):
+        return signal.butter(order, edges[btype], btype, analog=True, output='zpk')
+    return signal.cheby1(order, 1, edges[btype], btype, analog=True, output='zpk')
+
+# ******************************************************************************
+# * @brief lsim output of the cascade of the sections of (z, p, k), with the gain
+# * spread evenly as |k|^(1/n) on every section, each one in the controllable
+# * form of tf2ss, and the states of the cascade balanced with matrix_balance
+# ******************************************************************************
+def reference(z, p, k, u, t):
+    sos = signal.zpk2sos(z, p, k, analog=True)
+    sos[0, :3] /= k
+    sos[:, :3] *= np.abs(k)**(1/len(sos))
+    sos[0, :3] *= np.sign(k)
+    A = np.zeros((0, 0))
+    B = np.zeros((0, 1))
+    C = np.zeros((1, 0))
+    D = np.ones((1, 1))
+    for section in sos:
+        a, b, c, d = signal.tf2ss(np.trim_zeros(section[:3], 'f'), np.trim_zeros(section[3:], 'f'))
+        A = np.block([[A, np.zeros((len(A), len(a)))], [b @ C, a]])
+        B = np.vstack([B, b @ D])
+        C = np.hstack([d @ C, c])
+        D = d @ D
+    A, (T, permutation) = linalg.matrix_balance(A, permute=False, separate=True)
+    tout, y, xout = signal.lsim((A, B/T[:, None], C*T[None, :], D), U=u, T=t)
+    return y
+
+# ******************************************************************************
+# * @brief The input: a few tones in and out of the bands of the designs
+# ******************************************************************************
+def tones(t):
+    return np.sin(2*np.pi*300*t) + 0.5*np.sin(2*np.pi*1500*t + 1) + 0.2*np.sin(2*np.pi*2500*t)
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('btype', ['lowpass', 'bandpass'])
+@pytest.mark.parametrize('order', [8, 10, 12, 16])
+def test_ss_lsim(family, btype, order):
+    z, p, k = design(family, btype, order)
+    t = dt*np.arange(2000)
+    u = tones(t)
+    A, B, C, D = system.AnalogFilter(z, p, k).ss()
+    assert np.all(np.isfinite(A)) and np.all(np.isfinite(B)) and np.all(np.isfinite(C))
+    tout, y, xout = signal.lsim((A, B, C, D), U=u, T=t)
+    expected = reference(z, p, k, u, t)
+    assert np.max(np.abs(y - expected)) < 1e-9*np.max(np.abs(expected))
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('btype', ['lowpass', 'highpass', 'bandpass', 'bandstop'])
+@pytest.mark.parametrize('order', [2, 8, 16])
+def test_ss_freqresp(family, btype, order):
+    z, p, k = design(family, btype, order)
+    h = system.AnalogFilter(z, p, k)
+    A, B, C, D = h.ss()
+    w = np.logspace(2, 5, 40)
+    H = np.array([(C @ np.linalg.solve(1j*x*np.eye(len(A)) - A, B) + D)[0, 0] for x in w])
+    expected = h.freqresp(w)
+    assert np.max(np.abs(H - expected)) < 1e-8*np.max(np.abs(expected))
+
+def test_ss_gain_spread():
+    z, p, k = design('butter', 'lowpass', 16)
+    A, B, C, D = system.AnalogFilter(z, p, k).ss()
+    # The whole gain was in the first section, about 1e61 at order 16
+    assert np.max(np.abs(B)) < 1e3 and np.max(np.abs(C)) < 1e3
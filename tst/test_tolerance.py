@@ -0,0 +1,171 @@
+# ******************************************************************************
+# * @file test_tolerance.py
+# * @author Pablo Joaquim
+# * @brief Tests of the Monte Carlo tolerance analysis: the perturbed designs, the
+# * metrics of each one and the results independent of the workers
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import filters
+from analog import metrics
+from analog import system
+from analog import tolerance
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+wc = 2*np.pi*1000
+lowpass = filters.design('cheby1', 'lowpass', 5, wc, rp=1, output='zpk')
+bandstop = filters.design('butter', 'bandstop', 3, [wc, 3*wc], output='zpk')
+highpass = filters.design('butter', 'highpass', 4, wc, output='zpk')
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief The designs drawn for the chunk index of run, as AnalogFilter
+# ******************************************************************************
+def designs(analysis, index, count, seed=0):
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+    z, p, k = analysis.sample(rng, count)
+    return [system.AnalogFilter(z[i][~np.isnan(z[i])], p[i], np.real(k[i])) for i in range(count)]
+
+@pytest.mark.parametrize('mode', ['roots', 'coefficients'])
+def test_workers(mode):
+    # The samples only depend on the seed and the chunk size
+    analysis = tolerance.ToleranceAnalysis(lowpass, 0.05, mode)
+    spec = {'wp': wc, 'ws': 2*wc, 'rp': 1.5, 'rs': 20}
+    alone = analysis.run(2000, spec, seed=3, workers=1, chunk=300)
+    pool = analysis.run(2000, spec, seed=3, workers=3, chunk=300)
+    assert len(alone) == 2000 and alone.tobytes() == pool.tobytes()
+    assert analysis.run(2000, spec, seed=3, workers=1, chunk=300).tobytes() == alone.tobytes()
+    other = analysis.run(2000, spec, seed=4, workers=1, chunk=300)
+    assert other.tobytes() != alone.tobytes() and analysis.results is other
+
+def test_chunks():
+    # Each chunk draws from its own stream, so the first rows of a run are those
+    # of a shorter one with the same chunk size
+    analysis = tolerance.ToleranceAnalysis(lowpass)
+    long = analysis.run(1000, seed=1, chunk=128)
+    short = analysis.run(200, seed=1, chunk=128)
+    assert len(short) == 200 and long[:128].tobytes() == short[:128].tobytes()
+
+@pytest.mark.parametrize('h', [lowpass, bandstop, highpass])
+@pytest.mark.parametrize('mode', ['roots', 'coefficients'])
+def test_nominal(h, mode):
+    # Without tolerance every sample is the nominal design
+    m = metrics.FilterMetrics.eval([h])[0]
+    results = tolerance.ToleranceAnalysis(h, 0, mode).run(50, chunk=20)
+    assert results['stable'].all() and results['passed'].all()
+    for name in ('peak', 'w3db', 'gdpeak'):
+        assert np.allclose(results[name], m[name], rtol=1e-6, equal_nan=True)
+
+@pytest.mark.parametrize('h', [lowpass, bandstop, highpass])
+@pytest.mark.parametrize('mode', ['roots', 'coefficients'])
+def test_metrics(h, mode):
+    # The metrics of each sample are those of the design alone
+    analysis = tolerance.ToleranceAnalysis(h, 0.1, mode)
+    spec = {'wp': wc, 'ws': 2*wc} if h is lowpass else None
+    results = analysis.evaluate(0, 40, spec)
+    expected = metrics.FilterMetrics.eval(designs(analysis, 0, 40), *((wc, 2*wc) if spec else ()))
+    stable = results['stable']
+    assert np.array_equal(stable, [np.all(d.p.real < 0) for d in designs(analysis, 0, 40)])
+    names = ('peak', 'w3db', 'gdpeak') + (('ripple', 'attenuation') if spec else ())
+    for name in names:
+        assert np.allclose(results[name][stable], expected[name][stable], rtol=1e-6, equal_nan=True)
+
+def test_roots_uniform():
+    # Each pair keeps its own w0 and Q within the tolerance, the real roots scale
+    # within it, and the gain at w = 0 doesn't change
+    h = filters.design('cheby1', 'lowpass', 5, wc, rp=1, output='zpk')
+    analysis = tolerance.ToleranceAnalysis(h, 0.05, 'roots', 'uniform')
+    z, p, k = analysis.sample(np.random.default_rng(0), 5000)
+    for i in range(2):
+        # The pairs of the sample, in the order of the nominal ones
+        pair = p[:, [i, i + 2]]
+        nominal = h.p[h.p.imag > 0][i]
+        w0 = np.abs(pair[:, 0])/np.abs(nominal)
+        q = (np.abs(pair[:, 0])/(-2*pair[:, 0].real))/(np.abs(nominal)/(-2*nominal.real))
+        assert np.all(np.abs(w0 - 1) <= 0.05 + 1e-12) and np.all(np.abs(q - 1) <= 0.05/0.95 + 1e-12)
+        assert np.allclose(pair[:, 1], np.conj(pair[:, 0]))
+        assert np.std(w0) > 0.02
+    real = p[:, 4].real/h.p[h.p.imag == 0].real
+    assert np.all(np.abs(real - 1) <= 0.05 + 1e-12)
+    dc = np.real(k*np.prod(-z, axis=1)/np.prod(-p, axis=1))
+    assert np.allclose(dc, np.real(h.freqresp(np.zeros(1)))[0], rtol=1e-12)
+
+def test_roots_normal():
+    # tol is 3 sigma of the deviations
+    h = filters.design('butter', 'lowpass', 2, wc, output='zpk')
+    p = tolerance.ToleranceAnalysis(h, 0.06).sample(np.random.default_rng(0), 100000)[1]
+    w0 = np.abs(p[:, 0])/wc
+    assert abs(np.std(w0) - 0.02) < 0.001 and abs(np.mean(w0) - 1) < 0.001
+
+def test_roots_fixed():
+    # The zeros at the origin stay there and the zeros on the j axis only move along it
+    analysis = tolerance.ToleranceAnalysis(bandstop, 0.1)
+    z = analysis.sample(np.random.default_rng(0), 1000)[0]
+    assert np.all(np.abs(z.real) < 1e-9*np.abs(z))
+    highpassZeros = tolerance.ToleranceAnalysis(highpass, 0.1).sample(np.random.default_rng(0), 1000)[0]
+    assert np.all(highpassZeros == 0)
+
+def test_coefficients_uniform():
+    analysis = tolerance.ToleranceAnalysis(lowpass, 0.02, 'coefficients', 'uniform')
+    z, p, k = analysis.sample(np.random.default_rng(0), 1000)
+    den = np.real(np.poly(lowpass.p))
+    for i in range(len(k)):
+        sampled = np.real(np.poly(p[i]))
+        assert np.all(np.abs(sampled/den - 1) <= 0.02 + 1e-9)
+
+def test_check_summary():
+    analysis = tolerance.ToleranceAnalysis(lowpass, 0.05)
+    results = analysis.run(3000, {'wp': wc, 'ws': 2*wc, 'rp': 1.2, 'rs': 18}, seed=0)
+    passed = (results['ripple'] <= 1.2) & (results['attenuation'] >= 18) & results['stable']
+    assert np.array_equal(results['passed'], passed) and 0 < np.mean(passed) < 1
+    summary = tolerance.ToleranceAnalysis.summary(results)
+    y = np.mean(passed)
+    assert summary['samples'] == 3000 and summary['yield'] == y
+    assert np.isclose(summary['yieldError'], np.sqrt(y*(1 - y)/3000))
+    ripple = summary['metrics']['ripple']
+    assert np.isclose(ripple['percentiles'][50], np.median(results['ripple']))
+    assert ripple['percentiles'][0.135] <= ripple['mean'] <= ripple['percentiles'][99.865]
+    # Both the lowest and the highest -3 dB frequency, which are the same for a
+    # lowpass unless its ripple dips more than 3 dB
+    w3db = results['w3db']
+    checked = tolerance.ToleranceAnalysis.check(results, {'w3db': [0.99*wc, 1.01*wc]})
+    inside = (w3db >= 0.99*wc) & (w3db <= 1.01*wc)
+    assert np.array_equal(checked, results['stable'] & inside.all(axis=1)) and 0 < np.mean(checked) < 1
+    assert 0 < np.mean(checked) < 1
+
+def test_check_bands():
+    # One pair of limits for each edge of a bandstop
+    analysis = tolerance.ToleranceAnalysis(bandstop, 0.05)
+    results = analysis.run(1000, seed=0)
+    w3db = results['w3db']
+    limits = np.array([[0.98*wc, 1.02*wc], [2.9*wc, 3.1*wc]])
+    checked = tolerance.ToleranceAnalysis.check(results, {'w3db': limits})
+    inside = (w3db >= limits[:, 0]) & (w3db <= limits[:, 1])
+    assert np.all(np.isfinite(w3db)) and np.array_equal(checked, results['stable'] & inside.all(axis=1))
+
+@pytest.mark.parametrize('args, spec', [
+    ({'mode': 'parts'}, None),
+    ({'distribution': 'gamma'}, None),
+    ({}, {'wp': wc}),
+    ({}, {'ripple': 1}),
+])
+def test_invalid(args, spec):
+    with pytest.raises(ValueError):
+        tolerance.ToleranceAnalysis(lowpass, **args).run(10, spec)
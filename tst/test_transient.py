@@ -0,0 +1,124 @@
+# ******************************************************************************
+# * @file test_transient.py
+# * @author Pablo Joaquim
+# * @brief Tests of the analytic impulse, step and ramp responses against the
+# * simulation of the filters with scipy.signal.impulse and lsim
+# *
+# * @copyright NA
+# *
+# ******************************************************************************
+
+# ******************************************************************************
+# * import modules
+# ******************************************************************************
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy import signal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analog import system
+from analog import transient
+
+# ******************************************************************************
+# * Object and variables Definitions
+# ******************************************************************************
+# Band edges [Hz] of the designs: a wide band and the narrow ones of 2 Hz and 0.5 Hz
+# whose close poles used to be taken as a repeated one
+bands = {'lowpass': 1000, 'highpass': 1000, 'bandpass': [1000, 2000], 'bandstop': [1000, 2000],
+         'narrow': [1000, 1002], 'narrower': [1000, 1000.5]}
+
+# ******************************************************************************
+# * Function Definitions
+# ******************************************************************************
+
+# ******************************************************************************
+# * @brief The analog (z, p, k) of a design of the given family, band and order
+# ******************************************************************************
+def design(family, band, order, output='zpk'):
+    btype = 'bandpass' if band in ('narrow', 'narrower') else band
+    wn = 2*np.pi*np.asarray(bands[band], dtype=float)
+    if (family == 'butter'):
+        return signal.butter(order, wn, btype, analog=True, output=output)
+    return signal.cheby1(order, 1, wn, btype, analog=True, output=output)
+
+# ******************************************************************************
+# * @brief Time axis long enough for the response of the band to settle
+# ******************************************************************************
+def times(band):
+    width = np.diff(bands[band])[0] if np.ndim(bands[band]) else bands[band]
+    return np.linspace(0, 4/width, 20001)
+
+# ******************************************************************************
+# * @brief The response of kind of the state space (A, B, C, D) simulated by
+# * scipy.signal.impulse or lsim
+# ******************************************************************************
+def simulate(ss, kind, t):
+    if (kind == 'impulse'):
+        return signal.impulse(ss, T=t)[1]
+    u = np.ones(len(t)) if kind == 'step' else t
+    return signal.lsim(ss, U=u, T=t)[1]
+
+# ******************************************************************************
+# * @brief Largest error of y relative to the peak of the reference
+# ******************************************************************************
+def error(y, reference):
+    return np.max(np.abs(y - reference))/np.max(np.abs(reference))
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('band', ['lowpass', 'highpass', 'bandpass', 'bandstop', 'narrow', 'narrower'])
+@pytest.mark.parametrize('order', [1, 4, 7])
+@pytest.mark.parametrize('kind', ['impulse', 'step', 'ramp'])
+def test_zpk_lsim(family, band, order, kind):
+    h = system.AnalogFilter(*design(family, band, order))
+    t = times(band)
+    y = getattr(transient.TransientResponse(h), kind)(t)
+    assert error(y, simulate(h.ss(), kind, t)) < 1e-8
+
+@pytest.mark.parametrize('family', ['butter', 'cheby1'])
+@pytest.mark.parametrize('band', ['lowpass', 'bandpass', 'narrow', 'narrower'])
+@pytest.mark.parametrize('kind', ['impulse', 'step', 'ramp'])
+def test_ba_lsim(family, band, kind):
+    num, den = design(family, band, 4, 'ba')
+    t = times(band)
+    y = getattr(transient.TransientResponse((num, den)), kind)(t)
+    reference = simulate(system.AnalogFilter.from_ba(num, den).ss(), kind, t)
+    assert error(y, reference) < 1e-8
+
+def test_narrow_poles_distinct():
+    # The 8 poles of this bandpass are closer than 1e-3 relative to their size
+    h = system.AnalogFilter(*design('butter', 'narrow', 4))
+    poles, coefs, powers = transient.TransientResponse(h).terms(0)
+    assert np.all(powers == 0)
+    assert len(poles) == 4
+
+@pytest.mark.parametrize('roots', [[-1]*2, [-1]*4, [-1]*5, [-1]*3 + [-2], [-1 + 2j]*3 + [-1 - 2j]*3])
+@pytest.mark.parametrize('kind', ['impulse', 'step', 'ramp'])
+def test_repeated_poles(roots, kind):
+    # Given as (num, den), np.roots splits the repeated poles and they are grouped back
+    den = np.real(np.poly(roots))
+    t = np.linspace(0, 20, 4001)
+    exact = getattr(transient.TransientResponse(system.AnalogFilter([], np.array(roots, dtype=complex), den[-1])), kind)(t)
+    y = getattr(transient.TransientResponse(([den[-1]], den)), kind)(t)
+    assert error(y, exact) < 1e-8
+    assert error(exact, simulate(([den[-1]], den), kind, t)) < 1e-6
+
+def test_batch():
+    H = [[system.AnalogFilter(*design('butter', band, 4)), band] for band in ('lowpass', 'narrow')]
+    t = np.linspace(0, 0.01, 2001)
+    y = transient.TransientResponse.batch(H, t, 'step')
+    for i, (h, label) in enumerate(H):
+        assert np.max(np.abs(y[i] - transient.TransientResponse(h).step(t))) < 1e-12
+
+def test_tail():
+    h = system.AnalogFilter(*design('cheby1', 'narrow', 4))
+    response = transient.TransientResponse(h)
+    t = np.linspace(0, 4, 400001)
+    impulse = np.abs(response.impulse(t))
+    for T in (0.5, 1, 2):
+        # The bound holds over the rest of the response
+        rest = np.trapz(impulse[t >= T], t[t >= T])
+        assert rest <= response.tail(T)*(1 + 1e-6)
+    assert response.tail(4) < response.tail(2) < response.tail(1)